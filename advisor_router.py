@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import math
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in into is it its of on or so that the their "
+    "them they this to was were will with you your yours i me my we our us he she his her not no "
+    "do does did can could should would may might must about over under than then there these those "
+    "what when where which who whom why how all any some such only own same too very just also".split()
+)
+
+
+def _terms(text: str) -> List[str]:
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in _STOPWORDS or len(token) < 3:
+            continue
+        # Crude plural folding so "curses" matches "curse" and "runes" matches "rune"
+        if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+@dataclass
+class AdvisorRouter:
+    """
+    Picks which memory units to consult for a scenario without a model call.
+
+    Each unit is described by its personality text plus optional extra keywords, indexed as a
+    TF-IDF vector when it is registered. A scenario is scored by cosine similarity against
+    every unit. route() returns the ids scoring at least min_score and within relative_cutoff
+    of the best. It returns None when the evidence is too thin or ambiguous to decide: nothing
+    matches well enough, the best unit shares fewer than min_matched_terms terms with the
+    scenario, or the last unit picked and the first one left out are closer than margin.
+    Callers then fall back to the LLM selector and can hand its answer back through remember().
+
+    Routes are memoized per scenario text (LRU, max_cached entries); registering a unit
+    clears the memo.
+    """
+
+    min_score: float = 0.08
+    min_matched_terms: int = 2
+    relative_cutoff: float = 0.5
+    margin: float = 0.02
+    max_selected: int = 4
+    max_cached: int = 1024
+
+    _documents: Dict[str, List[str]] = field(default_factory=dict, init=False, repr=False)
+    _vectors: Dict[str, Dict[str, float]] = field(default_factory=dict, init=False, repr=False)
+    _idf: Dict[str, float] = field(default_factory=dict, init=False, repr=False)
+    _routes: "OrderedDict[str, Tuple[str, ...]]" = field(default_factory=OrderedDict, init=False, repr=False)
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, unit_id: str, personality: str, keywords: Iterable[str] = ()) -> None:
+        self._documents[unit_id] = _terms(" ".join([personality, *keywords]))
+        self._reindex()
+
+    def remove(self, unit_id: str) -> None:
+        if self._documents.pop(unit_id, None) is not None:
+            self._reindex()
+
+    def _reindex(self) -> None:
+        n = len(self._documents)
+        df: Dict[str, int] = {}
+        for terms in self._documents.values():
+            for term in set(terms):
+                df[term] = df.get(term, 0) + 1
+        # Smoothed idf; terms shared by every unit still count a little
+        self._idf = {term: math.log((1 + n) / (1 + count)) + 1 for term, count in df.items()}
+        self._vectors = {unit_id: self._vector(terms) for unit_id, terms in self._documents.items()}
+        self._routes.clear()
+
+    def _vector(self, terms: List[str]) -> Dict[str, float]:
+        counts: Dict[str, int] = {}
+        for term in terms:
+            if term in self._idf:
+                counts[term] = counts.get(term, 0) + 1
+        vec = {term: (1 + math.log(tf)) * self._idf[term] for term, tf in counts.items()}
+        norm = math.sqrt(sum(w * w for w in vec.values()))
+        return {term: w / norm for term, w in vec.items()} if norm > 0 else {}
+
+    def scores(self, scenario: str) -> List[Tuple[str, float]]:
+        """(unit_id, cosine score) for every unit, best first."""
+        query = self._vector(_terms(scenario))
+        scored = [
+            (unit_id, sum(w * vec.get(term, 0.0) for term, w in query.items()))
+            for unit_id, vec in self._vectors.items()
+        ]
+        scored.sort(key=lambda pair: pair[1], reverse=True)
+        return scored
+
+    def cached(self, scenario: str) -> Optional[List[str]]:
+        route = self._routes.get(scenario)
+        if route is None:
+            return None
+        self._routes.move_to_end(scenario)
+        return list(route)
+
+    def remember(self, scenario: str, unit_ids: Iterable[str]) -> None:
+        self._routes[scenario] = tuple(unit_ids)
+        self._routes.move_to_end(scenario)
+        while len(self._routes) > self.max_cached:
+            self._routes.popitem(last=False)
+
+    def route(self, scenario: str) -> Optional[List[str]]:
+        """Unit ids to consult (best first), or None when the scores are too ambiguous to decide."""
+        cached = self.cached(scenario)
+        if cached is not None:
+            return cached
+
+        scored = self.scores(scenario)
+        if not scored or scored[0][1] < self.min_score:
+            return None
+        matched = set(_terms(scenario)) & self._vectors[scored[0][0]].keys()
+        if len(matched) < self.min_matched_terms:
+            return None
+        threshold = max(self.min_score, scored[0][1] * self.relative_cutoff)
+        selected = [unit_id for unit_id, score in scored[: self.max_selected] if score >= threshold]
+        if len(selected) < len(scored):
+            if scored[len(selected) - 1][1] - scored[len(selected)][1] < self.margin:
+                return None
+
+        self.remember(scenario, selected)
+        return selected
+
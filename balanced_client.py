@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import itertools
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional
+
+import httpx
+import requests
+
+from ollama_client import DeadlineExceeded, OllamaClient, time_left
+from tracing import Tracer, annotate
+
+
+def _status(exc: BaseException) -> Optional[int]:
+    # requests.HTTPError and httpx.HTTPStatusError both carry the response
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None) if response is not None else None
+
+
+def _endpoint_fault(exc: BaseException) -> bool:
+    """Errors that say something about the endpoint rather than the request: unreachable, timed out, 5xx."""
+    if isinstance(exc, DeadlineExceeded):
+        return False
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout, httpx.TransportError)):
+        return True
+    status = _status(exc)
+    return status is not None and status >= 500
+
+
+def _missing_model(exc: BaseException) -> bool:
+    return _status(exc) == 404
+
+
+@dataclass(eq=False)
+class Endpoint:
+    client: OllamaClient
+    outstanding: int = 0
+    requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    # Skipped while cooling down after failures (time.perf_counter() value)
+    down_until: float = 0.0
+    # Moving average of call latency
+    latency_ms: Optional[float] = None
+    # Models recently routed here, least recently used first: what the server likely has loaded
+    models: "OrderedDict[str, float]" = field(default_factory=OrderedDict)
+    # Models this server answered 404 for
+    missing: set = field(default_factory=set)
+
+    @property
+    def url(self) -> str:
+        return self.client.base_url
+
+
+@dataclass
+class BalancedOllamaClient:
+    """
+    Drop-in replacement for OllamaClient that spreads calls over several Ollama servers.
+
+    Each call goes to the endpoint with the fewest requests outstanding, preferring endpoints
+    that recently served the same model (so it is probably still loaded and no model swap is
+    needed) unless they are more than affinity_slack requests busier than the least loaded
+    one. Ties go to the lower moving-average latency, then round robin.
+
+    Connection errors, timeouts and 5xx responses put an endpoint in a cooldown that doubles
+    with each consecutive failure (up to max_cooldown), and the call fails over to the next
+    endpoint. A 404 (model not pulled there) fails over too, and the endpoint is avoided for
+    that model. Streams fail over only until their first token. A caller's timeout covers
+    all attempts together.
+    """
+
+    clients: List[OllamaClient] = field(default_factory=lambda: [OllamaClient()])
+    affinity_slack: int = 2
+    # What each server keeps loaded: OLLAMA_MAX_LOADED_MODELS and the keep_alive (seconds)
+    max_loaded_models: int = 3
+    model_ttl: float = 300.0
+    failure_cooldown: float = 1.0
+    max_cooldown: float = 30.0
+    latency_alpha: float = 0.2
+
+    failovers: int = field(default=0, init=False)
+
+    _endpoints: List[Endpoint] = field(default_factory=list, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+    _turns: Iterator[int] = field(default_factory=itertools.count, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if not self.clients:
+            raise ValueError("BalancedOllamaClient needs at least one client")
+        self._endpoints = [Endpoint(client) for client in self.clients]
+
+    @classmethod
+    def from_urls(cls, base_urls: Iterable[str], **client_options: Any) -> "BalancedOllamaClient":
+        """One OllamaClient per URL, each built with client_options (pool_size, tracer, keep_alive, ...)."""
+        return cls(clients=[OllamaClient(base_url=url, **client_options) for url in base_urls])
+
+    @property
+    def tracer(self) -> Optional[Tracer]:
+        return self.clients[0].tracer
+
+    def _warm(self, endpoint: Endpoint, model: str, now: float) -> bool:
+        last_used = endpoint.models.get(model)
+        return last_used is not None and now - last_used <= self.model_ttl
+
+    def _acquire(self, model: str, tried: List[Endpoint]) -> Optional[Endpoint]:
+        """Pick and claim the endpoint for the next attempt, or None once every endpoint was tried."""
+        with self._lock:
+            now = time.perf_counter()
+            pool = [e for e in self._endpoints if e not in tried]
+            if not pool:
+                return None
+            pool = [e for e in pool if model not in e.missing] or pool
+            # With every endpoint cooling down, try the one that comes back first
+            pool = [e for e in pool if e.down_until <= now] or [min(pool, key=lambda e: e.down_until)]
+            least = min(e.outstanding for e in pool)
+            pool = [e for e in pool if self._warm(e, model, now) and e.outstanding <= least + self.affinity_slack] or pool
+
+            turn = next(self._turns)
+            n = len(self._endpoints)
+            best = min(pool, key=lambda e: (
+                e.outstanding, e.latency_ms or 0.0, (self._endpoints.index(e) - turn) % n
+            ))
+            best.outstanding += 1
+            best.requests += 1
+            # Claimed now, so concurrent requests for the model follow it here
+            best.models[model] = now
+            best.models.move_to_end(model)
+            while len(best.models) > self.max_loaded_models:
+                best.models.popitem(last=False)
+            return best
+
+    def _release(self, endpoint: Endpoint, model: str, started: float, error: Optional[BaseException]) -> None:
+        with self._lock:
+            now = time.perf_counter()
+            endpoint.outstanding -= 1
+            if error is None:
+                elapsed_ms = (now - started) * 1e3
+                endpoint.consecutive_failures = 0
+                endpoint.down_until = 0.0
+                endpoint.missing.discard(model)
+                if endpoint.latency_ms is None:
+                    endpoint.latency_ms = elapsed_ms
+                else:
+                    endpoint.latency_ms += self.latency_alpha * (elapsed_ms - endpoint.latency_ms)
+            elif _endpoint_fault(error):
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                cooldown = self.failure_cooldown * 2 ** (endpoint.consecutive_failures - 1)
+                endpoint.down_until = now + min(cooldown, self.max_cooldown)
+                # A server that went away comes back with nothing loaded
+                endpoint.models.clear()
+            elif _missing_model(error):
+                endpoint.missing.add(model)
+                endpoint.models.pop(model, None)
+
+    def _should_fail_over(self, exc: BaseException, tried: List[Endpoint]) -> bool:
+        if not isinstance(exc, Exception) or len(tried) == len(self._endpoints):
+            return False
+        return _endpoint_fault(exc) or _missing_model(exc)
+
+    def _failed_over(self, endpoint: Endpoint, exc: BaseException) -> None:
+        with self._lock:
+            self.failovers += 1
+        annotate(failover_from=endpoint.url, failover_error=type(exc).__name__)
+
+    def _call(self, model: str, timeout: Optional[float], call: Callable[[OllamaClient, Optional[float]], Any]) -> Any:
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        tried: List[Endpoint] = []
+        while True:
+            endpoint = self._acquire(model, tried)
+            started = time.perf_counter()
+            try:
+                result = call(endpoint.client, time_left(deadline))
+            except BaseException as exc:
+                self._release(endpoint, model, started, exc)
+                tried.append(endpoint)
+                if not self._should_fail_over(exc, tried):
+                    raise
+                self._failed_over(endpoint, exc)
+                continue
+            self._release(endpoint, model, started, None)
+            return result
+
+    async def _acall(
+        self, model: str, timeout: Optional[float], call: Callable[[OllamaClient, Optional[float]], Awaitable[Any]]
+    ) -> Any:
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        tried: List[Endpoint] = []
+        while True:
+            endpoint = self._acquire(model, tried)
+            started = time.perf_counter()
+            try:
+                result = await call(endpoint.client, time_left(deadline))
+            except BaseException as exc:
+                self._release(endpoint, model, started, exc)
+                tried.append(endpoint)
+                if not self._should_fail_over(exc, tried):
+                    raise
+                self._failed_over(endpoint, exc)
+                continue
+            self._release(endpoint, model, started, None)
+            return result
+
+    def generate(self, model: str, prompt: str, *, timeout: Optional[float] = None, **kwargs: Any) -> str:
+        return self._call(model, timeout, lambda client, left: client.generate(model, prompt, timeout=left, **kwargs))
+
+    def generate_stream(self, model: str, prompt: str, *, timeout: Optional[float] = None, **kwargs: Any) -> Iterator[str]:
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        tried: List[Endpoint] = []
+        while True:
+            endpoint = self._acquire(model, tried)
+            started = time.perf_counter()
+            streamed = False
+            error: Optional[BaseException] = None
+            try:
+                for token in endpoint.client.generate_stream(model, prompt, timeout=time_left(deadline), **kwargs):
+                    streamed = True
+                    yield token
+            except Exception as exc:
+                error = exc
+                tried.append(endpoint)
+                if streamed or not self._should_fail_over(exc, tried):
+                    raise
+                self._failed_over(endpoint, exc)
+                continue
+            finally:
+                self._release(endpoint, model, started, error)
+            return
+
+    async def agenerate(self, model: str, prompt: str, *, timeout: Optional[float] = None, **kwargs: Any) -> str:
+        return await self._acall(
+            model, timeout, lambda client, left: client.agenerate(model, prompt, timeout=left, **kwargs)
+        )
+
+    def embed(self, model: str, prompt: str) -> List[float]:
+        return self._call(model, None, lambda client, _: client.embed(model, prompt))
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per endpoint: health, load, failures, latency and the models it likely has loaded."""
+        with self._lock:
+            now = time.perf_counter()
+            return [
+                {
+                    "url": e.url,
+                    "healthy": e.down_until <= now,
+                    "outstanding": e.outstanding,
+                    "requests": e.requests,
+                    "failures": e.failures,
+                    "latency_ms": e.latency_ms,
+                    "models": [m for m in e.models if self._warm(e, m, now)],
+                }
+                for e in self._endpoints
+            ]
+
+    def close(self) -> None:
+        for client in self.clients:
+            client.close()
+
+    async def aclose(self) -> None:
+        for client in self.clients:
+            await client.aclose()
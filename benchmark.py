@@ -0,0 +1,250 @@
+"""
+Benchmark Executive.decide_action / retain_experience against the fake Ollama server.
+
+The fake server runs in a child process, so the CPU time of this process is the client-side
+(Python) overhead of a decision. Each configuration reports decision latency percentiles,
+LLM calls and prompt bytes per decision, and that overhead.
+
+    python benchmark.py --managers 1,4,8 --memories 10,100,1000 --decisions 20 --per-token-latency 0.002
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+import requests
+
+from executive import Executive
+from fake_ollama import FakeOllamaConfig, start_in_subprocess
+from compact_memory import CompactMemoryCollection
+from memory import Memory, MemoryCollection
+from ollama_client import OllamaClient
+
+
+SCENARIOS = [
+    "On a narrow mountain pass, a charismatic guide urges you to cross a swaying rope bridge quickly.",
+    "A merchant offers you a glowing amulet at a suspiciously low price in a crowded market.",
+    "Your party is ambushed at night and the wizard is separated from the group.",
+    "A noble invites you to a private dinner and asks about your companions' secrets.",
+]
+
+PERSONALITIES = [
+    "You prioritize keeping the host alive and uninjured.",
+    "You prioritize social dynamics: persuasion, trust and authority pressure.",
+    "You prioritize magical risks: curses, enchantments and infernal signs.",
+    "You prioritize long-term goals, promises and moral boundaries.",
+]
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def build_executive(url: str, managers: int, memories: int) -> Executive:
+    executive = Executive(llm_client=OllamaClient(base_url=url))
+    for i in range(managers):
+        executive.register_memory_manager(PERSONALITIES[i % len(PERSONALITIES)], name=f"manager_{i}")
+    for name, manager in executive.memory_units.items():
+        for j in range(memories):
+            manager.memory.add(Memory(
+                statement=f"{name} remembers event {j}: a lesson about bridges, strangers and runes.",
+                decay_rate=0, strength_initial=1, current_strength=1,
+            ))
+    # Do not let the pool size hide fan-out; the server's select_count bounds it instead
+    executive.max_concurrent_consultations = max(managers, 1)
+    return executive
+
+
+def _server_stats(url: str) -> Dict[str, Any]:
+    return requests.get(f"{url}/_stats", timeout=5).json()
+
+
+def _reset_server(url: str) -> None:
+    requests.post(f"{url}/_reset", data="{}", timeout=5)
+
+
+def run_case(
+    url: str, managers: int, memories: int, decisions: int, retain: bool, concurrent: bool, routing: str = "llm",
+    consult: str = "two_step",
+) -> Dict[str, Any]:
+    executive = build_executive(url, managers, memories)
+    executive.concurrent_consultation = concurrent
+    executive.routing_mode = routing
+    for manager in executive.memory_units.values():
+        manager.consult_mode = consult
+
+    # Warm-up: open pooled connections outside the measurement
+    with contextlib.redirect_stdout(io.StringIO()):
+        executive.decide_action(SCENARIOS[0])
+    _reset_server(url)
+
+    latencies: List[float] = []
+    cpu_start = time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(decisions):
+            started = time.perf_counter()
+            executive.decide_action(SCENARIOS[i % len(SCENARIOS)])
+            latencies.append(time.perf_counter() - started)
+    cpu = time.process_time() - cpu_start
+    stats = _server_stats(url)
+
+    result: Dict[str, Any] = {
+        "managers": managers,
+        "memories": memories,
+        "decisions": decisions,
+        "p50_ms": percentile(latencies, 50) * 1e3,
+        "p90_ms": percentile(latencies, 90) * 1e3,
+        "p99_ms": percentile(latencies, 99) * 1e3,
+        "mean_ms": sum(latencies) / len(latencies) * 1e3,
+        "calls_per_decision": stats["requests"] / decisions,
+        "prompt_kb_per_decision": stats["prompt_bytes"] / decisions / 1024,
+        "prompt_cache_hit": stats["cached_prompt_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0,
+        "python_cpu_ms_per_decision": cpu / decisions * 1e3,
+    }
+
+    if retain:
+        _reset_server(url)
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            executive.retain_experiences(
+                (SCENARIOS[i % len(SCENARIOS)], "We inspected first.", "Nobody was hurt.") for i in range(decisions)
+            )
+        elapsed = time.perf_counter() - started
+        stats = _server_stats(url)
+        result["retain_ms_per_experience"] = elapsed / decisions * 1e3
+        result["retain_calls_per_experience"] = stats["requests"] / decisions
+
+    return result
+
+
+def measure_footprint(count: int) -> List[Dict[str, Any]]:
+    """Bytes per memory and select() cost for each collection type, with unique statements."""
+    statements = [f"Memory {i}: the guide on the pass lied about the bridge." for i in range(count)]
+
+    def fill_dataclass() -> MemoryCollection:
+        collection = MemoryCollection()
+        for statement in statements:
+            collection.add(Memory(statement=statement, decay_rate=0.001, strength_initial=1, current_strength=1))
+        return collection
+
+    def fill_compact() -> CompactMemoryCollection:
+        collection = CompactMemoryCollection()
+        for statement in statements:
+            collection.add_statement(statement, decay_rate=0.001, strength_initial=1, current_strength=1)
+        return collection
+
+    builders: Dict[str, Callable[[], Any]] = {"MemoryCollection": fill_dataclass, "CompactMemoryCollection": fill_compact}
+    statement_bytes = sum(len(s) + 49 for s in statements)  # CPython str object size, shared by both
+    rows = []
+    for name, build in builders.items():
+        tracemalloc.start()
+        collection = build()
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        keys = list(collection.memories)[:2]
+        started = time.perf_counter()
+        for _ in range(10):
+            collection.select(keys)
+        select_ms = (time.perf_counter() - started) / 10 * 1e3
+
+        rows.append({
+            "collection": name,
+            "memories": count,
+            "bytes_per_memory": allocated / count,
+            "overhead_bytes_per_memory": (allocated - statement_bytes) / count,
+            "select_ms": select_ms,
+        })
+        del collection
+    return rows
+
+
+def _print_table(rows: List[Dict[str, Any]]) -> None:
+    columns = [
+        ("managers", "mgrs", "{:>4}"),
+        ("memories", "mems", "{:>6}"),
+        ("p50_ms", "p50 ms", "{:>8.1f}"),
+        ("p90_ms", "p90 ms", "{:>8.1f}"),
+        ("p99_ms", "p99 ms", "{:>8.1f}"),
+        ("calls_per_decision", "calls", "{:>6.1f}"),
+        ("prompt_kb_per_decision", "prompt KB", "{:>10.1f}"),
+        ("prompt_cache_hit", "cache hit", "{:>10.0%}"),
+        ("python_cpu_ms_per_decision", "py cpu ms", "{:>10.2f}"),
+    ]
+    if rows and "retain_ms_per_experience" in rows[0]:
+        columns.append(("retain_ms_per_experience", "retain ms", "{:>10.1f}"))
+
+    print("  ".join(f"{title:>{len(fmt.format(0))}}" for _, title, fmt in columns))
+    for row in rows:
+        print("  ".join(fmt.format(row[key]) for key, _, fmt in columns))
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark decision and retention cost against a fake Ollama server.")
+    parser.add_argument("--managers", type=_int_list, default=[1, 4], help="comma-separated manager counts")
+    parser.add_argument("--memories", type=_int_list, default=[10, 100, 1000], help="comma-separated memories per manager")
+    parser.add_argument("--decisions", type=int, default=20)
+    parser.add_argument("--base-latency", type=float, default=0.01, help="fake server seconds per request")
+    parser.add_argument("--prompt-token-latency", type=float, default=0.0, help="fake server seconds per prompt token")
+    parser.add_argument("--per-token-latency", type=float, default=0.001, help="fake server seconds per generated token")
+    parser.add_argument("--select-count", type=int, default=4, help="ids the fake server returns for selection prompts")
+    parser.add_argument("--prompt-cache-slots", type=int, default=4,
+                        help="prompts the fake server keeps in its simulated prompt cache (0 disables)")
+    parser.add_argument("--sequential", action="store_true", help="disable concurrent advisor consultation")
+    parser.add_argument("--routing", choices=["llm", "local"], default="llm", help="executive routing_mode")
+    parser.add_argument("--consult", choices=["two_step", "fused"], default="two_step", help="manager consult_mode")
+    parser.add_argument("--retain", action="store_true", help="also benchmark retain_experiences")
+    parser.add_argument("--footprint", type=int, metavar="N",
+                        help="instead of timing decisions, compare per-memory RSS and select() cost for N memories")
+    parser.add_argument("--json", dest="json_path", help="write results as JSON lines to this path")
+    args = parser.parse_args()
+
+    if args.footprint:
+        for row in measure_footprint(args.footprint):
+            print(
+                f"{row['collection']:<24} {row['memories']:>8} memories  {row['bytes_per_memory']:8.1f} B/memory "
+                f"({row['overhead_bytes_per_memory']:7.1f} B excluding statement text)  select {row['select_ms']:7.2f} ms"
+            )
+        return
+
+    config = FakeOllamaConfig(
+        base_latency=args.base_latency,
+        prompt_token_latency=args.prompt_token_latency,
+        per_token_latency=args.per_token_latency,
+        select_count=args.select_count,
+        prompt_cache_slots=args.prompt_cache_slots,
+    )
+    proc, url = start_in_subprocess(config=config)
+    try:
+        rows = [
+            run_case(url, managers, memories, args.decisions, args.retain, not args.sequential, args.routing, args.consult)
+            for managers in args.managers
+            for memories in args.memories
+        ]
+    finally:
+        proc.terminate()
+        proc.join()
+
+    _print_table(rows)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+
+
+if __name__ == "__main__":
+    main()
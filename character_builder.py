@@ -1,8 +1,477 @@
+"""
+Build characters from a declarative JSON spec or from a binary snapshot, and save snapshots.
+
+Spec (one object or a list; memories are strings or objects with the Memory fields):
+
+    {"name": "aria", "model": "qwen2.5:7b-instruct", "routing": "local",
+     "managers": {"safety": {"personality": "You prioritize ...", "keywords": ["bridge", "fall"],
+                             "decay_rate": 0,
+                             "memories": ["You once ...", {"statement": "...", "decay_rate": 0.01}]}},
+     "subpersonalities": {"guardian": {"motive": "...", "fear": "...", "strategy": "...",
+                                       "blind_spot": "...", "decay_rate": 0.01, "memories": ["..."]}}}
+
+Every memory needs a decay_rate, its own or its unit's.
+
+A list entry may instead be {"name": "aria", "snapshot": "aria.char"} (path relative to the
+spec file).
+
+Snapshot layout (little-endian):
+
+    "DNDCHAR\\0" | u32 version | u32 header length | JSON header | padding | columns
+
+The header holds the executive's settings, its model router, and one entry per unit (kind,
+name, settings, row range, collection backend and its settings, and the embedder and vector
+offset of its VectorIndex if it has one). Settings are stored only where they differ from the
+dataclass defaults. The memories of all units are stored as 64-byte aligned columns, so they
+can be viewed straight out of a memory map (see SnapshotReader):
+  - decay_rate, strength_initial and current_strength (f8);
+  - step (i8);
+  - statements and memory ids as UTF-8 blobs with i8 end offsets;
+  - the VectorIndex rows of indexed units, one per memory in row order (f4, flattened).
+"""
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+from dataclasses import MISSING, dataclass, field, fields
 import json
-from typing import List, Dict, Iterable, Optional
-import uuid
+import mmap
+import os
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from compact_memory import CompactMemoryCollection
+from executive import Executive
+from memory import Memory, MemoryCollection, MemoryManager
+from memory_store import SQLiteMemoryCollection
+from model_routing import ModelRouter
+from subpersonality import Subpersonality
+from vector_index import Embedder, HashingEmbedder, OllamaEmbedder, VectorIndex
+
+
+SNAPSHOT_MAGIC = b"DNDCHAR\0"
+SNAPSHOT_VERSION = 2
+
+_PREAMBLE = struct.Struct("<8sII")
+_ALIGN = 64
+
+# Collection backends a snapshot can restore, by the name stored in its header
+_BACKENDS = {"memory": MemoryCollection, "sqlite": SQLiteMemoryCollection, "compact": CompactMemoryCollection}
+
+# Live objects rebuilt on load rather than stored
+_RUNTIME_FIELDS = frozenset({"llm_client", "memory", "memory_units", "model_router", "router", "consolidator"})
+
+
+@dataclass
+class Character:
+    name: str
+    executive: Executive
+    subpersonalities: Dict[str, Subpersonality] = field(default_factory=dict)
+
+
+def _is_plain(value: Any) -> bool:
+    if isinstance(value, (str, int, float, bool, type(None))):
+        return True
+    return isinstance(value, list) and all(isinstance(x, (str, int, float)) for x in value)
+
+
+def _settings(obj: Any) -> Dict[str, Any]:
+    """Init fields of a dataclass instance that hold plain JSON values differing from the default."""
+    settings = {}
+    for f in fields(obj):
+        if not f.init or f.name in _RUNTIME_FIELDS:
+            continue
+        value = getattr(obj, f.name)
+        if f.default is not MISSING:
+            default = f.default
+        elif f.default_factory is not MISSING:
+            default = f.default_factory()
+        else:
+            default = MISSING
+        if value != default and _is_plain(value):
+            settings[f.name] = value
+    return settings
+
+
+def _restore(cls: type, settings: Dict[str, Any], **runtime: Any) -> Any:
+    # Settings a newer version of a class no longer has are dropped
+    known = {f.name for f in fields(cls) if f.init}
+    return cls(**{k: v for k, v in settings.items() if k in known}, **runtime)
+
+
+def _embedder_spec(embedder: Embedder) -> Dict[str, Any]:
+    if isinstance(embedder, HashingEmbedder):
+        return {"kind": "hashing", "dim": embedder.dim}
+    if isinstance(embedder, OllamaEmbedder):
+        return {"kind": "ollama", "model": embedder.model}
+    return {"kind": "custom", "type": f"{type(embedder).__module__}.{type(embedder).__qualname__}"}
+
+
+def _rebuild_embedder(spec: Optional[Dict[str, Any]], llm_client: Any, path: str, unit: str) -> Embedder:
+    # Vectors from any other embedder would not be comparable, so never substitute a default
+    kind = (spec or {}).get("kind")
+    if kind == "hashing":
+        return HashingEmbedder(dim=spec["dim"])
+    if kind == "ollama":
+        return OllamaEmbedder(model=spec["model"], llm_client=llm_client)
+    described = spec["type"] if kind == "custom" else "an unrecorded embedder"
+    raise ValueError(f"{path}: unit {unit!r} was indexed with {described}; pass embedder= to restore it")
+
+
+def _backend(collection: Any) -> str:
+    for name, cls in _BACKENDS.items():
+        if isinstance(collection, cls):
+            return name
+    raise ValueError(f"cannot snapshot a {type(collection).__name__}")
+
+
+def _align(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def _text_column(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [v.encode("utf-8") for v in values]
+    ends = np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), dtype=np.int64)
+    return ends, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def _text_values(ends: np.ndarray, blob: np.ndarray) -> List[str]:
+    data = blob.tobytes()
+    bounds = ends.tolist()
+    return [data[a:b].decode("utf-8") for a, b in zip([0] + bounds[:-1], bounds)]
+
+
+def save_snapshot(character: Character, path: str) -> None:
+    """
+    Write character to path (atomically, via a temporary file). Save between decisions; a
+    select() running concurrently may be captured half-applied.
+    """
+    executive = character.executive
+    units: List[Tuple[str, str, Any]] = [("manager", name, m) for name, m in executive.memory_units.items()]
+    units += [("subpersonality", name, s) for name, s in character.subpersonalities.items()]
+
+    ids: List[str] = []
+    statements: List[str] = []
+    rates: List[float] = []
+    initial: List[float] = []
+    current: List[float] = []
+    steps: List[int] = []
+    vectors: List[np.ndarray] = []
+    vector_count = 0
+    unit_headers = []
+    for kind, name, unit in units:
+        start = len(ids)
+        members = list(unit.memory.memories.values())
+        for mem in members:
+            ids.append(str(mem.memory_id))
+            statements.append(mem.statement)
+            rates.append(mem.decay_rate)
+            initial.append(mem.strength_initial)
+            current.append(mem.current_strength)
+            steps.append(mem.step)
+        index = getattr(unit.memory, "index", None)
+        unit_header = {
+            "kind": kind,
+            "name": name,
+            "settings": _settings(unit),
+            "rows": [start, len(ids)],
+            "backend": _backend(unit.memory),
+            "collection": _settings(unit.memory),
+            "indexed": index is not None,
+        }
+        if index is not None:
+            block = index.vectors([mem.memory_id for mem in members])
+            unit_header.update(embedder=_embedder_spec(index.embedder), index_dim=block.shape[1], index_offset=vector_count)
+            vectors.append(block.ravel())
+            vector_count += block.size
+        unit_headers.append(unit_header)
+
+    statement_ends, statement_blob = _text_column(statements)
+    id_ends, id_blob = _text_column(ids)
+    columns = {
+        "decay_rate": np.asarray(rates, dtype="<f8"),
+        "strength_initial": np.asarray(initial, dtype="<f8"),
+        "current_strength": np.asarray(current, dtype="<f8"),
+        "step": np.asarray(steps, dtype="<i8"),
+        "statement_end": statement_ends.astype("<i8"),
+        "statements": statement_blob,
+        "id_end": id_ends.astype("<i8"),
+        "ids": id_blob,
+        "index_vectors": np.concatenate(vectors).astype("<f4") if vectors else np.zeros(0, dtype="<f4"),
+    }
+
+    layout = {}
+    offset = 0
+    for name, column in columns.items():
+        layout[name] = {"dtype": column.dtype.str, "count": len(column), "offset": offset}
+        offset = _align(offset + column.nbytes)
+
+    router = executive.model_router
+    header = json.dumps({
+        "name": character.name,
+        "executive": _settings(executive),
+        "model_router": None if router is None else {
+            "tiers": router.tiers,
+            "routes": router.routes,
+            "default_tier": router.default_tier,
+            "escalation": router.escalation,
+        },
+        "units": unit_headers,
+        "memories": len(ids),
+        "columns": layout,
+    }, ensure_ascii=False).encode("utf-8")
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header)))
+        f.write(header)
+        data_start = _align(f.tell())
+        for name, column in columns.items():
+            f.write(b"\0" * (data_start + layout[name]["offset"] - f.tell()))
+            f.write(column.tobytes())
+    os.replace(tmp, path)
+
+
+class SnapshotReader:
+    """
+    A snapshot opened through a read-only memory map. column() returns NumPy views into the
+    map without copying; they are only valid until close().
+    """
+
+    def __init__(self, path: str) -> None:
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path}: empty file, not a character snapshot") from None
+        magic, version, header_len = _PREAMBLE.unpack_from(self._map, 0)
+        if magic != SNAPSHOT_MAGIC:
+            self.close()
+            raise ValueError(f"{path}: not a character snapshot")
+        if version > SNAPSHOT_VERSION:
+            self.close()
+            raise ValueError(f"{path}: snapshot version {version} is newer than supported ({SNAPSHOT_VERSION})")
+        self.version = version
+        self.header: Dict[str, Any] = json.loads(self._map[_PREAMBLE.size:_PREAMBLE.size + header_len])
+        self._data_start = _align(_PREAMBLE.size + header_len)
+
+    def column(self, name: str) -> np.ndarray:
+        spec = self.header["columns"][name]
+        return np.frombuffer(
+            self._map, dtype=np.dtype(spec["dtype"]), count=spec["count"], offset=self._data_start + spec["offset"]
+        )
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "SnapshotReader":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def is_snapshot(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+
+def _client_kwargs(llm_client: Any) -> Dict[str, Any]:
+    return {} if llm_client is None else {"llm_client": llm_client}
+
+
+def _load_collection(
+    reader: SnapshotReader,
+    unit: Dict[str, Any],
+    ids: List[str],
+    statements: List[str],
+    embedder: Optional[Embedder],
+    llm_client: Any,
+    path: str,
+) -> Any:
+    rows = slice(*unit["rows"])
+    rates, initial, current, steps = (
+        reader.column(name)[rows] for name in ("decay_rate", "strength_initial", "current_strength", "step")
+    )
+    backend = unit.get("backend", "memory")
+    # Version 1 snapshots only stored lazy_decay
+    settings = unit.get("collection", {"lazy_decay": unit.get("lazy_decay", False)})
+    if backend not in _BACKENDS:
+        raise ValueError(f"{path}: unit {unit['name']!r} has unknown backend {backend!r}")
+
+    if backend == "compact":
+        collection = _restore(CompactMemoryCollection, settings)
+        collection.add_columns(statements, rates, initial, current, steps)
+        return collection
+
+    memories = [
+        Memory(
+            statement=statement,
+            decay_rate=rate,
+            strength_initial=init,
+            current_strength=cur,
+            step=step,
+            memory_id=memory_id,
+        )
+        for memory_id, statement, rate, init, cur, step in zip(
+            ids, statements, rates.tolist(), initial.tolist(), current.tolist(), steps.tolist()
+        )
+    ]
+    if backend == "sqlite":
+        # A file-backed store is reopened and reset to the memories it held when saved
+        collection = _restore(SQLiteMemoryCollection, settings)
+        collection.clear()
+        collection.add_many(memories)
+        return collection
+
+    index = None
+    if unit["indexed"]:
+        spec = unit.get("embedder")
+        index = VectorIndex(embedder=embedder or _rebuild_embedder(spec, llm_client, path, unit["name"]))
+        # The stored rows are only reused for the embedder that made them; any other re-embeds
+        same_embedder = embedder is None or (spec or {}).get("kind") == "custom" or _embedder_spec(embedder) == spec
+        if same_embedder and "index_dim" in unit:
+            dim, offset = unit["index_dim"], unit["index_offset"]
+            block = reader.column("index_vectors")[offset:offset + len(ids) * dim]
+            index.add_vectors(ids, block.reshape(len(ids), dim))
+    return _restore(MemoryCollection, settings, memories={m.memory_id: m for m in memories}, index=index)
+
+
+def load_snapshot(
+    path: str,
+    llm_client: Any = None,
+    small_model: Optional[str] = None,
+    embedder: Optional[Embedder] = None,
+    **executive_options: Any,
+) -> Character:
+    """
+    Restore a character saved with save_snapshot(). executive_options (e.g. consolidator,
+    structured_output) override the stored executive settings, and structured_output and
+    parse_retries those of every unit. small_model only applies if
+    the snapshot has no model router of its own. Every unit gets back the collection backend
+    it was saved with; a file-backed SQLiteMemoryCollection is reopened and reset to the saved
+    memories. Collections that had a VectorIndex get a new one with the same kind of embedder
+    (an OllamaEmbedder goes through the executive's client), filled from the stored vectors
+    without embedding anything. embedder replaces it for every indexed unit (re-embedding the
+    statements unless it matches the saved one), and is required for units that used a custom
+    embedder, whose stored vectors it must be able to extend.
+    """
+    with SnapshotReader(path) as reader:
+        header = reader.header
+        ids = _text_values(reader.column("id_end"), reader.column("ids"))
+        statements = _text_values(reader.column("statement_end"), reader.column("statements"))
+
+        executive = _restore(Executive, {**header["executive"], **executive_options}, **_client_kwargs(llm_client))
+        if header.get("model_router"):
+            executive.model_router = ModelRouter(**header["model_router"])
+        elif small_model:
+            executive.model_router = ModelRouter(tiers={"small": small_model, "large": executive.model})
+
+        # Output-handling options given here apply to the restored units as well
+        unit_overrides = {k: executive_options[k] for k in ("structured_output", "parse_retries") if k in executive_options}
+        subpersonalities: Dict[str, Subpersonality] = {}
+        for unit in header["units"]:
+            start, stop = unit["rows"]
+            collection = _load_collection(
+                reader, unit, ids[start:stop], statements[start:stop], embedder, executive.llm_client, path
+            )
+            settings = {**unit["settings"], **unit_overrides}
+            runtime = {"llm_client": executive.llm_client, "model_router": executive.model_router, "memory": collection}
+            if unit["kind"] == "manager":
+                executive.add_memory_manager(_restore(MemoryManager, settings, **runtime), unit["name"])
+            elif unit["kind"] == "subpersonality":
+                subpersonalities[unit["name"]] = _restore(Subpersonality, settings, **runtime)
+            else:
+                raise ValueError(f"{path}: unknown unit kind {unit['kind']!r}")
+
+    return Character(name=header["name"], executive=executive, subpersonalities=subpersonalities)
+
+
+def _add_memories(collection: MemoryCollection, unit: Dict[str, Any], where: str) -> None:
+    for memory in unit.get("memories", []):
+        if isinstance(memory, str):
+            memory = {"statement": memory}
+        decay_rate = memory.get("decay_rate", unit.get("decay_rate"))
+        if decay_rate is None:
+            raise ValueError(f"{where}: memory {memory['statement']!r} has no decay_rate, and neither has its unit")
+        collection.add(Memory(
+            statement=memory["statement"],
+            decay_rate=decay_rate,
+            strength_initial=memory.get("strength_initial", 1),
+            current_strength=memory.get("current_strength", memory.get("strength_initial", 1)),
+            step=memory.get("step", 0),
+        ))
+
+
+def character_from_spec(
+    spec: Dict[str, Any], llm_client: Any = None, small_model: Optional[str] = None, **executive_options: Any
+) -> Character:
+    """
+    Build a character from one spec object. With small_model, the executive gets a ModelRouter
+    sending boolean/id-array directives to small_model and everything else to its own model.
+    executive_options are passed to Executive (e.g. structured_output, consolidator).
+    """
+    executive = Executive(**_client_kwargs(llm_client), **executive_options)
+    if "model" in spec:
+        executive.model = spec["model"]
+    if small_model:
+        executive.model_router = ModelRouter(tiers={"small": small_model, "large": executive.model})
+    if "routing" in spec:
+        executive.routing_mode = spec["routing"]
+
+    for name, manager in spec.get("managers", {}).items():
+        executive.register_memory_manager(
+            manager["personality"], name=name, keywords=manager.get("keywords", ()), model=manager.get("model")
+        )
+        _add_memories(executive.memory_units[name].memory, manager, f"{spec['name']}: manager {name!r}")
+
+    subpersonalities: Dict[str, Subpersonality] = {}
+    for name, sub in spec.get("subpersonalities", {}).items():
+        unit = Subpersonality(
+            motive=sub["motive"],
+            fear=sub["fear"],
+            strategy=sub["strategy"],
+            blind_spot=sub["blind_spot"],
+            llm_client=executive.llm_client,
+            model=sub.get("model", executive.model),
+            model_router=executive.model_router,
+            structured_output=executive.structured_output,
+            parse_retries=executive.parse_retries,
+        )
+        _add_memories(unit.memory, sub, f"{spec['name']}: subpersonality {name!r}")
+        subpersonalities[name] = unit
+
+    return Character(name=spec["name"], executive=executive, subpersonalities=subpersonalities)
+
+
+def load_characters(
+    path: str,
+    llm_client: Any = None,
+    small_model: Optional[str] = None,
+    embedder: Optional[Embedder] = None,
+    **executive_options: Any,
+) -> List[Character]:
+    """
+    Load characters from a snapshot or from a JSON spec (one object or a list, whose entries
+    may name snapshots). All characters share llm_client; embedder is passed to load_snapshot().
+    """
+    if is_snapshot(path):
+        return [load_snapshot(path, llm_client, small_model, embedder, **executive_options)]
+
+    with open(path, encoding="utf-8") as f:
+        definitions = json.load(f)
+    if isinstance(definitions, dict):
+        definitions = [definitions]
 
-from ollama_client import OllamaClient
\ No newline at end of file
+    characters = []
+    for definition in definitions:
+        if "snapshot" in definition:
+            snapshot_path = os.path.join(os.path.dirname(path), definition["snapshot"])
+            character = load_snapshot(snapshot_path, llm_client, small_model, embedder, **executive_options)
+            character.name = definition.get("name", character.name)
+        else:
+            character = character_from_spec(definition, llm_client, small_model, **executive_options)
+        characters.append(character)
+    return characters
@@ -0,0 +1,402 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+import json
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from memory import Memory
+from prompting import estimate_tokens
+
+
+Handle = int
+
+
+class MemoryView:
+    """
+    Memory-compatible view of one row of a CompactMemoryCollection. Holds only the collection
+    and an integer handle; every attribute reads or writes the underlying columns. A view of a
+    pruned memory stays readable until the collection next compacts (at a later add/select).
+    """
+
+    __slots__ = ("_collection", "_handle")
+
+    def __init__(self, collection: CompactMemoryCollection, handle: Handle) -> None:
+        self._collection = collection
+        self._handle = handle
+
+    @property
+    def _row(self) -> int:
+        return self._collection._row_of(self._handle)
+
+    @property
+    def memory_id(self) -> Handle:
+        return self._handle
+
+    @property
+    def statement(self) -> str:
+        c = self._collection
+        return c._strings[c._statement[self._row]]
+
+    @property
+    def decay_rate(self) -> float:
+        return float(self._collection._decay_rate[self._row])
+
+    @property
+    def strength_initial(self) -> float:
+        return float(self._collection._strength_initial[self._row])
+
+    @property
+    def current_strength(self) -> float:
+        return float(self._collection._current_strength[self._row])
+
+    @current_strength.setter
+    def current_strength(self, value: float) -> None:
+        self._collection._current_strength[self._row] = value
+
+    @property
+    def step(self) -> int:
+        return int(self._collection._step[self._row])
+
+    @step.setter
+    def step(self, value: int) -> None:
+        self._collection._step[self._row] = value
+
+    def decay(self) -> None:
+        if self.decay_rate == 0:
+            return
+        self.step += 1
+        self.current_strength = self.strength_initial - (self.decay_rate * self.step)
+
+    def refresh(self) -> None:
+        self.current_strength = self.strength_initial
+        self.step = 0
+
+    def get_memory_statement(self) -> str:
+        return self.statement
+
+    def to_memory(self) -> Memory:
+        """Detached Memory copy (memory_id becomes the string form of the handle)."""
+        return Memory(
+            statement=self.statement,
+            decay_rate=self.decay_rate,
+            strength_initial=self.strength_initial,
+            current_strength=self.current_strength,
+            step=self.step,
+            memory_id=str(self._handle),
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, MemoryView):
+            return self._collection is other._collection and self._handle == other._handle
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((id(self._collection), self._handle))
+
+    def __repr__(self) -> str:
+        return (
+            f"MemoryView(statement={self.statement!r}, decay_rate={self.decay_rate}, "
+            f"strength_initial={self.strength_initial}, current_strength={self.current_strength}, "
+            f"step={self.step}, memory_id={self._handle})"
+        )
+
+
+class _CompactMemories(Mapping):
+    """{handle: MemoryView} view over the live rows, in insertion order."""
+
+    def __init__(self, collection: CompactMemoryCollection) -> None:
+        self._collection = collection
+
+    def __getitem__(self, key: Union[Handle, str]) -> MemoryView:
+        handle = self._collection._resolve(key)
+        if handle is None:
+            raise KeyError(key)
+        return MemoryView(self._collection, handle)
+
+    def __iter__(self) -> Iterator[Handle]:
+        c = self._collection
+        return iter(c._handle[: c._size][c._alive[: c._size]].tolist())
+
+    def __len__(self) -> int:
+        return len(self._collection)
+
+    def __contains__(self, key: object) -> bool:
+        return self._collection._resolve(key) is not None
+
+
+@dataclass
+class CompactMemoryCollection:
+    """
+    Struct-of-arrays MemoryCollection for very large or very many collections.
+
+    Per-memory state lives in contiguous NumPy columns (decay rate, initial/current strength,
+    step, statement index), statements are interned in one string table, and memories are
+    addressed by integer handles instead of uuid strings. decay/select/prune run as vectorised
+    column operations with the same float arithmetic as Memory.decay(). Handles are never
+    reused; dead rows are compacted away once they make up half of the table.
+
+    Handles appear as their decimal string in get_as_string(), and select() accepts either form.
+    """
+
+    initial_capacity: int = 64
+
+    _size: int = field(default=0, init=False, repr=False)
+    _live: int = field(default=0, init=False, repr=False)
+    _next_handle: int = field(default=0, init=False, repr=False)
+    _strings: List[str] = field(default_factory=list, init=False, repr=False)
+    _string_ids: Dict[str, int] = field(default_factory=dict, init=False, repr=False)
+    _joined: Optional[str] = field(default=None, init=False, repr=False)
+    # Guards every public method, so a background MemoryConsolidator can merge while decisions run
+    _lock: threading.RLock = field(default_factory=threading.RLock, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        cap = max(1, self.initial_capacity)
+        self._decay_rate = np.zeros(cap, dtype=np.float64)
+        self._strength_initial = np.zeros(cap, dtype=np.float64)
+        self._current_strength = np.zeros(cap, dtype=np.float64)
+        self._step = np.zeros(cap, dtype=np.int64)
+        self._statement = np.zeros(cap, dtype=np.int32)
+        self._handle = np.zeros(cap, dtype=np.int64)
+        self._alive = np.zeros(cap, dtype=np.bool_)
+        # handle -> row, -1 once the memory has been compacted away
+        self._rows = np.full(cap, -1, dtype=np.int64)
+
+    _COLUMNS = ("_decay_rate", "_strength_initial", "_current_strength", "_step", "_statement", "_handle", "_alive")
+
+    @property
+    def memories(self) -> Mapping:
+        return _CompactMemories(self)
+
+    def __len__(self) -> int:
+        return self._live
+
+    def _intern(self, statement: str) -> int:
+        idx = self._string_ids.get(statement)
+        if idx is None:
+            idx = len(self._strings)
+            self._strings.append(statement)
+            self._string_ids[statement] = idx
+        return idx
+
+    def _resolve(self, key: object) -> Optional[Handle]:
+        """Handle for an int or decimal-string key if it names a live memory."""
+        if isinstance(key, str):
+            if not key.isdigit():
+                return None
+            key = int(key)
+        if not isinstance(key, (int, np.integer)) or not 0 <= key < self._next_handle:
+            return None
+        row = self._rows[key]
+        return int(key) if row >= 0 and self._alive[row] else None
+
+    def _row_of(self, handle: Handle) -> int:
+        row = int(self._rows[handle])
+        if row < 0:
+            raise KeyError(handle)
+        return row
+
+    def _grow_rows(self, needed: int) -> None:
+        cap = len(self._alive)
+        if needed <= cap:
+            return
+        new_cap = max(needed, cap * 2)
+        for name in self._COLUMNS:
+            old = getattr(self, name)
+            grown = np.zeros(new_cap, dtype=old.dtype)
+            grown[: self._size] = old[: self._size]
+            setattr(self, name, grown)
+
+    def _grow_handles(self, needed: int) -> None:
+        cap = len(self._rows)
+        if needed <= cap:
+            return
+        grown = np.full(max(needed, cap * 2), -1, dtype=np.int64)
+        grown[:cap] = self._rows
+        self._rows = grown
+
+    def add_statement(
+        self, statement: str, decay_rate: float, strength_initial: float, current_strength: float, step: int = 0
+    ) -> Handle:
+        """Insert a memory from its fields and return its handle."""
+        with self._lock:
+            self._maybe_compact()
+            row = self._size
+            handle = self._next_handle
+            self._grow_rows(row + 1)
+            self._grow_handles(handle + 1)
+
+            self._decay_rate[row] = decay_rate
+            self._strength_initial[row] = strength_initial
+            self._current_strength[row] = current_strength
+            self._step[row] = step
+            self._statement[row] = self._intern(statement)
+            self._handle[row] = handle
+            self._alive[row] = True
+            self._rows[handle] = row
+
+            self._size += 1
+            self._live += 1
+            self._next_handle += 1
+            self._joined = None
+            return handle
+
+    def add_columns(
+        self,
+        statements: Sequence[str],
+        decay_rate: np.ndarray,
+        strength_initial: np.ndarray,
+        current_strength: np.ndarray,
+        step: np.ndarray,
+    ) -> np.ndarray:
+        """Insert len(statements) memories from column arrays in one go and return their handles."""
+        with self._lock:
+            self._maybe_compact()
+            n = len(statements)
+            rows = slice(self._size, self._size + n)
+            handles = np.arange(self._next_handle, self._next_handle + n, dtype=np.int64)
+            self._grow_rows(self._size + n)
+            self._grow_handles(self._next_handle + n)
+
+            self._decay_rate[rows] = decay_rate
+            self._strength_initial[rows] = strength_initial
+            self._current_strength[rows] = current_strength
+            self._step[rows] = step
+            self._statement[rows] = [self._intern(statement) for statement in statements]
+            self._handle[rows] = handles
+            self._alive[rows] = True
+            self._rows[handles] = np.arange(rows.start, rows.stop)
+
+            self._size += n
+            self._live += n
+            self._next_handle += n
+            self._joined = None
+            return handles
+
+    def add(self, memory: Memory) -> Handle:
+        """Insert and return the handle (the Memory's own memory_id is not kept)."""
+        return self.add_statement(
+            memory.statement, memory.decay_rate, memory.strength_initial, memory.current_strength, memory.step
+        )
+
+    def _live_rows(self) -> np.ndarray:
+        return np.flatnonzero(self._alive[: self._size])
+
+    def get_as_string(self, token_budget: Optional[int] = None) -> str:
+        with self._lock:
+            rows = self._live_rows()
+            if token_budget is None:
+                if self._joined is None:
+                    strings, handles, stmts = self._strings, self._handle, self._statement
+                    self._joined = json.dumps(
+                        {str(handles[r]): strings[stmts[r]] for r in rows.tolist()}, ensure_ascii=False
+                    )
+                return self._joined
+
+            # strongest first, then most recently refreshed, then most recently added
+            ranked = rows[np.lexsort((-rows, self._step[rows], -self._current_strength[rows]))]
+            budget = token_budget - estimate_tokens("{}")
+            kept = []
+            for r in ranked.tolist():
+                fragment = (
+                    f"{json.dumps(str(self._handle[r]))}: "
+                    f"{json.dumps(self._strings[self._statement[r]], ensure_ascii=False)}"
+                )
+                cost = estimate_tokens(fragment) + 1
+                if cost > budget:
+                    break
+                budget -= cost
+                kept.append((r, fragment))
+            kept.sort()
+            return "{" + ", ".join(fragment for _, fragment in kept) + "}"
+
+    def prune(self) -> None:
+        with self._lock:
+            n = self._size
+            dead = self._alive[:n] & (self._current_strength[:n] <= 0)
+            if not dead.any():
+                return
+            self._alive[:n] &= ~dead
+            self._live -= int(dead.sum())
+            self._joined = None
+
+    def _maybe_compact(self) -> None:
+        # Done at the start of the next add/select rather than in prune(), so views returned by
+        # select() stay readable until the collection is next modified
+        if self._size - self._live > max(64, self._size // 2):
+            self.compact()
+
+    def compact(self) -> None:
+        """Drop dead rows and unreferenced statements; handles of live memories stay valid."""
+        with self._lock:
+            n = self._size
+            self._rows[self._handle[:n][~self._alive[:n]]] = -1
+            rows = self._live_rows()
+            for name in self._COLUMNS:
+                col = getattr(self, name)
+                packed = np.zeros(max(len(rows), self.initial_capacity), dtype=col.dtype)
+                packed[: len(rows)] = col[rows]
+                setattr(self, name, packed)
+            self._size = len(rows)
+            self._rows[self._handle[: self._size]] = np.arange(self._size)
+
+            used = np.unique(self._statement[: self._size])
+            remap = np.zeros(len(self._strings), dtype=np.int32)
+            remap[used] = np.arange(len(used), dtype=np.int32)
+            self._strings = [self._strings[i] for i in used.tolist()]
+            self._string_ids = {s: i for i, s in enumerate(self._strings)}
+            self._statement[: self._size] = remap[self._statement[: self._size]]
+
+    def select(self, memory_keys: Iterable[Union[Handle, str]]) -> List[MemoryView]:
+        """
+        Returns the selected memories (in the order of memory_keys),
+        refreshes those selected memories, and decays all others.
+        Unknown keys are ignored.
+        """
+        with self._lock:
+            self._maybe_compact()
+            handles = [h for h in (self._resolve(k) for k in memory_keys) if h is not None]
+            selected_rows = self._rows[handles] if handles else np.zeros(0, dtype=np.int64)
+
+            n = self._size
+            # Refresh selected
+            self._current_strength[selected_rows] = self._strength_initial[selected_rows]
+            self._step[selected_rows] = 0
+
+            # Decay non-selected: step += 1; strength = initial - rate * step
+            decaying = self._alive[:n] & (self._decay_rate[:n] != 0)
+            decaying[selected_rows] = False
+            rows = np.flatnonzero(decaying)
+            self._step[rows] += 1
+            self._current_strength[rows] = self._strength_initial[rows] - (self._decay_rate[rows] * self._step[rows])
+
+            self.prune()
+
+            return [MemoryView(self, h) for h in handles]
+
+    def statements(self) -> Dict[str, str]:
+        """A consistent {handle (decimal string): statement} copy of the collection."""
+        with self._lock:
+            rows = self._live_rows().tolist()
+            return {str(self._handle[r]): self._strings[self._statement[r]] for r in rows}
+
+    def merge(self, memory_keys: Iterable[Union[Handle, str]], statement: str) -> Optional[Handle]:
+        """
+        Replace the listed memories with one memory holding statement and return its handle;
+        same contract as MemoryCollection.merge(). Views of the merged memories stay readable
+        until the collection next compacts.
+        """
+        with self._lock:
+            handles = list(dict.fromkeys(h for h in map(self._resolve, memory_keys) if h is not None))
+            if len(handles) < 2:
+                return None
+            rows = self._rows[handles]
+            strength = float(np.maximum(self._current_strength[rows], 0.0).sum())
+            decay_rate = float(self._decay_rate[rows].min())
+            self._alive[rows] = False
+            self._live -= len(handles)
+            self._joined = None
+            return self.add_statement(statement, decay_rate, strength, strength)
@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import heapq
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from memory import MemoryCollection
+from model_routing import ModelRouter, routed_generate
+from ollama_client import OllamaClient
+from prompting import build_prompt
+from tracing import annotate, maybe_span
+from vector_index import Embedder, HashingEmbedder
+
+
+logger = logging.getLogger(__name__)
+
+def plan_clusters(
+    vectors: np.ndarray,
+    target: int,
+    cap: int,
+    min_similarity: float = 0.25,
+    max_cluster_size: int = 8,
+    neighbours: int = 16,
+) -> List[List[int]]:
+    """
+    Group the rows of vectors (L2-normalised embeddings) so that at most `target` groups
+    remain, by repeatedly joining the two groups whose centroids are most similar.
+
+    Joins below min_similarity or beyond max_cluster_size members are only made while more
+    than `cap` groups remain and no other join is possible, so the result never exceeds cap
+    even when nothing is related. Returns the groups of two or more rows; every other row stays as it is.
+
+    Each group only keeps its `neighbours` most similar partners as candidates, in a heap,
+    so a pass costs O(n * (n + neighbours * log n)) and O(n * neighbours) memory; the
+    candidates are rebuilt from scratch before giving up, so joins are never missed.
+    """
+    n = len(vectors)
+    clusters: List[List[int]] = [[i] for i in range(n)]
+    if n <= target:
+        return []
+    sums = vectors.astype(np.float64, copy=True)
+    centroids = vectors.astype(np.float64, copy=True)
+    alive = np.ones(n, dtype=bool)
+    sizes = np.ones(n, dtype=np.int64)
+    # A group's version changes with its centroid; heap entries of older versions are stale
+    versions = np.zeros(n, dtype=np.int64)
+    close: List[Tuple[float, int, int, int, int]] = []  # joins allowed at any size
+    forced: List[Tuple[float, int, int, int, int]] = []  # any join, for while more than cap remain
+
+    def push_neighbours(rows: np.ndarray) -> None:
+        live = np.flatnonzero(alive)
+        k = min(neighbours, len(live) - 1)
+        if k <= 0:
+            return
+        for start in range(0, len(rows), 256):
+            block = rows[start:start + 256]
+            sims = centroids[block] @ centroids[live].T
+            sims[block[:, None] == live[None, :]] = -np.inf
+            allowed = np.where(
+                (sizes[block][:, None] + sizes[live][None, :] > max_cluster_size) | (sims < min_similarity),
+                -np.inf, sims,
+            )
+            for heap, scores in ((forced, sims), (close, allowed)):
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                for r, i in enumerate(block.tolist()):
+                    for c in top[r].tolist():
+                        score = scores[r, c]
+                        if np.isfinite(score):
+                            j = int(live[c])
+                            heapq.heappush(heap, (-float(score), i, int(versions[i]), j, int(versions[j])))
+
+    def pop(heap: List[Tuple[float, int, int, int, int]], limited: bool) -> Optional[Tuple[int, int]]:
+        while heap:
+            _, i, vi, j, vj = heapq.heappop(heap)
+            if not (alive[i] and alive[j]) or versions[i] != vi or versions[j] != vj:
+                continue
+            if limited and sizes[i] + sizes[j] > max_cluster_size:
+                continue
+            return i, j
+        return None
+
+    push_neighbours(np.arange(n))
+    remaining = n
+    rebuilt = False
+    while remaining > target:
+        pair = pop(close, True)
+        if pair is None and remaining > cap:
+            pair = pop(forced, False)
+        if pair is None:
+            # The bounded candidate lists may have run dry; rebuild them once before stopping
+            if rebuilt:
+                break
+            push_neighbours(np.flatnonzero(alive))
+            rebuilt = True
+            continue
+        rebuilt = False
+
+        # Join j into i and give i candidates against its new centroid
+        i, j = pair
+        clusters[i].extend(clusters[j])
+        clusters[j] = []
+        sums[i] += sums[j]
+        sizes[i] += sizes[j]
+        alive[j] = False
+        versions[i] += 1
+        norm = np.linalg.norm(sums[i])
+        centroids[i] = sums[i] / norm if norm > 0 else sums[i]
+        push_neighbours(np.array([i]))
+        remaining -= 1
+
+    return [cluster for cluster in clusters if len(cluster) > 1]
+
+
+@dataclass
+class _Watched:
+    collection: MemoryCollection
+    personality: str
+    # {memory_id: (statement, unit vector)} from earlier passes, so only new memories are embedded
+    embeddings: Dict[str, Tuple[str, np.ndarray]] = field(default_factory=dict)
+
+
+@dataclass
+class MemoryConsolidator:
+    """
+    Keeps watched memory collections under max_memories by merging related memories.
+
+    A pass over a collection that has grown past max_memories embeds its statements (a
+    watched collection only its new ones; earlier embeddings are kept between passes), groups
+    them with plan_clusters() until about target_ratio * max_memories remain, and asks the
+    model for one summary statement per group, which replaces the group through the
+    collection's merge(). Any collection with statements() and merge() can be watched
+    (MemoryCollection, SQLiteMemoryCollection, CompactMemoryCollection). It is locked only
+    to copy its statements and to apply each merge; embedding and the model calls run
+    unlocked, so decisions keep reading and selecting while a pass is under way. Memories
+    selected away or pruned in the meantime simply drop out of their group.
+
+    Passes run on a background thread (start()/stop(), or use as a context manager) every
+    `interval` seconds, or sooner after notify(); run_once() runs one synchronously.
+    """
+
+    llm_client: Any = field(default_factory=OllamaClient)
+    model: str = "qwen2.5:7b-instruct"
+    model_router: Optional[ModelRouter] = None
+    # Collections with more memories than this are consolidated
+    max_memories: int = 64
+    # Share of max_memories a pass consolidates down to, so one pass absorbs several adds
+    target_ratio: float = 0.75
+    # Least centroid similarity for merging memories while under max_memories
+    min_similarity: float = 0.25
+    max_cluster_size: int = 8
+    # Used for collections without a VectorIndex (otherwise the index's embedder is used)
+    embedder: Embedder = field(default_factory=HashingEmbedder)
+    interval: float = 30.0
+
+    consolidate_directive: str = """
+You merge related memories of one character into a single memory.
+
+Rules:
+- Write in ENGLISH ONLY. Do not use any non-English words or characters.
+- Return ONLY plain text (no JSON, no markdown).
+- 2 sentence maximum.
+- Keep every detail that could change a future decision (who, what happened, what it cost); drop repetition.
+
+Payload (JSON):
+{payload}
+""".strip()
+
+    _watched: List[_Watched] = field(default_factory=list, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+    _wake: threading.Event = field(default_factory=threading.Event, init=False, repr=False)
+    _stopping: threading.Event = field(default_factory=threading.Event, init=False, repr=False)
+    _thread: Optional[threading.Thread] = field(default=None, init=False, repr=False)
+    _stats: Dict[str, int] = field(
+        default_factory=lambda: {"passes": 0, "merges": 0, "errors": 0},
+        init=False, repr=False,
+    )
+
+    def watch(self, collection: MemoryCollection, personality: str = "") -> None:
+        """Consolidate collection from now on; personality gives the summaries their point of view."""
+        if not (callable(getattr(collection, "statements", None)) and callable(getattr(collection, "merge", None))):
+            raise TypeError(f"{type(collection).__name__} has no statements()/merge() and cannot be consolidated")
+        with self._lock:
+            if all(w.collection is not collection for w in self._watched):
+                self._watched.append(_Watched(collection, personality))
+
+    def unwatch(self, collection: MemoryCollection) -> None:
+        with self._lock:
+            self._watched = [w for w in self._watched if w.collection is not collection]
+
+    def notify(self) -> None:
+        """Ask the background thread for a pass now (e.g. after new memories were added)."""
+        self._wake.set()
+
+    def _embed(
+        self,
+        collection: MemoryCollection,
+        statements: Dict[str, str],
+        cache: Dict[str, Tuple[str, np.ndarray]],
+    ) -> np.ndarray:
+        """Unit vectors for statements in order, embedding only those not already in cache."""
+        index = getattr(collection, "index", None)
+        embedder = index.embedder if index is not None else self.embedder
+        rows = []
+        for memory_id, statement in statements.items():
+            cached = cache.get(memory_id)
+            if cached is None or cached[0] != statement:
+                vec = np.asarray(embedder(statement), dtype=np.float64)
+                norm = np.linalg.norm(vec)
+                cached = (statement, vec / norm if norm > 0 else vec)
+            rows.append(cached)
+        # Merged and pruned memories drop out of the cache
+        cache.clear()
+        cache.update(zip(statements, rows))
+        return np.asarray([vec for _, vec in rows], dtype=np.float64)
+
+    def _summarize(self, personality: str, statements: List[str]) -> str:
+        prompt = build_prompt(self.consolidate_directive, {"personality": personality, "memories": statements})
+        return routed_generate(self.llm_client, self.model_router, self.model, prompt, "memory.consolidate").strip()
+
+    def consolidate(self, collection: MemoryCollection, personality: str = "") -> int:
+        """One pass over collection; returns the number of merges applied."""
+        statements = collection.statements()
+        if len(statements) <= self.max_memories:
+            return 0
+        ids = list(statements)
+        target = max(1, int(self.max_memories * self.target_ratio))
+        with self._lock:
+            cache = next((w.embeddings for w in self._watched if w.collection is collection), {})
+
+        with maybe_span(getattr(self.llm_client, "tracer", None), "memory.consolidate", memories=len(ids)):
+            vectors = self._embed(collection, statements, cache)
+            groups = plan_clusters(vectors, target, self.max_memories, self.min_similarity, self.max_cluster_size)
+
+            merges = 0
+            for group in groups:
+                members = [ids[i] for i in group]
+                summary = self._summarize(personality, [statements[k] for k in members])
+                if summary and collection.merge(members, summary) is not None:
+                    merges += 1
+            annotate(groups=len(groups), merges=merges, memories_after=len(collection.memories))
+
+        with self._lock:
+            self._stats["merges"] += merges
+        return merges
+
+    def run_once(self) -> int:
+        """Consolidate every watched collection that is over max_memories; returns merges applied."""
+        with self._lock:
+            watched = list(self._watched)
+            self._stats["passes"] += 1
+        merges = 0
+        for w in watched:
+            try:
+                merges += self.consolidate(w.collection, w.personality)
+            except Exception:
+                # Merges already applied stay; the rest of the collection is retried next pass
+                logger.exception("memory consolidation of %s failed", type(w.collection).__name__)
+                with self._lock:
+                    self._stats["errors"] += 1
+        return merges
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopping.is_set():
+                return
+            self.run_once()
+
+    def start(self) -> "MemoryConsolidator":
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="memory-consolidator", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the background thread, letting a pass in progress finish (up to timeout)."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def __enter__(self) -> "MemoryConsolidator":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    def stats(self) -> Dict[str, int]:
+        """Passes run, merges applied and collection passes that failed."""
+        with self._lock:
+            return dict(self._stats)
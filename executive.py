@@ -1,11 +1,18 @@
 from __future__ import annotations
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, wait
 from dataclasses import dataclass, field
-import json
-from typing import Dict, List, Optional
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
+from advisor_router import AdvisorRouter
+from consolidation import MemoryConsolidator
 from memory import MemoryManager
-from ollama_client import OllamaClient
+from model_routing import ModelRouter, routed_agenerate, routed_generate
+from ollama_client import DeadlineExceeded, OllamaClient, time_left
+from prompting import ID_ARRAY_SCHEMA, build_prompt, parse_id_array, structured_params
+from tracing import Tracer, activate, annotate, maybe_span, run_in_context
 
 
 @dataclass
@@ -13,6 +20,29 @@ class Executive:
     model: str = "qwen2.5:7b-instruct"
     llm_client: OllamaClient = field(default_factory=OllamaClient)
     memory_units: Dict[str, MemoryManager] = field(default_factory=dict)
+    # Consult selected managers in parallel. Keep max_concurrent_consultations in line with
+    # the number of parallel slots on the Ollama server (OLLAMA_NUM_PARALLEL).
+    concurrent_consultation: bool = True
+    max_concurrent_consultations: int = 4
+    # Parallel keep/summarize calls when broadcasting experiences to memory units
+    max_concurrent_retentions: int = 4
+    # With a decision deadline, the share of it held back for the final decision call;
+    # the selector and advisors have to finish within the rest
+    decision_budget_share: float = 0.35
+    # "llm" asks the model which units to consult; "local" routes with the AdvisorRouter and
+    # only asks the model when the router's scores are ambiguous
+    routing_mode: str = "llm"
+    router: AdvisorRouter = field(default_factory=AdvisorRouter)
+    # Picks the model per call from its directive (see ModelRouter); shared with managers
+    # registered afterwards. None uses `model` for everything.
+    model_router: Optional[ModelRouter] = None
+    # Send a JSON schema as Ollama's `format` for structured answers, and extra attempts when an
+    # answer does not parse; both are passed on to managers registered afterwards
+    structured_output: bool = False
+    parse_retries: int = 1
+    # Watches every manager registered afterwards and is notified when experiences add
+    # memories; start() it to consolidate in the background
+    consolidator: Optional[MemoryConsolidator] = None
 
     decide_memory_units_to_consult_directive: str = """
 You decide which personalities to consult when making a decision.
@@ -42,49 +72,353 @@ Payload (JSON):
 {payload}
 """.strip()
 
-    def register_memory_manager(self, manager_personality: str, name: Optional[str] = None) -> None:
+    def register_memory_manager(
+        self,
+        manager_personality: str,
+        name: Optional[str] = None,
+        keywords: Iterable[str] = (),
+        model: Optional[str] = None,
+    ) -> None:
         """
         Register a memory manager under a stable id (e.g. 'safety', 'social', etc.).
+        keywords are extra routing terms for routing_mode="local" (e.g. ["bridge", "cliff"]).
+        The manager uses the executive's model unless model is given.
         """
-        manager = MemoryManager(manager_personality=manager_personality)
+        # Managers share the executive's client so every call goes through one connection pool
+        manager = MemoryManager(
+            manager_personality=manager_personality,
+            model=model or self.model,
+            llm_client=self.llm_client,
+            model_router=self.model_router,
+            structured_output=self.structured_output,
+            parse_retries=self.parse_retries,
+            keywords=list(keywords),
+        )
+        self.add_memory_manager(manager, name)
+
+    def add_memory_manager(self, manager: MemoryManager, name: Optional[str] = None) -> str:
+        """Register an already built manager (e.g. one restored from a snapshot) and return its key."""
         key = name or manager.manager_id
         self.memory_units[key] = manager
+        self.router.add(key, manager.manager_personality, manager.keywords)
+        if self.consolidator is not None:
+            self.consolidator.watch(manager.memory, manager.manager_personality)
+        return key
 
-    def decide_action(self, scenario: str) -> str:
+    def _selector_prompt(self, scenario: str) -> str:
         # Build the "personalities catalog" for the selector model
         personalities = {mid: mgr.manager_personality for mid, mgr in self.memory_units.items()}
         selector_payload = {"personalities": personalities, "scenario": scenario}
 
-        selector_prompt = self.decide_memory_units_to_consult_directive.format(
-            payload=json.dumps(selector_payload, ensure_ascii=False)
-        )
-
-        selected_managers_raw = self.llm_client.generate(model=self.model, prompt=selector_prompt).strip()
+        return build_prompt(self.decide_memory_units_to_consult_directive, selector_payload)
 
+    def _parse_selected_manager_ids(self, selected_managers_raw: str) -> List[str]:
         # Parse selected manager ids safely
         try:
-            selected_manager_ids = json.loads(selected_managers_raw)
-            if not isinstance(selected_manager_ids, list) or not all(isinstance(x, str) for x in selected_manager_ids):
-                selected_manager_ids = []
-        except json.JSONDecodeError:
-            selected_manager_ids = []
+            return self._parse_selected_manager_ids_strict(selected_managers_raw)
+        except ValueError:
+            return []
+
+    def _parse_selected_manager_ids_strict(self, selected_managers_raw: str) -> List[str]:
+        # Raises ValueError unless the output holds a JSON array of strings (lets the call retry)
+        selected_manager_ids = parse_id_array(selected_managers_raw)
+
+        # Filter to valid ids only (no hallucinated ids); a manager is consulted at most once
+        return [mid for mid in dict.fromkeys(selected_manager_ids) if mid in self.memory_units]
+
+    def _decision_prompt(self, summaries: List[str], scenario: str) -> str:
+        decision_payload = {"advisor_insights": summaries, "scenario": scenario}
+        return build_prompt(self.make_decision_directive, decision_payload)
+
+    @property
+    def tracer(self) -> Optional[Tracer]:
+        return getattr(self.llm_client, "tracer", None)
+
+    def _phase_deadlines(self, deadline: Optional[float]) -> Tuple[Optional[float], Optional[float]]:
+        """
+        Split a decision budget of `deadline` seconds into absolute time.perf_counter() deadlines
+        for the advisor phase (selector + advisors) and for the final decision call.
+        """
+        if deadline is None:
+            return None, None
+        now = time.perf_counter()
+        return now + deadline * (1 - self.decision_budget_share), now + deadline
+
+    def _local_route(self, scenario: str) -> Optional[List[str]]:
+        if self.routing_mode != "local":
+            return None
+        route = self.router.cached(scenario)
+        routing = "cached"
+        if route is None:
+            route = self.router.route(scenario)
+            routing = "local"
+        if route is None:
+            return None
+        annotate(routing=routing, selected_units=route)
+        # Units added to memory_units directly are unknown to the router; never return stale ids
+        return [mid for mid in route if mid in self.memory_units]
+
+    def _remember_route(self, scenario: str, selected_manager_ids: List[str]) -> None:
+        if self.routing_mode == "local":
+            annotate(routing="llm_fallback", selected_units=selected_manager_ids)
+            self.router.remember(scenario, selected_manager_ids)
+
+    def _select_units(self, scenario: str, deadline: Optional[float] = None) -> List[str]:
+        route = self._local_route(scenario)
+        if route is not None:
+            return route
+        try:
+            selected_manager_ids = routed_generate(
+                self.llm_client, self.model_router, self.model, self._selector_prompt(scenario),
+                "executive.select_units", deadline=deadline,
+                parse=self._parse_selected_manager_ids_strict, retries=self.parse_retries, default=[],
+                extra_params=structured_params(ID_ARRAY_SCHEMA, self.structured_output),
+            )
+        except DeadlineExceeded:
+            # No time to pick advisors; decide without them
+            annotate(selector_timed_out=True)
+            return []
+        self._remember_route(scenario, selected_manager_ids)
+        return selected_manager_ids
+
+    async def _aselect_units(self, scenario: str, deadline: Optional[float] = None) -> List[str]:
+        route = self._local_route(scenario)
+        if route is not None:
+            return route
+        try:
+            selected_manager_ids = await routed_agenerate(
+                self.llm_client, self.model_router, self.model, self._selector_prompt(scenario),
+                "executive.select_units", deadline=deadline,
+                parse=self._parse_selected_manager_ids_strict, retries=self.parse_retries, default=[],
+                extra_params=structured_params(ID_ARRAY_SCHEMA, self.structured_output),
+            )
+        except DeadlineExceeded:
+            annotate(selector_timed_out=True)
+            return []
+        self._remember_route(scenario, selected_manager_ids)
+        return selected_manager_ids
 
-        # Filter to valid ids only (no hallucinated ids)
-        selected_manager_ids = [mid for mid in selected_manager_ids if mid in self.memory_units]
+    def _gather_insights(self, scenario: str, deadline: Optional[float] = None) -> List[str]:
+        selected_manager_ids = self._select_units(scenario, deadline)
 
         # If selector returns nothing, you can still choose to consult all or none.
         # I’ll default to consulting none, because that matches your prompt.
-        summaries: List[str] = []
-        for manager_id in selected_manager_ids:
-            s = self.memory_units[manager_id].get_memory_summary(scenario=scenario)
-            if s.strip():
-                summaries.append(s.strip())
-        
-        print(summaries)
+        return self.consult_memory_units(selected_manager_ids, scenario, deadline)
 
-        decision_payload = {"advisor_insights": summaries, "scenario": scenario}
-        decision_prompt = self.make_decision_directive.format(
-            payload=json.dumps(decision_payload, ensure_ascii=False)
-        )
+    def decide_action(self, scenario: str, deadline: Optional[float] = None) -> str:
+        """
+        deadline is a latency budget in seconds for the whole decision. Advisors share the
+        first (1 - decision_budget_share) of it; those that have not answered by then are
+        abandoned and listed as skipped_advisors on the decision span, and the decision is made
+        from the insights that did arrive.
+        """
+        advisors_deadline, decision_deadline = self._phase_deadlines(deadline)
+        with maybe_span(self.tracer, "decision", scenario=scenario, deadline_s=deadline) as span:
+            summaries = self._gather_insights(scenario, advisors_deadline)
+            if span is not None:
+                span.set(advisor_insights=summaries)
+            return routed_generate(
+                self.llm_client, self.model_router, self.model, self._decision_prompt(summaries, scenario),
+                "executive.decide", deadline=decision_deadline,
+            )
+
+    def decide_action_stream(self, scenario: str, deadline: Optional[float] = None) -> Iterator[str]:
+        """
+        Same pipeline as decide_action(), but the final decision is yielded token by token
+        while the model is still generating it. Advisor consultation happens before the
+        first token, so time-to-first-token is selector + slowest advisor + first chunk.
+        With a deadline, what is left of it after the advisors bounds the wait for each chunk.
+        """
+        advisors_deadline, decision_deadline = self._phase_deadlines(deadline)
+        tracer = self.tracer
+        span = tracer.start_span("decision", scenario=scenario, stream=True, deadline_s=deadline) if tracer is not None else None
+        error: Optional[BaseException] = None
+        try:
+            # The span is only active while our own code runs, never across a yield
+            with activate(span):
+                summaries = self._gather_insights(scenario, advisors_deadline)
+                if span is not None:
+                    span.set(advisor_insights=summaries)
+                tokens = self.llm_client.generate_stream(
+                    model=self.model_router.model_for("executive.decide") if self.model_router else self.model,
+                    prompt=self._decision_prompt(summaries, scenario), caller="executive.decide",
+                    timeout=time_left(decision_deadline),
+                )
+            while True:
+                with activate(span):
+                    token = next(tokens, None)
+                if token is None:
+                    break
+                yield token
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            if span is not None:
+                tracer.end_span(span, error)
+
+    async def adecide_action(self, scenario: str, deadline: Optional[float] = None) -> str:
+        """
+        Async counterpart of decide_action(). Advisors are awaited concurrently on the
+        client's async connection pool, capped at max_concurrent_consultations. With a
+        deadline, advisors still running when their share of it ends are cancelled.
+        """
+        advisors_deadline, decision_deadline = self._phase_deadlines(deadline)
+        with maybe_span(self.tracer, "decision", scenario=scenario, deadline_s=deadline) as span:
+            selected_manager_ids = await self._aselect_units(scenario, advisors_deadline)
+
+            slots = asyncio.Semaphore(max(1, self.max_concurrent_consultations))
+
+            async def consult(manager_id: str) -> str:
+                submitted_at = time.perf_counter()
+                async with slots:
+                    queue_ms = (time.perf_counter() - submitted_at) * 1e3
+                    with maybe_span(self.tracer, "advisor", queue_ms=queue_ms, manager_id=manager_id):
+                        return await self.memory_units[manager_id].aget_memory_summary(
+                            scenario=scenario, deadline=advisors_deadline
+                        )
+
+            if advisors_deadline is None:
+                # gather() keeps results in argument order
+                raw_summaries = await asyncio.gather(*(consult(mid) for mid in selected_manager_ids))
+            else:
+                tasks = [asyncio.ensure_future(consult(mid)) for mid in selected_manager_ids]
+                if tasks:
+                    _, late = await asyncio.wait(tasks, timeout=max(0.0, advisors_deadline - time.perf_counter()))
+                    for task in late:
+                        task.cancel()
+                    await asyncio.gather(*late, return_exceptions=True)
+                raw_summaries, skipped = [], []
+                for mid, task in zip(selected_manager_ids, tasks):
+                    if task.cancelled() or isinstance(task.exception(), DeadlineExceeded):
+                        skipped.append(mid)
+                    else:
+                        raw_summaries.append(task.result())
+                if skipped:
+                    annotate(skipped_advisors=skipped)
+
+            summaries = [s.strip() for s in raw_summaries if s.strip()]
+            if span is not None:
+                span.set(advisor_insights=summaries)
+
+            return await routed_agenerate(
+                self.llm_client, self.model_router, self.model, self._decision_prompt(summaries, scenario),
+                "executive.decide", deadline=decision_deadline,
+            )
+
+    def _consult_memory_unit(
+        self, manager_id: str, scenario: str, submitted_at: float, deadline: Optional[float] = None
+    ) -> str:
+        queue_ms = (time.perf_counter() - submitted_at) * 1e3
+        with maybe_span(self.tracer, "advisor", queue_ms=queue_ms, manager_id=manager_id) as span:
+            summary = self.memory_units[manager_id].get_memory_summary(scenario=scenario, deadline=deadline)
+            if span is not None:
+                span.set(insight=summary)
+            return summary
+
+    def consult_memory_units(self, manager_ids: List[str], scenario: str, deadline: Optional[float] = None) -> List[str]:
+        """
+        Collect a memory summary from each manager in manager_ids.
+        Insights are returned in the order of manager_ids regardless of completion order;
+        empty summaries are dropped.
+
+        With a deadline (a time.perf_counter() value), advisors that have not answered by then
+        are skipped: queued ones never start, running ones are left to hit their own timeout
+        and skip their memory select (so a skipped advisor leaves its memories as they were),
+        and their ids are recorded as skipped_advisors on the active span. Advisors consulted
+        one after another split whatever time is left evenly.
+        """
+        skipped: List[str] = []
+        if self.concurrent_consultation and len(manager_ids) > 1 and self.max_concurrent_consultations > 1:
+            workers = min(self.max_concurrent_consultations, len(manager_ids))
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="consult")
+            try:
+                submitted_at = time.perf_counter()
+                futures = [
+                    pool.submit(run_in_context(self._consult_memory_unit), mid, scenario, submitted_at, deadline)
+                    for mid in manager_ids
+                ]
+                if deadline is not None:
+                    wait(futures, timeout=max(0.0, deadline - time.perf_counter()))
+                # Collect in submission order, which keeps the insight order deterministic
+                raw_summaries = []
+                for mid, future in zip(manager_ids, futures):
+                    if deadline is not None and not future.done():
+                        future.cancel()
+                        skipped.append(mid)
+                        continue
+                    try:
+                        raw_summaries.append(future.result())
+                    except DeadlineExceeded:
+                        skipped.append(mid)
+            finally:
+                # Without a deadline this waits for every advisor; with one, late advisors are abandoned
+                pool.shutdown(wait=deadline is None, cancel_futures=True)
+        else:
+            raw_summaries = []
+            for i, mid in enumerate(manager_ids):
+                advisor_deadline = None
+                if deadline is not None:
+                    now = time.perf_counter()
+                    if now >= deadline:
+                        skipped.extend(manager_ids[i:])
+                        break
+                    advisor_deadline = now + (deadline - now) / (len(manager_ids) - i)
+                try:
+                    raw_summaries.append(self._consult_memory_unit(mid, scenario, time.perf_counter(), advisor_deadline))
+                except DeadlineExceeded:
+                    skipped.append(mid)
+
+        if skipped:
+            annotate(skipped_advisors=skipped)
+        return [s.strip() for s in raw_summaries if s.strip()]
+
+    def retain_experience(self, scenario: str, action_taken: str, result: str) -> None:
+        """Offer one experience to every memory unit concurrently."""
+        self.retain_experiences([(scenario, action_taken, result)])
+
+    def retain_experiences(self, experiences: Iterable[Tuple[str, str, str]]) -> None:
+        """
+        Ingest a batch of (scenario, action_taken, result) experiences, e.g. a whole session log.
+
+        Every (experience, memory unit) pair is evaluated in a pool of max_concurrent_retentions
+        workers. Resulting memories are added afterwards on this thread, in experience order per
+        unit, so collections never see concurrent writes and end up as if ingested serially.
+        Pairs whose model calls fail are skipped; once the others are stored their errors are
+        raised together as an ExceptionGroup, each noting its unit and experience index.
+        """
+        experiences = list(experiences)
+        jobs = [
+            (name, manager, index, experience)
+            for index, experience in enumerate(experiences)
+            for name, manager in self.memory_units.items()
+        ]
+        if not jobs:
+            return
+
+        def evaluate(job):
+            _, manager, _, (scenario, action_taken, result) = job
+            return manager.experience_to_memory(scenario, action_taken, result)
+
+        with maybe_span(self.tracer, "retain", experiences=len(experiences), units=len(self.memory_units)):
+            workers = max(1, min(self.max_concurrent_retentions, len(jobs)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="retain") as pool:
+                futures = [pool.submit(run_in_context(evaluate), job) for job in jobs]
 
-        return self.llm_client.generate(model=self.model, prompt=decision_prompt)
+            added = 0
+            failures: List[Exception] = []
+            for (name, manager, index, _), future in zip(jobs, futures):
+                try:
+                    new_memory = future.result()
+                except Exception as exc:
+                    exc.add_note(f"retaining experience {index} in memory unit {name!r}")
+                    failures.append(exc)
+                    continue
+                if new_memory is not None:
+                    manager.memory.add(new_memory)
+                    added += 1
+            if self.consolidator is not None and added:
+                self.consolidator.notify()
+            if failures:
+                annotate(failed_retentions=len(failures))
+                raise ExceptionGroup(f"{len(failures)} of {len(jobs)} retentions failed", failures)
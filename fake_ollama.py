@@ -0,0 +1,369 @@
+"""
+Local stand-in for an Ollama server, for benchmarks and offline runs.
+
+Speaks enough of the /api/generate (blocking and NDJSON streaming) and /api/embeddings
+protocol for OllamaClient, and answers every directive in this repo with a deterministic
+canned response: id arrays for selection prompts, {"memory_ids", "advice"} objects for fused
+consults, "true" for keep decisions and a fixed sentence otherwise. Latency is simulated per
+prompt token and per generated token, and optionally per model swap. Run several on
+different ports to stand in for a pool of servers.
+
+    python fake_ollama.py --port 11434 --per-token-latency 0.02
+"""
+from __future__ import annotations
+
+import argparse
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import multiprocessing
+import re
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from prompting import PrefixTracker
+from vector_index import HashingEmbedder
+
+
+CANNED_TEXT = "Inspect the runes and test the bridge before anyone crosses, then decide as a party."
+
+_PAYLOAD_MARKER = re.compile(r"Payl\w*d \(JSON\):?")
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _extract_payload(prompt: str) -> Dict[str, Any]:
+    match = None
+    for match in _PAYLOAD_MARKER.finditer(prompt):
+        pass
+    start = prompt.find("{", match.end() if match else 0)
+    if start < 0:
+        return {}
+    try:
+        payload, _ = json.JSONDecoder().raw_decode(prompt[start:])
+    except json.JSONDecodeError:
+        return {}
+    return payload if isinstance(payload, dict) else {}
+
+
+def _candidate_ids(payload: Dict[str, Any]) -> List[str]:
+    for key in ("personalities", "memory", "memories"):
+        value = payload.get(key)
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except json.JSONDecodeError:
+                continue
+        if isinstance(value, dict):
+            return list(value)
+    return []
+
+
+@dataclass
+class FakeOllamaConfig:
+    # Fixed cost per request, plus per prompt token (prefill) and per generated token (decode)
+    base_latency: float = 0.0
+    prompt_token_latency: float = 0.0
+    per_token_latency: float = 0.0
+    # Number of ids returned for id-array prompts
+    select_count: int = 2
+    canned_text: str = CANNED_TEXT
+    # Simulated prompt (KV) cache: the prefix a prompt shares with one of the last N prompts is
+    # not charged prompt_token_latency nor counted in prompt_eval_count. 0 disables it.
+    prompt_cache_slots: int = 0
+    # Per-model multiplier on all simulated latency (e.g. {"qwen2.5:1.5b-instruct": 0.3})
+    model_latency_scale: Dict[str, float] = field(default_factory=dict)
+    # Models whose answers come wrapped in chatty prose, like a small model ignoring "ONLY JSON";
+    # requests with a `format` schema are answered cleanly, as constrained decoding would
+    chatty_models: List[str] = field(default_factory=list)
+    # Models this server has; others get a 404 like an unpulled model. None serves any model.
+    models: Optional[List[str]] = None
+    # Model swaps: requests for a model that is not among the last max_loaded_models used pay
+    # model_load_latency first (reported as load_duration). 0 disables the simulation.
+    max_loaded_models: int = 0
+    model_load_latency: float = 0.0
+
+
+def canned_response(prompt: str, config: FakeOllamaConfig) -> str:
+    if '"memory_ids"' in prompt:
+        ids = _candidate_ids(_extract_payload(prompt))
+        return json.dumps({"memory_ids": ids[: config.select_count], "advice": config.canned_text})
+    if "JSON array of strings" in prompt:
+        ids = _candidate_ids(_extract_payload(prompt))
+        return json.dumps(ids[: config.select_count])
+    if 'Return the word "true"' in prompt:
+        return "true"
+    return config.canned_text
+
+
+@dataclass
+class FakeOllamaStats:
+    requests: int = 0
+    prompt_bytes: int = 0
+    prompt_tokens: int = 0
+    cached_prompt_tokens: int = 0
+    eval_tokens: int = 0
+    simulated_seconds: float = 0.0
+    model_loads: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, prompt: str, eval_tokens: int, simulated: float, cached_tokens: int = 0, loaded: bool = False) -> None:
+        with self._lock:
+            self.requests += 1
+            self.model_loads += loaded
+            self.prompt_bytes += len(prompt.encode("utf-8"))
+            self.prompt_tokens += _approx_tokens(prompt)
+            self.cached_prompt_tokens += cached_tokens
+            self.eval_tokens += eval_tokens
+            self.simulated_seconds += simulated
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "prompt_bytes": self.prompt_bytes,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_prompt_tokens": self.cached_prompt_tokens,
+                "eval_tokens": self.eval_tokens,
+                "simulated_seconds": self.simulated_seconds,
+                "model_loads": self.model_loads,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = self.prompt_bytes = self.prompt_tokens = self.cached_prompt_tokens = self.eval_tokens = 0
+            self.model_loads = 0
+            self.simulated_seconds = 0.0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, delayed ACKs add ~40 ms per call
+    disable_nagle_algorithm = True
+    server: "_FakeHTTPServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, obj: Any, status: int = 200) -> None:
+        data = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self) -> None:
+        if self.path == "/_stats":
+            self._send_json(self.server.stats.as_dict())
+        elif self.path in ("/", "/api/version"):
+            self._send_json({"version": "fake"})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self) -> None:
+        body = self._read_json()
+        if self.path == "/_reset":
+            self.server.stats.reset()
+            self._send_json({})
+        elif self.path == "/api/embeddings":
+            self._send_json({"embedding": [float(x) for x in self.server.embedder(body.get("prompt", ""))]})
+        elif self.path == "/api/generate":
+            self._generate(body)
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def _generate(self, body: Dict[str, Any]) -> None:
+        config = self.server.config
+        model = body.get("model", "")
+        prompt = body.get("prompt", "")
+        if config.models is not None and model not in config.models:
+            self._send_json({"error": f'model "{model}" not found, try pulling it first'}, status=404)
+            return
+        loaded = self.server.load_model(model)
+        text = canned_response(prompt, config)
+        if model in config.chatty_models and not body.get("format"):
+            text = f"Sure! Here is my answer: {text}"
+        # Split on whitespace but keep it attached, so the chunks concatenate back to text
+        tokens = re.findall(r"\S+\s*", text) or [text]
+        prompt_tokens = _approx_tokens(prompt)
+        cached_tokens = 0
+        if self.server.prompt_cache is not None:
+            cached_tokens = min(prompt_tokens - 1, self.server.prompt_cache.observe(model, prompt) // 4)
+        evaluated_tokens = prompt_tokens - cached_tokens
+
+        scale = config.model_latency_scale.get(model, 1.0)
+        load = config.model_load_latency if loaded else 0.0
+        prefill = (config.base_latency + config.prompt_token_latency * evaluated_tokens) * scale
+        decode = config.per_token_latency * len(tokens) * scale
+        self.server.stats.record(prompt, len(tokens), load + prefill + decode, cached_tokens, loaded)
+        started = time.perf_counter()
+
+        final = {
+            "model": model,
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": evaluated_tokens,
+            "eval_count": len(tokens),
+            "load_duration": int(load * 1e9),
+            "prompt_eval_duration": int(prefill * 1e9),
+            "eval_duration": int(decode * 1e9),
+        }
+
+        time.sleep(load + prefill)
+        if not body.get("stream", True):
+            time.sleep(decode)
+            final["response"] = text
+            final["total_duration"] = int((time.perf_counter() - started) * 1e9)
+            self._send_json(final)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write_chunk(obj: Dict[str, Any]) -> None:
+            line = (json.dumps(obj) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+            self.wfile.flush()
+
+        for token in tokens:
+            time.sleep(config.per_token_latency * scale)
+            write_chunk({"model": model, "response": token, "done": False})
+        final["response"] = ""
+        final["total_duration"] = int((time.perf_counter() - started) * 1e9)
+        write_chunk(final)
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class _FakeHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config: FakeOllamaConfig) -> None:
+        super().__init__(address, _Handler)
+        self.config = config
+        self.stats = FakeOllamaStats()
+        self.embedder = HashingEmbedder()
+        self.prompt_cache = PrefixTracker(slots=config.prompt_cache_slots) if config.prompt_cache_slots > 0 else None
+        self._loaded_models: "OrderedDict[str, None]" = OrderedDict()
+        self._models_lock = threading.Lock()
+
+    def load_model(self, model: str) -> bool:
+        """Mark model as most recently used; True if it had to be (re)loaded first."""
+        if self.config.max_loaded_models <= 0:
+            return False
+        with self._models_lock:
+            loaded = model not in self._loaded_models
+            self._loaded_models[model] = None
+            self._loaded_models.move_to_end(model)
+            while len(self._loaded_models) > self.config.max_loaded_models:
+                self._loaded_models.popitem(last=False)
+            return loaded
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients that time out hang up mid-response; that is expected, not a server error
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class FakeOllamaServer:
+    """In-process fake server on a background thread. Use as a context manager."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: Optional[FakeOllamaConfig] = None) -> None:
+        self._httpd = _FakeHTTPServer((host, port), config or FakeOllamaConfig())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def config(self) -> FakeOllamaConfig:
+        return self._httpd.config
+
+    @property
+    def stats(self) -> FakeOllamaStats:
+        return self._httpd.stats
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def _serve(host: str, port: int, config: FakeOllamaConfig, ready) -> None:
+    server = FakeOllamaServer(host, port, config)
+    ready.put(server.url)
+    server._httpd.serve_forever()
+
+
+def start_in_subprocess(
+    host: str = "127.0.0.1", port: int = 0, config: Optional[FakeOllamaConfig] = None
+) -> "tuple[multiprocessing.Process, str]":
+    """
+    Run the fake server in a child process so its CPU time does not count against the
+    caller's (used by benchmark.py to isolate client-side overhead). Returns (process, url);
+    terminate the process when done.
+    """
+    ready = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_serve, args=(host, port, config or FakeOllamaConfig(), ready), daemon=True)
+    proc.start()
+    return proc, ready.get(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local stand-in Ollama server with canned responses.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--base-latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--prompt-token-latency", type=float, default=0.0, help="seconds per prompt token")
+    parser.add_argument("--per-token-latency", type=float, default=0.0, help="seconds per generated token")
+    parser.add_argument("--select-count", type=int, default=2, help="ids returned for selection prompts")
+    parser.add_argument("--prompt-cache-slots", type=int, default=0, help="simulated prompt cache size (prompts)")
+    parser.add_argument("--models", nargs="*", help="models this server has (others get 404); default any")
+    parser.add_argument("--max-loaded-models", type=int, default=0, help="simulate model swaps beyond this many models")
+    parser.add_argument("--model-load-latency", type=float, default=0.0, help="seconds per simulated model load")
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(
+        base_latency=args.base_latency,
+        prompt_token_latency=args.prompt_token_latency,
+        per_token_latency=args.per_token_latency,
+        select_count=args.select_count,
+        prompt_cache_slots=args.prompt_cache_slots,
+        models=args.models,
+        max_loaded_models=args.max_loaded_models,
+        model_load_latency=args.model_load_latency,
+    )
+    server = FakeOllamaServer(args.host, args.port, config)
+    print(f"fake ollama listening on {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
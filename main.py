@@ -2,6 +2,22 @@ from __future__ import annotations
 
 from memory import Memory
 from executive import Executive
+from ollama_client import OllamaClient
+from tracing import InMemoryCollector, Tracer
+
+
+COUNCIL = {
+    "safety": "You prioritize keeping the host alive and uninjured. Focus on danger cues, near-misses, and practical safety rules.",
+    "social": "You prioritize social dynamics: persuasion, manipulation, trust, authority pressure, and interpersonal consequences.",
+    "arcana": "You prioritize magical risks: curses, enchantments, infernal signs, and supernatural threat patterns.",
+    "values": "You prioritize long-term goals and commitments: promises, party safety, moral boundaries, and avoiding self-sabotage.",
+}
+
+SCENARIO = (
+    "On a narrow mountain pass, a charismatic guide urges you to cross a swaying rope bridge quickly. "
+    "You notice strange runes carved into the posts and a faint whispering sensation as you approach. "
+    "Your party looks to you to decide whether to cross, inspect, or find another route."
+)
 
 
 def seed_manager_memories(exec_: Executive) -> None:
@@ -47,38 +63,27 @@ def seed_manager_memories(exec_: Executive) -> None:
 
 
 def main() -> None:
-    executive = Executive()
+    spans = InMemoryCollector()
+    executive = Executive(llm_client=OllamaClient(tracer=Tracer(exporters=[spans]), keep_alive="30m"))
 
     # Register a small council
-    executive.register_memory_manager(
-        "You prioritize keeping the host alive and uninjured. Focus on danger cues, near-misses, and practical safety rules.",
-        name="safety"
-    )
-    executive.register_memory_manager(
-        "You prioritize social dynamics: persuasion, manipulation, trust, authority pressure, and interpersonal consequences.",
-        name="social"
-    )
-    executive.register_memory_manager(
-        "You prioritize magical risks: curses, enchantments, infernal signs, and supernatural threat patterns.",
-        name="arcana"
-    )
-    executive.register_memory_manager(
-        "You prioritize long-term goals and commitments: promises, party safety, moral boundaries, and avoiding self-sabotage.",
-        name="values"
-    )
+    for name, personality in COUNCIL.items():
+        executive.register_memory_manager(personality, name=name)
 
     # Seed memories for each manager
     seed_manager_memories(executive)
 
-    scenario = (
-        "On a narrow mountain pass, a charismatic guide urges you to cross a swaying rope bridge quickly. "
-        "You notice strange runes carved into the posts and a faint whispering sensation as you approach. "
-        "Your party looks to you to decide whether to cross, inspect, or find another route."
-    )
-
-    decision = executive.decide_action(scenario=scenario)
     print("\n=== EXECUTIVE DECISION ===")
-    print(decision)
+    for token in executive.decide_action_stream(scenario=SCENARIO):
+        print(token, end="", flush=True)
+    print()
+
+    print("\n=== LLM CALLS BY CALLER ===")
+    for caller, row in spans.summary().items():
+        print(
+            f"{caller:<28} calls={row['calls']:<3} wall_ms={row['wall_ms']:8.1f} eval_tokens={row['eval_tokens']} "
+            f"prefix_hit={row['prefix_hit_ratio']:.0%}"
+        )
 
 
 if __name__ == "__main__":
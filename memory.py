@@ -1,11 +1,31 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
+import heapq
 import json
-from typing import List, Dict, Iterable, Optional
+import math
+import threading
+from typing import List, Dict, Iterable, Optional, Tuple, TYPE_CHECKING
 import uuid
 
-from ollama_client import OllamaClient
+from model_routing import ModelRouter, routed_agenerate, routed_generate
+from ollama_client import OllamaClient, time_left
+from prompting import (
+    BOOLEAN_SCHEMA,
+    FUSED_CONSULT_SCHEMA,
+    ID_ARRAY_SCHEMA,
+    RawJSON,
+    build_prompt,
+    estimate_tokens,
+    parse_bool,
+    parse_id_array,
+    parse_json_object,
+    structured_params,
+)
+from tracing import annotate, maybe_span
+
+if TYPE_CHECKING:
+    from vector_index import VectorIndex
 
 
 @dataclass
@@ -30,22 +50,239 @@ class Memory:
     def get_memory_statement(self) -> str:
         return self.statement
 
+
+# json.dumps(s, ensure_ascii=False) for a str, without building a JSONEncoder per call
+_encode_str = json.encoder.encode_basestring
+
+
+def _memory_fragment(memory_id: str, statement: str) -> str:
+    return f"{_encode_str(memory_id)}: {_encode_str(statement)}"
+
+
+def steps_until_expiry(strength_initial: float, decay_rate: float, step: int, current_strength: float) -> Optional[int]:
+    """
+    Number of further decay() calls after which a memory's strength is <= 0 (0 if it already
+    is), or None if it never gets there.
+    """
+    if current_strength <= 0:
+        return 0
+    if decay_rate <= 0:
+        return None
+
+    def strength_after(n: int) -> float:
+        return strength_initial - (decay_rate * (step + n))
+
+    # Closed-form estimate, then nudge so the float comparison matches decay() exactly
+    n = max(1, math.ceil(strength_initial / decay_rate - step))
+    while n > 1 and strength_after(n - 1) <= 0:
+        n -= 1
+    while strength_after(n) > 0:
+        n += 1
+    return n
+
+
+class _SettlingMemories(dict):
+    """
+    memories of a lazy-decay MemoryCollection. Reading a memory through it first folds in the
+    decay it has pending, so current_strength/step read exactly as they would in eager mode.
+    """
+
+    def __init__(self, memories: Iterable = (), collection: Optional[MemoryCollection] = None) -> None:
+        super().__init__(memories)
+        self._collection = collection
+
+    def __getitem__(self, memory_id: str) -> Memory:
+        mem = super().__getitem__(memory_id)
+        self._collection._settle_locked(mem)
+        return mem
+
+    def get(self, memory_id: str, default: Optional[Memory] = None) -> Optional[Memory]:
+        mem = super().get(memory_id)
+        if mem is None:
+            return default
+        self._collection._settle_locked(mem)
+        return mem
+
+    def values(self):
+        self._collection.settle()
+        return super().values()
+
+    def items(self):
+        self._collection.settle()
+        return super().items()
+
+
 @dataclass
 class MemoryCollection:
     memories: Dict[str, Memory] = field(default_factory=dict)
+    # Optional embedding index kept in step with add/prune, used by search()
+    index: Optional[VectorIndex] = None
+    # Lazy decay: select() advances a collection-wide clock instead of calling decay() on every
+    # memory, and prune() pops expired memories from a heap, so a select costs
+    # O(selected + pruned). Pending decay is folded into a memory whenever it is read through
+    # `memories`, so reads match eager mode; a Memory reference held across selects goes stale
+    # until it is read through the collection again. Only mutate member memories through the
+    # collection (select/add) in this mode.
+    lazy_decay: bool = False
+
+    # Lazy decay bookkeeping: select() count, and the tick each memory's stored values are exact at
+    _clock: int = field(default=0, init=False, repr=False, compare=False)
+    _anchor: Dict[str, int] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _expiry_heap: List[Tuple[int, str]] = field(default_factory=list, init=False, repr=False, compare=False)
+    _expiry: Dict[str, int] = field(default_factory=dict, init=False, repr=False, compare=False)
+    # Serialized '"id": "statement"' fragment per memory, kept in step with add/remove, plus the
+    # joined unbudgeted object (rebuilt only after the collection changes)
+    _fragments: Dict[str, str] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _joined: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    # Guards every public method, so a background MemoryConsolidator can merge while decisions run
+    _lock: threading.RLock = field(default_factory=threading.RLock, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        if self.lazy_decay:
+            self.memories = _SettlingMemories(self.memories, self)
+        for memory_id, mem in dict.items(self.memories):
+            self._fragments[memory_id] = _memory_fragment(memory_id, mem.statement)
+            # An index passed in already holding a memory (e.g. restored from a snapshot) is kept as is
+            if self.index is not None and memory_id not in self.index:
+                self.index.add(memory_id, mem.statement)
+            if self.lazy_decay:
+                self._anchor[memory_id] = self._clock
+                self._schedule_expiry(mem)
 
     def add(self, memory: Memory) -> str:
         """Insert and return the memory_id."""
-        self.memories[memory.memory_id] = memory
-        return memory.memory_id
+        with self._lock:
+            self.memories[memory.memory_id] = memory
+            self._fragments[memory.memory_id] = _memory_fragment(memory.memory_id, memory.statement)
+            self._joined = None
+            if self.index is not None:
+                self.index.add(memory.memory_id, memory.statement)
+            if self.lazy_decay:
+                self._anchor[memory.memory_id] = self._clock
+                self._schedule_expiry(memory)
+            return memory.memory_id
+
+    def get_as_string(self, token_budget: Optional[int] = None) -> str:
+        """
+        The collection as a JSON object {memory_id: statement}, assembled from cached per-memory
+        fragments. With token_budget, only the strongest memories (ties broken by most recently
+        refreshed, then most recently added) that fit the budget are included, still in
+        insertion order.
+        """
+        with self._lock:
+            if len(self._fragments) != len(self.memories):
+                # memories was modified directly rather than through add(); resync the cache
+                self._fragments = {k: _memory_fragment(k, m.statement) for k, m in self.memories.items()}
+                self._joined = None
+
+            if token_budget is None:
+                if self._joined is None:
+                    self._joined = "{" + ", ".join(self._fragments.values()) + "}"
+                return self._joined
+
+            order = {memory_id: i for i, memory_id in enumerate(self.memories)}
+            ranked = sorted(
+                self.memories.items(),
+                key=lambda kv: (-kv[1].current_strength, kv[1].step, -order[kv[0]]),
+            )
+            budget = token_budget - estimate_tokens("{}")
+            kept = set()
+            for memory_id, _ in ranked:
+                cost = estimate_tokens(self._fragments[memory_id]) + 1
+                if cost > budget:
+                    break
+                budget -= cost
+                kept.add(memory_id)
+            return "{" + ", ".join(frag for memory_id, frag in self._fragments.items() if memory_id in kept) + "}"
+
+    def _remove(self, memory_id: str) -> None:
+        mem = self.memories.pop(memory_id, None)
+        if mem is None:
+            return
+        self._fragments.pop(memory_id, None)
+        self._joined = None
+        if self.index is not None:
+            self.index.remove(memory_id)
+        if self.lazy_decay:
+            # A memory that leaves the collection stops decaying, as it would in eager mode
+            self._settle(mem)
+            self._anchor.pop(memory_id, None)
+            self._expiry.pop(memory_id, None)
 
-    def get_as_string(self):
-        memory_dict = {memory_id: mem.statement for memory_id, mem in self.memories.items()}
-        return json.dumps(memory_dict, ensure_ascii=False)
-    
     def prune(self) -> None:
-        for k in [k for k, v in self.memories.items() if v.current_strength <= 0]:
-            self.memories.pop(k, None)
+        with self._lock:
+            if self.lazy_decay:
+                self._prune_expired()
+                return
+            for k in [k for k, v in self.memories.items() if v.current_strength <= 0]:
+                self._remove(k)
+
+    def _settle(self, mem: Memory) -> None:
+        """Fold the ticks since mem was last settled into its stored step/current_strength."""
+        anchor = self._anchor.get(mem.memory_id)
+        if anchor is None or anchor == self._clock:
+            return
+        self._anchor[mem.memory_id] = self._clock
+        if mem.decay_rate != 0:
+            mem.step += self._clock - anchor
+            # Same expression decay() evaluates, so lazy and eager strengths are bit-identical
+            mem.current_strength = mem.strength_initial - (mem.decay_rate * mem.step)
+
+    def _settle_locked(self, mem: Memory) -> None:
+        with self._lock:
+            self._settle(mem)
+
+    def settle(self) -> None:
+        """Bring every memory's stored current_strength/step up to date (only lags in lazy mode)."""
+        with self._lock:
+            for mem in dict.values(self.memories):
+                self._settle(mem)
+
+    def _expiry_tick(self, mem: Memory) -> Optional[int]:
+        """First clock tick at which mem.current_strength <= 0, or None if it never decays away."""
+        steps = steps_until_expiry(mem.strength_initial, mem.decay_rate, mem.step, mem.current_strength)
+        return None if steps is None else self._clock + steps
+
+    def _schedule_expiry(self, mem: Memory) -> None:
+        self._settle(mem)
+        expires_at = self._expiry_tick(mem)
+        if expires_at is None:
+            self._expiry.pop(mem.memory_id, None)
+            return
+        # Older heap entries for this id become stale; _prune_expired skips them
+        self._expiry[mem.memory_id] = expires_at
+        heapq.heappush(self._expiry_heap, (expires_at, mem.memory_id))
+
+        if len(self._expiry_heap) > 2 * len(self._expiry) + 64:
+            self._expiry_heap = [(t, mid) for mid, t in self._expiry.items()]
+            heapq.heapify(self._expiry_heap)
+
+    def _prune_expired(self) -> None:
+        now = self._clock
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, memory_id = heapq.heappop(heap)
+            if self._expiry.get(memory_id) != expires_at:
+                continue
+            mem = self.memories.get(memory_id)
+            if mem is None:
+                self._expiry.pop(memory_id, None)
+                continue
+            self._settle(mem)
+            if mem.current_strength <= 0:
+                self._remove(memory_id)
+            else:
+                self._schedule_expiry(mem)
+
+    def search(self, query: str, k: int, min_score: float = 0.0) -> List[str]:
+        """
+        Return the ids of up to k memories most similar to query, best first.
+        Only reads the index; pass the result to select() to refresh/decay as usual.
+        """
+        with self._lock:
+            if self.index is None:
+                raise ValueError("MemoryCollection.search requires an index")
+            return [memory_id for memory_id, _ in self.index.search(query, k, min_score)]
 
     def select(self, memory_keys: Iterable[str]) -> List[Memory]:   
         """
@@ -53,27 +290,91 @@ class MemoryCollection:
         refreshes those selected memories, and decays all others.
         Unknown keys are ignored.
         """
-        selected_keys = set(memory_keys)
-
-        # Build selected list in the order provided, skipping missing keys
-        selected: List[Memory] = []
-        for k in memory_keys:
-            m = self.memories.get(k)
-            if m is not None:
-                selected.append(m)
-
-        # Refresh selected
-        for m in selected:
-            m.refresh()
+        with self._lock:
+            memory_keys = list(memory_keys)
+            selected_keys = set(memory_keys)
+
+            # Build selected list in the order provided, skipping missing keys
+            selected: List[Memory] = []
+            for k in memory_keys:
+                m = self.memories.get(k)
+                if m is not None:
+                    selected.append(m)
+
+            if self.lazy_decay:
+                # One tick decays every memory; refreshing re-anchors the selected ones at the new tick
+                self._clock += 1
+                for m in selected:
+                    m.refresh()
+                    self._anchor[m.memory_id] = self._clock
+                    self._schedule_expiry(m)
+                self._prune_expired()
+                return selected
+
+            # Refresh selected
+            for m in selected:
+                m.refresh()
+
+            # Decay non-selected
+            for k, m in self.memories.items():
+                if k not in selected_keys:
+                    m.decay()
+
+            self.prune()
+
+            return selected
+
+    def statements(self) -> Dict[str, str]:
+        """A consistent {memory_id: statement} copy of the collection."""
+        with self._lock:
+            return {memory_id: mem.statement for memory_id, mem in self.memories.items()}
+
+    def merge(self, memory_ids: Iterable[str], statement: str) -> Optional[str]:
+        """
+        Replace the listed memories with one memory holding statement and return its id. The
+        merged memory carries their combined current strength (as a fresh, refreshed memory),
+        decays at the slowest of their rates, and goes to the end of the collection. Ids no
+        longer present are ignored; with fewer than two left nothing is merged and None is
+        returned.
+        """
+        with self._lock:
+            members = [self.memories[k] for k in dict.fromkeys(memory_ids) if k in self.memories]
+            if len(members) < 2:
+                return None
+            for m in members:
+                self._settle(m)
+            strength = sum(max(m.current_strength, 0.0) for m in members)
+            merged = Memory(
+                statement=statement,
+                decay_rate=min(m.decay_rate for m in members),
+                strength_initial=strength,
+                current_strength=strength,
+            )
+            for m in members:
+                self._remove(m.memory_id)
+            return self.add(merged)
+
+def check_retrieval_mode(retrieval_mode: str, memory: object) -> None:
+    """Raise ValueError if memory cannot serve retrieval_mode ("vector" needs a collection with an index)."""
+    if retrieval_mode not in ("llm", "vector"):
+        raise ValueError(f"unknown retrieval_mode {retrieval_mode!r}")
+    if retrieval_mode == "vector" and getattr(memory, "index", None) is None:
+        raise ValueError(
+            f'retrieval_mode="vector" needs a memory collection with a VectorIndex; {type(memory).__name__} has none'
+        )
 
-        # Decay non-selected
-        for k, m in self.memories.items():
-            if k not in selected_keys:
-                m.decay()
 
-        self.prune()
+def parse_fused_consult(raw: str) -> Tuple[List[str], str]:
+    """(memory_ids, advice) from a fused consult response. Raises ValueError if it cannot be read."""
+    result = parse_json_object(raw)
+    if result is None:
+        raise ValueError(f"no JSON object in {raw[:80]!r}")
+    ids = result.get("memory_ids")
+    advice = result.get("advice")
+    if not isinstance(ids, list) or not isinstance(advice, str):
+        raise ValueError(f"fused consult needs memory_ids and advice, got {sorted(result)}")
+    return [i for i in ids if isinstance(i, str)], advice.strip()
 
-        return selected
 
 @dataclass
 class MemoryManager:
@@ -82,6 +383,23 @@ class MemoryManager:
     model: str = "qwen2.5:7b-instruct"
     llm_client: OllamaClient = field(default_factory=OllamaClient)
     memory: MemoryCollection = field(default_factory=MemoryCollection)
+    # "llm" asks the model to pick memory ids; "vector" uses memory.search() (requires memory.index)
+    retrieval_mode: str = "llm"
+    retrieval_top_k: int = 3
+    retrieval_min_score: float = 0.0
+    # Cap on the memory listing in the selection prompt (estimated tokens); None sends everything
+    memory_token_budget: Optional[int] = None
+    # "two_step" selects memory ids, then summarizes them; "fused" asks for both in one call
+    # (only applies to retrieval_mode="llm")
+    consult_mode: str = "two_step"
+    # Picks the model per call (and escalates on unparseable output); None uses `model` throughout
+    model_router: Optional[ModelRouter] = None
+    # Extra routing terms for the executive's AdvisorRouter (routing_mode="local")
+    keywords: List[str] = field(default_factory=list)
+    # Send a JSON schema as Ollama's `format` for id-array, boolean and fused answers
+    structured_output: bool = False
+    # Extra attempts on the same model when an answer does not parse
+    parse_retries: int = 1
     select_memories_directive: str = """
 You select which memories are relevant to the scenario.
 
@@ -110,6 +428,21 @@ Payload (JSON):
 {payload}
 """.strip()
     
+    fused_consult_directive: str = """
+You select which memories are relevant to the scenario and write a concise executive memory summary for a decision-maker in accordance with your personality.
+
+Rules:
+- Return ONLY valid JSON (no markdown, no code fences, no extra text).
+- Output format must be exactly a JSON object: {{"memory_ids": ["id1","id2",...], "advice": "..."}}
+- Every id in memory_ids MUST be a key present in payload.memory.
+- Select memories that meaningfully affect decisions in the scenario (risk, goals, constraints, social context, obligations).
+- advice: 1 sentence maximum, ENGLISH ONLY, based only on the selected memories. Do not restate the full scenario—only the key memory-based insight.
+- If none are relevant, return {{"memory_ids": [], "advice": ""}}.
+
+Payload (JSON):
+{payload}
+""".strip()
+
     decide_keep_memory_directive: str = """
 You decide whether to remember anything from the experience you are presented with.
 
@@ -134,7 +467,24 @@ Payload (JSON)
 {payload}
 """.strip()
     
+    def __post_init__(self) -> None:
+        check_retrieval_mode(self.retrieval_mode, self.memory)
+
     def retain_memory(self, scenario: str, action_taken: str, result: str) -> None:
+        new_memory = self.experience_to_memory(scenario, action_taken, result)
+        if new_memory is not None:
+            self.memory.add(new_memory)
+
+    def experience_to_memory(self, scenario: str, action_taken: str, result: str) -> Optional[Memory]:
+        """
+        Run the keep/summarize model calls for one experience and return the memory to store,
+        or None if the manager chose not to remember it. Does not touch self.memory, so
+        several experiences can be processed in parallel and added in order afterwards.
+        """
+        with maybe_span(getattr(self.llm_client, "tracer", None), "manager.retain", manager_id=self.manager_id):
+            return self._experience_to_memory(scenario, action_taken, result)
+
+    def _experience_to_memory(self, scenario: str, action_taken: str, result: str) -> Optional[Memory]:
         payload = {
             "experience": {
                 "scenario": scenario,
@@ -143,20 +493,17 @@ Payload (JSON)
             },
             "personality": self.manager_personality
         }
-        should_retain_memory_prompt = self.decide_keep_memory_directive.format(
-            payload=json.dumps(payload, ensure_ascii=False)
-        )
-
-        should_retain_memory_str = self.llm_client.generate(model=self.model, prompt=should_retain_memory_prompt)
+        should_retain_memory_prompt = build_prompt(self.decide_keep_memory_directive, payload)
 
-        print(should_retain_memory_str)
-        s = should_retain_memory_str.strip()
-        should_retain_memory = json.loads(s)
-        if not isinstance(should_retain_memory, bool):
-            should_retain_memory = False
+        should_retain_memory = routed_generate(
+            self.llm_client, self.model_router, self.model, should_retain_memory_prompt, "manager.keep_decision",
+            parse=parse_bool, retries=self.parse_retries, default=False,
+            extra_params=structured_params(BOOLEAN_SCHEMA, self.structured_output),
+        )
+        annotate(keep=should_retain_memory)
 
         if not should_retain_memory:
-            return
+            return None
         
         payload = {
             "experience": {
@@ -166,50 +513,130 @@ Payload (JSON)
             },
             "personality": self.manager_personality
         }
-        summarize_memory_prompt = self.summarize_memory_directive.format(
-            payload=json.dumps(payload, ensure_ascii=False)
-        )
-
-        summarized_memory = self.llm_client.generate(model=self.model, prompt=summarize_memory_prompt)
+        summarize_memory_prompt = build_prompt(self.summarize_memory_directive, payload)
 
-        print(summarized_memory)
-        self.memory.add(Memory(statement=summarized_memory, decay_rate=0, strength_initial=1, current_strength=1))
-        
+        summarized_memory = routed_generate(
+            self.llm_client, self.model_router, self.model, summarize_memory_prompt, "manager.summarize_memory"
+        )
+        annotate(retained_memory=summarized_memory)
+        return Memory(statement=summarized_memory, decay_rate=0, strength_initial=1, current_strength=1)
 
-    def get_memory_summary(self, scenario: str) -> str:
+    def _select_memories_prompt(self, scenario: str) -> str:
         # Use select_memories_directive, manager_personality and scenario to create a prompt for the llm to consider
         # when selecting relevant memories
         payload = {
-            "memory": self.memory.get_as_string(),  # {id: statement}
+            "memory": RawJSON(self.memory.get_as_string(self.memory_token_budget)),  # {id: statement}
             "scenario": scenario,
             "personality": self.manager_personality,  # optional but useful
         }
-        select_memories_prompt = self.select_memories_directive.format(
-            payload=json.dumps(payload, ensure_ascii=False)
-        )
+        return build_prompt(self.select_memories_directive, payload)
 
-        memory_id_selection_str = self.llm_client.generate(model=self.model, prompt=select_memories_prompt)
+    def _summarize_reasoning_prompt(self, selected_memories: List[str], scenario: str) -> str:
+        # Use selected selected_memories, manager_personality and scenario to create a prompt for the llm to consider
+        # when passing its impressions to higher order reasoning
+        payload = {
+            "selected_memories": selected_memories,  # list[str] statements
+            "scenario": scenario,
+            "personality": self.manager_personality,
+        }
+        return build_prompt(self.summarize_reasoning_directive, payload)
+
+    def _fused_consult_prompt(self, scenario: str) -> str:
+        payload = {
+            "memory": RawJSON(self.memory.get_as_string(self.memory_token_budget)),
+            "scenario": scenario,
+            "personality": self.manager_personality,
+        }
+        return build_prompt(self.fused_consult_directive, payload)
+
+    def _select(self, memory_ids: List[str], deadline: Optional[float]) -> List[Memory]:
+        # An advisor past its deadline is discarded by the executive, so it must not refresh or
+        # decay memories either: raise DeadlineExceeded instead of selecting
+        time_left(deadline)
+        return self.memory.select(memory_ids)
+
+    def _apply_fused_consult(self, consult: Tuple[List[str], str], deadline: Optional[float] = None) -> str:
+        # Same refresh/decay as the two-step path; advice without a usable memory is dropped
+        ids, advice = consult
+        if len(self._select(ids, deadline)) < 1:
+            return ""
+        return advice
 
-        # memory_id_selection_str to array of memory ids
-        memory_id_selection_arr = json.loads(memory_id_selection_str,)
+    def _vector_memory_ids(self, scenario: str) -> List[str]:
+        return self.memory.search(scenario, self.retrieval_top_k, self.retrieval_min_score)
 
-        selected_memories = self.memory.select(memory_id_selection_arr)
+    def get_memory_summary(self, scenario: str, deadline: Optional[float] = None) -> str:
+        """
+        deadline (a time.perf_counter() value) bounds both model calls; once it passes the
+        summary is abandoned with DeadlineExceeded.
+        """
+        if self.consult_mode == "fused" and self.retrieval_mode == "llm":
+            consult = routed_generate(
+                self.llm_client, self.model_router, self.model, self._fused_consult_prompt(scenario),
+                "manager.consult_fused", deadline=deadline,
+                parse=parse_fused_consult, retries=self.parse_retries, default=([], ""),
+                extra_params=structured_params(FUSED_CONSULT_SCHEMA, self.structured_output),
+            )
+            return self._apply_fused_consult(consult, deadline)
+
+        if self.retrieval_mode == "vector":
+            memory_id_selection_arr = self._vector_memory_ids(scenario)
+        else:
+            select_memories_prompt = self._select_memories_prompt(scenario)
+
+            # model output to array of memory ids
+            memory_id_selection_arr = routed_generate(
+                self.llm_client, self.model_router, self.model, select_memories_prompt, "manager.select_memories",
+                deadline=deadline, parse=parse_id_array, retries=self.parse_retries, default=[],
+                extra_params=structured_params(ID_ARRAY_SCHEMA, self.structured_output),
+            )
+
+        selected_memories = self._select(memory_id_selection_arr, deadline)
 
         if len(selected_memories) < 1:
             return ""
         
         selected_memories = [memory.statement for memory in selected_memories]
 
-        # Use selected selected_memories, manager_personality and scenario to create a prompt for the llm to consider
-        # when passing its impressions to higher order reasoning
-        payload = {
-            "selected_memories": selected_memories,  # list[str] statements
-            "scenario": scenario,
-            "personality": self.manager_personality,
-        }
-        summarize_memory_feeling_prompt = self.summarize_reasoning_directive.format(
-            payload=json.dumps(payload, ensure_ascii=False)
+        summarize_memory_feeling_prompt = self._summarize_reasoning_prompt(selected_memories, scenario)
+        memory_impression = routed_generate(
+            self.llm_client, self.model_router, self.model, summarize_memory_feeling_prompt,
+            "manager.summarize_reasoning", deadline=deadline,
         )
-        memory_impression = self.llm_client.generate(model=self.model, prompt=summarize_memory_feeling_prompt)
 
-        return memory_impression
\ No newline at end of file
+        return memory_impression
+
+    async def aget_memory_summary(self, scenario: str, deadline: Optional[float] = None) -> str:
+        """Async counterpart of get_memory_summary()."""
+        if self.consult_mode == "fused" and self.retrieval_mode == "llm":
+            consult = await routed_agenerate(
+                self.llm_client, self.model_router, self.model, self._fused_consult_prompt(scenario),
+                "manager.consult_fused", deadline=deadline,
+                parse=parse_fused_consult, retries=self.parse_retries, default=([], ""),
+                extra_params=structured_params(FUSED_CONSULT_SCHEMA, self.structured_output),
+            )
+            return self._apply_fused_consult(consult, deadline)
+
+        if self.retrieval_mode == "vector":
+            memory_id_selection_arr = self._vector_memory_ids(scenario)
+        else:
+            select_memories_prompt = self._select_memories_prompt(scenario)
+
+            memory_id_selection_arr = await routed_agenerate(
+                self.llm_client, self.model_router, self.model, select_memories_prompt, "manager.select_memories",
+                deadline=deadline, parse=parse_id_array, retries=self.parse_retries, default=[],
+                extra_params=structured_params(ID_ARRAY_SCHEMA, self.structured_output),
+            )
+
+        selected_memories = self._select(memory_id_selection_arr, deadline)
+
+        if len(selected_memories) < 1:
+            return ""
+
+        selected_memories = [memory.statement for memory in selected_memories]
+
+        summarize_memory_feeling_prompt = self._summarize_reasoning_prompt(selected_memories, scenario)
+        return await routed_agenerate(
+            self.llm_client, self.model_router, self.model, summarize_memory_feeling_prompt,
+            "manager.summarize_reasoning", deadline=deadline,
+        )
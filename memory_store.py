@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+import json
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from memory import Memory, steps_until_expiry
+from prompting import estimate_tokens
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    memory_id TEXT NOT NULL UNIQUE,
+    statement TEXT NOT NULL,
+    decay_rate REAL NOT NULL,
+    strength_initial REAL NOT NULL,
+    current_strength REAL NOT NULL,
+    step INTEGER NOT NULL,
+    anchor INTEGER NOT NULL,
+    expires_at INTEGER
+);
+CREATE INDEX IF NOT EXISTS memories_expiry ON memories (expires_at) WHERE expires_at IS NOT NULL;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('clock', 0);
+"""
+
+# Stored step/current_strength are as of tick `anchor`; every clock tick since then is one
+# decay() that has not been written back. This mirrors MemoryCollection(lazy_decay=True) and
+# evaluates the same arithmetic as Memory.decay(), so values are bit-identical.
+_COLUMNS = """
+    statement, decay_rate, strength_initial,
+    CASE WHEN decay_rate = 0 OR anchor = :clock THEN current_strength
+         ELSE strength_initial - (decay_rate * (step + :clock - anchor)) END,
+    CASE WHEN decay_rate = 0 THEN step ELSE step + :clock - anchor END,
+    memory_id
+"""
+
+
+def _row_to_memory(row) -> Memory:
+    statement, decay_rate, strength_initial, current_strength, step, memory_id = row
+    return Memory(
+        statement=statement,
+        decay_rate=decay_rate,
+        strength_initial=strength_initial,
+        current_strength=current_strength,
+        step=step,
+        memory_id=memory_id,
+    )
+
+
+def _expires_at(clock: int, strength_initial: float, decay_rate: float, step: int, current_strength: float) -> Optional[int]:
+    steps = steps_until_expiry(strength_initial, decay_rate, step, current_strength)
+    return None if steps is None else clock + steps
+
+
+class _StoredMemories(Mapping):
+    """Read-only {memory_id: Memory} view that pages rows in on access."""
+
+    def __init__(self, store: SQLiteMemoryCollection) -> None:
+        self._store = store
+
+    def __getitem__(self, memory_id: str) -> Memory:
+        mem = self._store.get(memory_id)
+        if mem is None:
+            raise KeyError(memory_id)
+        return mem
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store.ids())
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def __contains__(self, memory_id: object) -> bool:
+        return isinstance(memory_id, str) and self._store.get(memory_id) is not None
+
+
+@dataclass
+class SQLiteMemoryCollection:
+    """
+    MemoryCollection backed by a SQLite database, with the same add/select/prune/get_as_string
+    contract.
+
+    Nothing is loaded up front: opening a store with 100k memories only opens the file. Decay
+    is applied lazily against a persisted step clock, so each select() is one transaction
+    that bumps the clock, refreshes the selected rows in bulk and deletes rows whose
+    precomputed expiry tick has passed (an indexed range delete). Only the selected rows are
+    materialised as Memory objects. Returned memories are snapshots; change stored state
+    through the collection.
+    """
+
+    path: str = ":memory:"
+
+    _conn: sqlite3.Connection = field(init=False, repr=False)
+    _clock: int = field(default=0, init=False, repr=False)
+    _lock: threading.RLock = field(default_factory=threading.RLock, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+        self._clock = self._conn.execute("SELECT value FROM meta WHERE key = 'clock'").fetchone()[0]
+
+    @property
+    def memories(self) -> Mapping:
+        return _StoredMemories(self)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT memory_id FROM memories ORDER BY seq")]
+
+    def get(self, memory_id: str) -> Optional[Memory]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM memories WHERE memory_id = :memory_id",
+                {"clock": self._clock, "memory_id": memory_id},
+            ).fetchone()
+        return _row_to_memory(row) if row is not None else None
+
+    def add(self, memory: Memory) -> str:
+        """Insert and return the memory_id."""
+        self.add_many([memory])
+        return memory.memory_id
+
+    def add_many(self, memories: Iterable[Memory]) -> List[str]:
+        """Insert several memories in one transaction and return their ids."""
+        with self._lock, self._conn:
+            return self._insert(self._conn.cursor(), memories)
+
+    def clear(self) -> None:
+        """Delete every memory; the step clock keeps running."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM memories")
+
+    def _insert(self, cur: sqlite3.Cursor, memories: Iterable[Memory]) -> List[str]:
+        clock = self._clock
+        rows = [
+            (
+                m.memory_id, m.statement, m.decay_rate, m.strength_initial, m.current_strength, m.step, clock,
+                _expires_at(clock, m.strength_initial, m.decay_rate, m.step, m.current_strength),
+            )
+            for m in memories
+        ]
+        cur.executemany(
+            "INSERT OR REPLACE INTO memories "
+            "(memory_id, statement, decay_rate, strength_initial, current_strength, step, anchor, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        return [r[0] for r in rows]
+
+    def get_as_string(self, token_budget: Optional[int] = None) -> str:
+        if token_budget is None:
+            with self._lock:
+                memory_dict = dict(self._conn.execute("SELECT memory_id, statement FROM memories ORDER BY seq"))
+            return json.dumps(memory_dict, ensure_ascii=False)
+
+        # Same ranking as MemoryCollection.get_as_string: strongest, then most recently
+        # refreshed, then most recently added; emitted in insertion order
+        with self._lock:
+            ranked = self._conn.execute(
+                f"SELECT seq, {_COLUMNS} FROM memories ORDER BY 5 DESC, 6 ASC, seq DESC",
+                {"clock": self._clock},
+            )
+            budget = token_budget - estimate_tokens("{}")
+            kept = []
+            for seq, statement, _, _, _, _, memory_id in ranked:
+                fragment = f"{json.dumps(memory_id, ensure_ascii=False)}: {json.dumps(statement, ensure_ascii=False)}"
+                cost = estimate_tokens(fragment) + 1
+                if cost > budget:
+                    break
+                budget -= cost
+                kept.append((seq, fragment))
+        kept.sort()
+        return "{" + ", ".join(fragment for _, fragment in kept) + "}"
+
+    def prune(self) -> None:
+        with self._lock, self._conn:
+            self._prune_expired(self._conn.cursor(), self._clock)
+
+    def _prune_expired(self, cur: sqlite3.Cursor, clock: int) -> None:
+        # expires_at is a lower bound (rows with a non-positive strength are due immediately but
+        # may recover by decaying with a negative rate), so confirm before deleting
+        due = cur.execute(
+            f"SELECT {_COLUMNS} FROM memories WHERE expires_at <= :clock", {"clock": clock}
+        ).fetchall()
+        if not due:
+            return
+        expired = [(m.memory_id,) for m in map(_row_to_memory, due) if m.current_strength <= 0]
+        survivors = [
+            (m.current_strength, m.step, clock,
+             _expires_at(clock, m.strength_initial, m.decay_rate, m.step, m.current_strength), m.memory_id)
+            for m in map(_row_to_memory, due) if m.current_strength > 0
+        ]
+        cur.executemany("DELETE FROM memories WHERE memory_id = ?", expired)
+        cur.executemany(
+            "UPDATE memories SET current_strength = ?, step = ?, anchor = ?, expires_at = ? WHERE memory_id = ?",
+            survivors,
+        )
+
+    def select(self, memory_keys: Iterable[str]) -> List[Memory]:
+        """
+        Returns the selected memories (in the order of memory_keys),
+        refreshes those selected memories, and decays all others.
+        Unknown keys are ignored.
+        """
+        memory_keys = list(memory_keys)
+
+        with self._lock, self._conn:
+            cur = self._conn.cursor()
+            # One tick decays every memory; refreshing re-anchors the selected ones at the new tick
+            clock = self._clock + 1
+            cur.execute("UPDATE meta SET value = ? WHERE key = 'clock'", (clock,))
+
+            cur.execute("CREATE TEMP TABLE IF NOT EXISTS selected_keys (memory_id TEXT PRIMARY KEY)")
+            cur.execute("DELETE FROM selected_keys")
+            cur.executemany("INSERT OR IGNORE INTO selected_keys VALUES (?)", [(k,) for k in memory_keys])
+
+            refreshed = cur.execute(
+                "SELECT memory_id, strength_initial, decay_rate FROM memories "
+                "WHERE memory_id IN (SELECT memory_id FROM selected_keys)"
+            ).fetchall()
+            cur.executemany(
+                "UPDATE memories SET current_strength = strength_initial, step = 0, anchor = ?, expires_at = ? "
+                "WHERE memory_id = ?",
+                [
+                    (clock, _expires_at(clock, initial, rate, 0, initial), memory_id)
+                    for memory_id, initial, rate in refreshed
+                ],
+            )
+
+            found: Dict[str, Memory] = {
+                row[-1]: _row_to_memory(row)
+                for row in cur.execute(
+                    f"SELECT {_COLUMNS} FROM memories WHERE memory_id IN (SELECT memory_id FROM selected_keys)",
+                    {"clock": clock},
+                )
+            }
+
+            self._prune_expired(cur, clock)
+            self._clock = clock
+
+        return [found[k] for k in memory_keys if k in found]
+
+    def statements(self) -> Dict[str, str]:
+        """A consistent {memory_id: statement} copy of the collection."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT memory_id, statement FROM memories ORDER BY seq"))
+
+    def merge(self, memory_ids: Iterable[str], statement: str) -> Optional[str]:
+        """
+        Replace the listed memories with one memory holding statement, in one transaction; same
+        contract as MemoryCollection.merge().
+        """
+        memory_ids = list(dict.fromkeys(memory_ids))
+        with self._lock, self._conn:
+            cur = self._conn.cursor()
+            params = {f"id{i}": memory_id for i, memory_id in enumerate(memory_ids)}
+            members = [
+                _row_to_memory(row)
+                for row in cur.execute(
+                    f"SELECT {_COLUMNS} FROM memories WHERE memory_id IN ({', '.join(':' + k for k in params)})",
+                    {"clock": self._clock, **params},
+                )
+            ] if memory_ids else []
+            if len(members) < 2:
+                return None
+            strength = sum(max(m.current_strength, 0.0) for m in members)
+            merged = Memory(
+                statement=statement,
+                decay_rate=min(m.decay_rate for m in members),
+                strength_initial=strength,
+                current_strength=strength,
+            )
+            cur.executemany("DELETE FROM memories WHERE memory_id = ?", [(m.memory_id,) for m in members])
+            return self._insert(cur, [merged])[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
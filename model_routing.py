@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass, field
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from ollama_client import time_left
+from tracing import annotate
+
+
+# Appended to the prompt when an answer is retried; at the end, so the cached prefix still applies
+RETRY_SUFFIX = "\n\nYour previous answer could not be parsed. Reply again following the output format exactly."
+
+_RAISE = object()
+
+
+# Directives with a boolean or id-array answer go to the small tier; everything that writes
+# prose for the decision (summaries, advice, the decision itself) uses default_tier.
+DEFAULT_ROUTES: Dict[str, str] = {
+    "executive.select_units": "small",
+    "manager.keep_decision": "small",
+    "manager.select_memories": "small",
+    "subpersonality.keep_decision": "small",
+    "subpersonality.select_memories": "small",
+}
+
+
+def _percentile(ordered: List[float], p: float) -> float:
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+@dataclass
+class TierStats:
+    calls: int = 0
+    errors: int = 0
+    # Outputs that did not parse (each one escalated, or raised if there was no larger tier)
+    parse_failures: int = 0
+    total_ms: float = 0.0
+    # Most recent latencies, for percentiles
+    recent_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=1024), repr=False)
+
+    def to_dict(self) -> Dict[str, float]:
+        ordered = sorted(self.recent_ms)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "parse_failures": self.parse_failures,
+            "mean_ms": self.total_ms / self.calls if self.calls else 0.0,
+            "p50_ms": _percentile(ordered, 50),
+            "p90_ms": _percentile(ordered, 90),
+            "p99_ms": _percentile(ordered, 99),
+        }
+
+
+@dataclass
+class ModelRouter:
+    """
+    Chooses the model for each call from its caller label (e.g. "manager.keep_decision").
+
+    tiers maps tier names to models, routes maps callers to tiers (unlisted callers use
+    default_tier), and escalation lists tiers from smallest to largest. When a call made with a
+    parse function keeps returning output that does not parse, it moves on to each larger tier
+    in turn (see routed_generate). Latency, error and parse-failure counts are kept per tier;
+    see stats().
+    """
+
+    tiers: Dict[str, str] = field(default_factory=lambda: {
+        "small": "qwen2.5:1.5b-instruct",
+        "large": "qwen2.5:7b-instruct",
+    })
+    routes: Dict[str, str] = field(default_factory=lambda: dict(DEFAULT_ROUTES))
+    default_tier: str = "large"
+    escalation: List[str] = field(default_factory=lambda: ["small", "large"])
+
+    _stats: Dict[str, TierStats] = field(default_factory=dict, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def tier_for(self, caller: Optional[str]) -> str:
+        return self.routes.get(caller or "", self.default_tier)
+
+    def model_for(self, caller: Optional[str]) -> str:
+        return self.tiers[self.tier_for(caller)]
+
+    def next_tier(self, tier: str) -> Optional[str]:
+        if tier not in self.escalation:
+            return None
+        i = self.escalation.index(tier)
+        return self.escalation[i + 1] if i + 1 < len(self.escalation) else None
+
+    def record(self, tier: str, elapsed_ms: float, error: bool = False, parse_failure: bool = False) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(tier, TierStats())
+            stats.calls += 1
+            stats.total_ms += elapsed_ms
+            stats.recent_ms.append(elapsed_ms)
+            stats.errors += error
+            stats.parse_failures += parse_failure
+
+    def plan(self, caller: Optional[str]) -> List[str]:
+        """Tiers to try for caller, in order: its own tier, then each larger one."""
+        tiers = [self.tier_for(caller)]
+        while (larger := self.next_tier(tiers[-1])) is not None:
+            tiers.append(larger)
+        return tiers
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-tier calls, errors, parse failures and latency (mean, p50/p90/p99 in ms)."""
+        with self._lock:
+            return {tier: stats.to_dict() for tier, stats in self._stats.items()}
+
+
+@dataclass
+class ParseStats:
+    """Per-caller counts of structured answers: attempts, parse failures, retries, and give-ups."""
+
+    _counts: Dict[str, Dict[str, int]] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, caller: str, **increments: int) -> None:
+        with self._lock:
+            row = self._counts.setdefault(caller, {"attempts": 0, "parse_failures": 0, "retries": 0, "gave_up": 0})
+            for key, value in increments.items():
+                row[key] += value
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {caller: dict(row) for caller, row in self._counts.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+
+# Process-wide counters for every parsed call made through routed_generate/routed_agenerate
+PARSE_STATS = ParseStats()
+
+
+def _attempts(router: Optional[ModelRouter], model: str, caller: str, retries: int) -> Iterator[Tuple[Optional[str], str]]:
+    """(tier, model) for each attempt: retries + 1 on the caller's tier, then on each larger tier."""
+    if router is None:
+        for _ in range(retries + 1):
+            yield None, model
+        return
+    for tier in router.plan(caller):
+        for _ in range(retries + 1):
+            yield tier, router.tiers[tier]
+
+
+class _Attempt:
+    """Bookkeeping shared by routed_generate and routed_agenerate."""
+
+    def __init__(self, router: Optional[ModelRouter], caller: str, parse: Optional[Callable[[str], Any]]) -> None:
+        self.router = router
+        self.caller = caller
+        self.parse = parse
+        self.failures = 0
+        self.started = 0.0
+        self.tier: Optional[str] = None
+
+    def begin(self, tier: Optional[str], prompt: str) -> str:
+        self.started = time.perf_counter()
+        if self.failures == 0:
+            self.tier = tier
+            return prompt
+        PARSE_STATS.record(self.caller, retries=1)
+        if tier != self.tier:
+            annotate(escalated_from=self.tier, escalated_to=tier)
+            self.tier = tier
+        return prompt + RETRY_SUFFIX
+
+    def failed(self, tier: Optional[str]) -> None:
+        if self.router is not None and tier is not None:
+            self.router.record(tier, (time.perf_counter() - self.started) * 1e3, error=True)
+
+    def finish(self, tier: Optional[str], text: str) -> Tuple[bool, Any]:
+        """(True, value) if text parsed (or needs no parsing), else (False, None)."""
+        elapsed_ms = (time.perf_counter() - self.started) * 1e3
+        if self.parse is None:
+            if self.router is not None and tier is not None:
+                self.router.record(tier, elapsed_ms)
+            return True, text
+        try:
+            value = self.parse(text)
+        except ValueError:
+            self.failures += 1
+            if self.router is not None and tier is not None:
+                self.router.record(tier, elapsed_ms, parse_failure=True)
+            PARSE_STATS.record(self.caller, attempts=1, parse_failures=1)
+            return False, None
+        if self.router is not None and tier is not None:
+            self.router.record(tier, elapsed_ms)
+        PARSE_STATS.record(self.caller, attempts=1)
+        if self.failures:
+            annotate(parse_failures=self.failures)
+        return True, value
+
+    def exhausted(self, default: Any) -> Any:
+        PARSE_STATS.record(self.caller, gave_up=1)
+        annotate(parse_failures=self.failures, parse_gave_up=True)
+        if default is _RAISE:
+            raise ValueError(f"{self.caller}: no parseable answer after {self.failures} attempts")
+        return default
+
+
+def routed_generate(
+    llm_client: Any,
+    router: Optional[ModelRouter],
+    model: str,
+    prompt: str,
+    caller: str,
+    parse: Optional[Callable[[str], Any]] = None,
+    deadline: Optional[float] = None,
+    retries: int = 0,
+    default: Any = _RAISE,
+    **kwargs: Any,
+) -> Any:
+    """
+    One logical model call for `caller`: through router if set, otherwise on `model`.
+
+    Without parse, returns the text of a single call. With parse, returns parse(text); an
+    answer that raises ValueError is retried up to `retries` more times on the same model
+    (with RETRY_SUFFIX appended), then on each larger router tier. When every attempt fails,
+    returns `default` if given and raises ValueError otherwise.
+    """
+    attempt = _Attempt(router, caller, parse)
+    for tier, tier_model in _attempts(router, model, caller, retries if parse is not None else 0):
+        try:
+            text = llm_client.generate(
+                model=tier_model, prompt=attempt.begin(tier, prompt), caller=caller, timeout=time_left(deadline), **kwargs
+            )
+        except Exception:
+            attempt.failed(tier)
+            raise
+        ok, value = attempt.finish(tier, text)
+        if ok:
+            return value
+    return attempt.exhausted(default)
+
+
+async def routed_agenerate(
+    llm_client: Any,
+    router: Optional[ModelRouter],
+    model: str,
+    prompt: str,
+    caller: str,
+    parse: Optional[Callable[[str], Any]] = None,
+    deadline: Optional[float] = None,
+    retries: int = 0,
+    default: Any = _RAISE,
+    **kwargs: Any,
+) -> Any:
+    """Async counterpart of routed_generate()."""
+    attempt = _Attempt(router, caller, parse)
+    for tier, tier_model in _attempts(router, model, caller, retries if parse is not None else 0):
+        try:
+            text = await llm_client.agenerate(
+                model=tier_model, prompt=attempt.begin(tier, prompt), caller=caller, timeout=time_left(deadline), **kwargs
+            )
+        except Exception:
+            attempt.failed(tier)
+            raise
+        ok, value = attempt.finish(tier, text)
+        if ok:
+            return value
+    return attempt.exhausted(default)
@@ -1,10 +1,36 @@
 from __future__ import annotations
 
+import asyncio
 import json
-from dataclasses import dataclass
-from typing import Any, Dict, Optional
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Union
 
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+
+from llm_cache import ResponseCache
+from prompting import PrefixTracker
+from tracing import Span, Tracer, maybe_span
+
+
+class DeadlineExceeded(TimeoutError):
+    """A call could not be started or did not finish before its deadline."""
+
+
+def time_left(deadline: Optional[float]) -> Optional[float]:
+    """
+    Seconds until deadline, a time.perf_counter() value (None means no deadline). Raises
+    DeadlineExceeded once it has passed, so callers can pass the result on as a timeout.
+    """
+    if deadline is None:
+        return None
+    left = deadline - time.perf_counter()
+    if left <= 0:
+        raise DeadlineExceeded("deadline passed")
+    return left
 
 
 @dataclass
@@ -13,6 +39,123 @@ class OllamaClient:
 
     base_url: str = "http://localhost:11434"
     timeout: int = 30
+    # Max keep-alive connections held open to the server, shared by the sync and async paths.
+    # Size it to the number of requests you expect in flight (e.g. OLLAMA_NUM_PARALLEL).
+    pool_size: int = 10
+    # Default generation options sent with every call (e.g. {"temperature": 0}); per-call
+    # extra_params["options"] entries take precedence.
+    options: Dict[str, Any] = field(default_factory=dict)
+    # Opt-in response cache; see ResponseCache for which calls are eligible.
+    cache: Optional[ResponseCache] = None
+    # When set, every generate call is recorded as an "llm.generate" span
+    tracer: Optional[Tracer] = None
+    # How long the server keeps the model, and with it the prompt cache, loaded after a call
+    # (e.g. "30m", or -1 for as long as the server runs); None leaves the server default
+    keep_alive: Optional[Union[str, int]] = None
+
+    _session: Optional[requests.Session] = field(default=None, init=False, repr=False, compare=False)
+    _async_client: Optional[httpx.AsyncClient] = field(default=None, init=False, repr=False, compare=False)
+    _async_loop: Optional[asyncio.AbstractEventLoop] = field(default=None, init=False, repr=False, compare=False)
+    _async_closer: Optional[asyncio.Task] = field(default=None, init=False, repr=False, compare=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+    _prefixes: Optional[PrefixTracker] = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def session(self) -> requests.Session:
+        """Pooled keep-alive session, created on first use."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    session.headers.update({"Content-Type": "application/json"})
+                    self._session = session
+        return self._session
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        # httpx clients are bound to the event loop they were first used on, so each loop gets
+        # its own, closed when that loop shuts down (see _close_with_loop)
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            client = httpx.AsyncClient(
+                limits=limits,
+                timeout=self.timeout,
+                headers={"Content-Type": "application/json"},
+            )
+            self._async_client = client
+            self._async_loop = loop
+            self._async_closer = loop.create_task(self._close_with_loop(client))
+        return self._async_client
+
+    @staticmethod
+    async def _close_with_loop(client: httpx.AsyncClient) -> None:
+        """
+        Close client once its loop cancels the tasks still pending at shutdown (asyncio.run
+        does), while the loop can still run the close. Without this, every asyncio.run() after
+        the first would leave the previous loop's pooled connections open.
+        """
+        try:
+            await asyncio.get_running_loop().create_future()
+        finally:
+            await client.aclose()
+
+    def _build_payload(
+        self,
+        model: str,
+        prompt: str,
+        stream: bool,
+        extra_params: Optional[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            "model": model,
+            "prompt": prompt,
+            "stream": stream,
+        }
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        if extra_params:
+            payload.update(extra_params)
+        if self.options:
+            payload["options"] = {**self.options, **(payload.get("options") or {})}
+        return payload
+
+    def _cache_key(self, payload: Dict[str, Any]) -> Optional[str]:
+        if self.cache is None:
+            return None
+        params = {k: v for k, v in payload.items() if k not in ("model", "prompt", "stream", "keep_alive")}
+        if not self.cache.is_cacheable(params):
+            return None
+        return self.cache.make_key(payload["model"], payload["prompt"], params)
+
+    def _observe_prefix(self, span: Optional[Span], model: str, prompt: str) -> None:
+        """Record how much of prompt repeats a recent prompt's prefix (the server can reuse its KV cache)."""
+        if span is None:
+            return
+        if self._prefixes is None:
+            with self._lock:
+                if self._prefixes is None:
+                    # One cached prompt per connection is a rough stand-in for the server's slots
+                    self._prefixes = PrefixTracker(slots=self.pool_size)
+        span.set(prompt_chars=len(prompt), prefix_shared_chars=self._prefixes.observe(model, prompt))
+
+    def _record_response(self, span: Optional[Span], js: Dict[str, Any], elapsed: float) -> None:
+        """Copy Ollama's timing and token accounting from a final response onto the span."""
+        if span is None:
+            return
+        span.set(
+            eval_count=js.get("eval_count"),
+            prompt_eval_count=js.get("prompt_eval_count"),
+            total_duration_ms=js.get("total_duration", 0) / 1e6,
+            load_duration_ms=js.get("load_duration", 0) / 1e6,
+            prompt_eval_duration_ms=js.get("prompt_eval_duration", 0) / 1e6,
+            eval_duration_ms=js.get("eval_duration", 0) / 1e6,
+        )
+        if "total_duration" in js:
+            # Whatever the server did not spend on the request: connection wait, transfer, queueing
+            span.queue_ms = max(0.0, elapsed * 1e3 - js["total_duration"] / 1e6)
 
     def generate(
         self,
@@ -21,28 +164,191 @@ class OllamaClient:
         *,
         stream: bool = False,
         extra_params: Optional[Dict[str, Any]] = None,
+        caller: Optional[str] = None,
+        timeout: Optional[float] = None,
     ) -> str:
         """
         Call the /api/generate endpoint.
 
         Returns the JSON response as a dict. For a richer client you might want to
         support streaming and typed responses.
+        caller labels the call site (e.g. "manager.select_memories") in traces.
+        timeout overrides self.timeout for this call; running out of it raises DeadlineExceeded.
         """
-        payload: Dict[str, Any] = {
-            "model": model,
-            "prompt": prompt,
-            "stream": stream,
-        }
-        if extra_params:
-            payload.update(extra_params)
+        if stream:
+            # Drain the NDJSON stream so callers asking for stream=True still get the full text
+            return "".join(
+                self.generate_stream(model, prompt, extra_params=extra_params, caller=caller, timeout=timeout)
+            )
+
+        payload = self._build_payload(model, prompt, False, extra_params)
+        with maybe_span(self.tracer, "llm.generate", caller=caller, model=model, prompt_bytes=len(prompt.encode("utf-8"))) as span:
+            self._observe_prefix(span, model, prompt)
+            cache_key = self._cache_key(payload)
+            if cache_key is not None:
+                cached = self.cache.get(cache_key)
+                if span is not None:
+                    span.set(cache_hit=cached is not None)
+                if cached is not None:
+                    return cached
+
+            started = time.perf_counter()
+            try:
+                resp = self.session.post(
+                    f"{self.base_url}/api/generate",
+                    data=json.dumps(payload),
+                    timeout=self.timeout if timeout is None else timeout,
+                )
+            except requests.Timeout as exc:
+                if timeout is None:
+                    raise
+                raise DeadlineExceeded(f"no response within {timeout:.3f}s") from exc
+            resp.raise_for_status()
+            js = resp.json()
+            self._record_response(span, js, time.perf_counter() - started)
+            response = js.get("response") or ""
+            if cache_key is not None:
+                self.cache.put(cache_key, response)
+            return response
+
+    def generate_stream(
+        self,
+        model: str,
+        prompt: str,
+        *,
+        extra_params: Optional[Dict[str, Any]] = None,
+        caller: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Iterator[str]:
+        """
+        Call /api/generate with streaming enabled and yield response tokens as the
+        server's NDJSON chunks arrive. The connection is returned to the pool once the
+        final ("done") chunk has been read or the generator is closed. A timeout applies to
+        the wait for each chunk, not to the whole generation.
+        """
+        payload = self._build_payload(model, prompt, True, extra_params)
+        # Not made the active span: the generator is suspended inside the caller's context
+        span = None
+        if self.tracer is not None:
+            span = self.tracer.start_span(
+                "llm.generate", caller=caller, model=model, prompt_bytes=len(prompt.encode("utf-8")), stream=True
+            )
+        error: Optional[BaseException] = None
+        try:
+            self._observe_prefix(span, model, prompt)
+            cache_key = self._cache_key(payload)
+            if cache_key is not None:
+                cached = self.cache.get(cache_key)
+                if span is not None:
+                    span.set(cache_hit=cached is not None)
+                if cached is not None:
+                    yield cached
+                    return
+            tokens = []
+
+            started = time.perf_counter()
+            try:
+                resp = self.session.post(
+                    f"{self.base_url}/api/generate",
+                    data=json.dumps(payload),
+                    timeout=self.timeout if timeout is None else timeout,
+                    stream=True,
+                )
+            except requests.Timeout as exc:
+                if timeout is None:
+                    raise
+                raise DeadlineExceeded(f"no response within {timeout:.3f}s") from exc
+            with resp:
+                resp.raise_for_status()
+                for line in resp.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        raise RuntimeError(f"Ollama stream error: {chunk['error']}")
+                    token = chunk.get("response") or ""
+                    if token:
+                        if span is not None and not tokens:
+                            span.set(time_to_first_token_ms=(time.perf_counter() - started) * 1e3)
+                        tokens.append(token)
+                        yield token
+                    if chunk.get("done"):
+                        self._record_response(span, chunk, time.perf_counter() - started)
+                        # Only complete generations are cached
+                        if cache_key is not None:
+                            self.cache.put(cache_key, "".join(tokens))
+                        break
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            if span is not None:
+                self.tracer.end_span(span, error)
 
-        resp = requests.post(
-            f"{self.base_url}/api/generate",
-            data=json.dumps(payload),
-            headers={"Content-Type": "application/json"},
+    def embed(self, model: str, prompt: str) -> List[float]:
+        """Call the /api/embeddings endpoint and return the embedding vector."""
+        resp = self.session.post(
+            f"{self.base_url}/api/embeddings",
+            data=json.dumps({"model": model, "prompt": prompt}),
             timeout=self.timeout,
         )
         resp.raise_for_status()
-        js = resp.json()
-        response = js.get("response") or ""
-        return response
+        return resp.json().get("embedding") or []
+
+    async def agenerate(
+        self,
+        model: str,
+        prompt: str,
+        *,
+        extra_params: Optional[Dict[str, Any]] = None,
+        caller: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> str:
+        """
+        Async counterpart of generate(). Requests share one pooled httpx client per event loop,
+        capped at pool_size connections, so awaiting many calls does not need a thread each.
+        """
+        payload = self._build_payload(model, prompt, False, extra_params)
+        with maybe_span(self.tracer, "llm.generate", caller=caller, model=model, prompt_bytes=len(prompt.encode("utf-8"))) as span:
+            self._observe_prefix(span, model, prompt)
+            cache_key = self._cache_key(payload)
+            if cache_key is not None:
+                cached = self.cache.get(cache_key)
+                if span is not None:
+                    span.set(cache_hit=cached is not None)
+                if cached is not None:
+                    return cached
+
+            started = time.perf_counter()
+            try:
+                resp = await self._get_async_client().post(
+                    f"{self.base_url}/api/generate",
+                    content=json.dumps(payload),
+                    timeout=httpx.USE_CLIENT_DEFAULT if timeout is None else timeout,
+                )
+            except httpx.TimeoutException as exc:
+                if timeout is None:
+                    raise
+                raise DeadlineExceeded(f"no response within {timeout:.3f}s") from exc
+            resp.raise_for_status()
+            js = resp.json()
+            self._record_response(span, js, time.perf_counter() - started)
+            response = js.get("response") or ""
+            if cache_key is not None:
+                self.cache.put(cache_key, response)
+            return response
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    async def aclose(self) -> None:
+        client, loop, closer = self._async_client, self._async_loop, self._async_closer
+        self._async_client = None
+        self._async_loop = None
+        self._async_closer = None
+        # A client from another loop was closed when that loop shut down
+        if client is not None and loop is asyncio.get_running_loop():
+            await client.aclose()
+            closer.cancel()
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass, field
+import json
+import re
+import threading
+from typing import Any, Deque, Dict, List, Mapping, Optional
+
+
+class RawJSON(str):
+    """A string that already holds serialized JSON; embedded verbatim by dumps_payload()."""
+
+
+def dumps_payload(payload: Mapping[str, Any]) -> str:
+    """
+    json.dumps(payload, ensure_ascii=False) for a flat payload dict, except RawJSON values are
+    spliced in as-is instead of being encoded again as JSON strings.
+    """
+    parts = []
+    for key, value in payload.items():
+        encoded = value if isinstance(value, RawJSON) else json.dumps(value, ensure_ascii=False)
+        parts.append(f"{json.dumps(key, ensure_ascii=False)}: {encoded}")
+    return "{" + ", ".join(parts) + "}"
+
+
+# Payload keys in prompt order. Content that repeats across calls (who is asking, what they
+# remember) goes first and the per-call scenario goes last, so consecutive prompts share the
+# longest possible prefix and the server can reuse its prompt (KV) cache for it. Keys not
+# listed here go between the known stable keys and the scenario.
+PAYLOAD_ORDER = (
+    "personality",
+    "personalities",
+    "memory",
+    "memories",
+    "selected_memories",
+    "advisor_insights",
+    "experience",
+)
+
+
+def build_prompt(directive: str, payload: Mapping[str, Any]) -> str:
+    """
+    Fill a directive's {payload} placeholder with payload serialized in canonical order:
+    PAYLOAD_ORDER keys, then any other keys, then "scenario". RawJSON values are spliced as-is.
+    """
+    rank = {key: i for i, key in enumerate(PAYLOAD_ORDER)}
+    last = len(PAYLOAD_ORDER) + 1
+    ordered = sorted(payload, key=lambda k: last if k == "scenario" else rank.get(k, len(PAYLOAD_ORDER)))
+    return directive.format(payload=dumps_payload({k: payload[k] for k in ordered}))
+
+
+def common_prefix_length(a: str, b: str, block: int = 4096) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    # Whole blocks first (C-level comparisons), then bisect inside the first differing block
+    while i + block <= n and a[i:i + block] == b[i:i + block]:
+        i += block
+    lo, hi = i, min(i + block, n)
+    if a[lo:hi] == b[lo:hi]:
+        return hi
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+
+@dataclass
+class PrefixTracker:
+    """
+    Client-side estimate of server prompt-cache reuse. For each prompt, observe() returns the
+    longest prefix (in characters) it shares with one of the last `slots` prompts sent to the
+    same model, roughly what a server with that many parallel slots still has cached.
+    """
+
+    slots: int = 4
+    _recent: Dict[str, Deque[str]] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def observe(self, model: str, prompt: str) -> int:
+        with self._lock:
+            recent = self._recent.setdefault(model, deque(maxlen=max(1, self.slots)))
+            candidates = list(recent)
+            recent.append(prompt)
+        return max((common_prefix_length(prompt, previous) for previous in candidates), default=0)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text with JSON punctuation)."""
+    return len(text) // 4 + 1
+
+
+def parse_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """
+    The JSON object in a model response, or None. Tolerates surrounding prose and code fences
+    by decoding from the first "{".
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+    try:
+        value, _ = json.JSONDecoder().raw_decode(text[start:])
+    except json.JSONDecodeError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+# JSON schemas for Ollama's `format` parameter (constrained decoding)
+ID_ARRAY_SCHEMA: Dict[str, Any] = {"type": "array", "items": {"type": "string"}}
+BOOLEAN_SCHEMA: Dict[str, Any] = {"type": "boolean"}
+FUSED_CONSULT_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {"memory_ids": ID_ARRAY_SCHEMA, "advice": {"type": "string"}},
+    "required": ["memory_ids", "advice"],
+}
+
+_BOOL_RE = re.compile(r"\b(true|false)\b", re.IGNORECASE)
+
+
+def parse_id_array(text: str) -> List[str]:
+    """
+    The first JSON array of strings in a model response (surrounding prose and code fences
+    are ignored). Raises ValueError if there is none.
+    """
+    start = text.find("[")
+    while start >= 0:
+        try:
+            value, _ = json.JSONDecoder().raw_decode(text[start:])
+        except json.JSONDecodeError:
+            value = None
+        if isinstance(value, list) and all(isinstance(x, str) for x in value):
+            return value
+        start = text.find("[", start + 1)
+    raise ValueError(f"no JSON array of strings in {text[:80]!r}")
+
+
+def parse_bool(text: str) -> bool:
+    """
+    A true/false answer, also when quoted, capitalized or wrapped in prose. Raises ValueError
+    if there is none, or if the text says both.
+    """
+    answers = {match.lower() for match in _BOOL_RE.findall(text)}
+    if len(answers) != 1:
+        raise ValueError(f"no single true/false in {text[:80]!r}")
+    return answers.pop() == "true"
+
+
+def structured_params(schema: Dict[str, Any], enabled: bool) -> Optional[Dict[str, Any]]:
+    """extra_params asking Ollama to constrain the answer to schema, or None when disabled."""
+    return {"format": schema} if enabled else None
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ollama_client import DeadlineExceeded, OllamaClient
+from tracing import Tracer
+
+
+# Lower runs first. Final decisions jump the queue so started decisions finish (and free
+# their memory/threads) before new ones fan out.
+DEFAULT_PRIORITIES: Dict[str, int] = {
+    "executive.decide": 0,
+    # Background consolidation only gets slots no decision is waiting for
+    "memory.consolidate": 2,
+}
+DEFAULT_PRIORITY = 1
+
+
+@dataclass
+class RequestScheduler:
+    """
+    Drop-in replacement for OllamaClient that funnels every model call from any number of
+    executives through one admission queue with `slots` requests in flight at most.
+
+    Set slots to the server's OLLAMA_NUM_PARALLEL: enough to keep every slot busy, never so
+    many that requests pile up inside the server where they cannot be prioritised. Waiting
+    requests are admitted by priority (see DEFAULT_PRIORITIES, keyed by caller), then FIFO.
+    """
+
+    client: OllamaClient = field(default_factory=OllamaClient)
+    slots: int = 4
+    priorities: Dict[str, int] = field(default_factory=lambda: dict(DEFAULT_PRIORITIES))
+
+    in_flight: int = field(default=0, init=False)
+    peak_in_flight: int = field(default=0, init=False)
+    completed: int = field(default=0, init=False)
+    total_wait_s: float = field(default=0.0, init=False)
+
+    _cond: threading.Condition = field(default_factory=threading.Condition, init=False, repr=False)
+    _waiting: List[Tuple[int, int]] = field(default_factory=list, init=False, repr=False)
+    _tickets: Iterator[int] = field(default_factory=itertools.count, init=False, repr=False)
+
+    @property
+    def tracer(self) -> Optional[Tracer]:
+        return self.client.tracer
+
+    def _acquire(self, caller: Optional[str], timeout: Optional[float] = None) -> Optional[float]:
+        """
+        Wait for a slot. With a timeout, gives up with DeadlineExceeded once it runs out and
+        otherwise returns what is left of it for the request itself.
+        """
+        entry = (self.priorities.get(caller or "", DEFAULT_PRIORITY), next(self._tickets))
+        started = time.perf_counter()
+        deadline = None if timeout is None else started + timeout
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            while self.in_flight >= self.slots or self._waiting[0] != entry:
+                left = None if deadline is None else deadline - time.perf_counter()
+                if left is not None and left <= 0:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                    raise DeadlineExceeded(f"no free slot within {timeout:.3f}s")
+                self._cond.wait(left)
+            heapq.heappop(self._waiting)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.total_wait_s += time.perf_counter() - started
+            # The next waiter may also fit
+            self._cond.notify_all()
+        return None if deadline is None else max(deadline - time.perf_counter(), 1e-3)
+
+    def _release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self.completed += 1
+            self._cond.notify_all()
+
+    def generate(
+        self, model: str, prompt: str, *, caller: Optional[str] = None, timeout: Optional[float] = None, **kwargs: Any
+    ) -> str:
+        timeout = self._acquire(caller, timeout)
+        try:
+            return self.client.generate(model, prompt, caller=caller, timeout=timeout, **kwargs)
+        finally:
+            self._release()
+
+    def generate_stream(
+        self, model: str, prompt: str, *, caller: Optional[str] = None, timeout: Optional[float] = None, **kwargs: Any
+    ) -> Iterator[str]:
+        # The slot is held until the stream is exhausted or closed
+        timeout = self._acquire(caller, timeout)
+        try:
+            yield from self.client.generate_stream(model, prompt, caller=caller, timeout=timeout, **kwargs)
+        finally:
+            self._release()
+
+    async def agenerate(
+        self, model: str, prompt: str, *, caller: Optional[str] = None, timeout: Optional[float] = None, **kwargs: Any
+    ) -> str:
+        # Admission is shared with sync callers, so wait for it off the event loop
+        admission = asyncio.ensure_future(asyncio.to_thread(self._acquire, caller, timeout))
+        try:
+            timeout = await asyncio.shield(admission)
+        except asyncio.CancelledError:
+            # The waiting thread cannot be interrupted; hand its slot back once it gets one
+            admission.add_done_callback(lambda f: f.cancelled() or f.exception() or self._release())
+            raise
+        try:
+            return await self.client.agenerate(model, prompt, caller=caller, timeout=timeout, **kwargs)
+        finally:
+            self._release()
+
+    def embed(self, model: str, prompt: str) -> List[float]:
+        self._acquire("embed")
+        try:
+            return self.client.embed(model, prompt)
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "slots": self.slots,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "queued": len(self._waiting),
+                "completed": self.completed,
+                "mean_wait_ms": self.total_wait_s / self.completed * 1e3 if self.completed else 0.0,
+            }
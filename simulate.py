@@ -0,0 +1,269 @@
+"""
+Run many characters through a stream of scenarios against one Ollama server.
+
+Characters are decided concurrently; each character sees its scenarios one at a time and in
+stream order, so its memories evolve exactly as in a serial run. Every model call from every
+character goes through one RequestScheduler that keeps the server's parallel slots full
+without queueing extra work inside the server. One JSON line is written per finished decision.
+
+Characters file: a JSON spec list or a snapshot (see character_builder for both formats).
+
+    [{"name": "aria", "model": "qwen2.5:7b-instruct", "routing": "local",
+      "managers": {"safety": {"personality": "You prioritize ...", "keywords": ["bridge", "fall"],
+                              "decay_rate": 0, "memories": ["You once ...", {"statement": "...", "decay_rate": 0.01}]}}},
+     {"name": "brom", "snapshot": "brom.char"}]
+
+Scenarios (JSONL, "-" for stdin), one per line; "characters" restricts the scenario to some
+characters, "deadline" overrides --deadline, and "result", if present, is fed back through
+retain_experience:
+
+    {"id": "bridge-1", "scenario": "On a narrow mountain pass ...", "result": "The bridge held."}
+
+    python simulate.py characters.json scenarios.jsonl --out results.jsonl --slots 4
+
+--save-snapshots DIR writes every character's learned state to DIR/<name>.char at the end.
+"""
+from __future__ import annotations
+
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import json
+import os
+import sys
+import threading
+import time
+from typing import IO, Any, Deque, Dict, Iterable, Iterator, List, Optional
+
+from balanced_client import BalancedOllamaClient
+import character_builder
+from consolidation import MemoryConsolidator
+from executive import Executive
+from model_routing import PARSE_STATS
+from ollama_client import OllamaClient
+from scheduler import RequestScheduler
+from tracing import JsonlExporter, Tracer, maybe_span
+
+
+def load_characters(
+    path: str,
+    llm_client: Any,
+    small_model: Optional[str] = None,
+    structured_output: bool = False,
+    consolidator: Optional[MemoryConsolidator] = None,
+) -> Dict[str, Executive]:
+    """
+    Build one Executive per character in a spec or snapshot file (see character_builder), all
+    sharing llm_client. With small_model, each character gets a ModelRouter sending
+    boolean/id-array directives to small_model and everything else to the character's own
+    model. structured_output sends JSON schemas as Ollama's `format` for those directives;
+    when False, snapshots keep the setting they were saved with. consolidator, if given,
+    watches every manager.
+    """
+    options: Dict[str, Any] = {}
+    if structured_output:
+        options["structured_output"] = True
+    if consolidator is not None:
+        options["consolidator"] = consolidator
+    characters = character_builder.load_characters(path, llm_client, small_model, **options)
+    return {character.name: character.executive for character in characters}
+
+
+def read_scenarios(stream: IO[str]) -> Iterator[Dict[str, Any]]:
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        record.setdefault("id", line_no)
+        yield record
+
+
+@dataclass
+class Simulation:
+    """
+    Feeds scenarios to characters. A character's scenarios run one after another (its memories
+    depend on the previous decision); different characters run in parallel on up to
+    max_active_characters threads. At most max_pending decisions are queued or running, so a
+    long scenario stream is read only as fast as it is consumed.
+    """
+
+    characters: Dict[str, Executive]
+    max_active_characters: int = 16
+    max_pending: int = 256
+    # Per-decision latency budget in seconds, passed to Executive.decide_action
+    deadline: Optional[float] = None
+
+    _queues: Dict[str, Deque[Dict[str, Any]]] = field(default_factory=dict, init=False, repr=False)
+    _active: set = field(default_factory=set, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+    _out_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def run(self, scenarios: Iterable[Dict[str, Any]], out: IO[str]) -> int:
+        """Decide every (character, scenario) pair, writing results to out; returns the count."""
+        self._queues = {name: deque() for name in self.characters}
+        pending = threading.BoundedSemaphore(self.max_pending)
+        done = threading.Condition(self._lock)
+        outstanding = 0
+        submitted = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_active_characters, thread_name_prefix="character") as pool:
+
+            def drain(name: str) -> None:
+                nonlocal outstanding
+                while True:
+                    with self._lock:
+                        queue = self._queues[name]
+                        if not queue:
+                            self._active.discard(name)
+                            return
+                        record = queue.popleft()
+                    try:
+                        self._write(out, self._run_one(name, record))
+                    finally:
+                        pending.release()
+                        with done:
+                            outstanding -= 1
+                            done.notify_all()
+
+            for record in scenarios:
+                names = record.get("characters") or list(self.characters)
+                for name in names:
+                    if name not in self.characters:
+                        self._write(out, {"character": name, "scenario_id": record["id"], "error": "unknown character"})
+                        continue
+                    pending.acquire()
+                    with self._lock:
+                        self._queues[name].append(record)
+                        outstanding += 1
+                        submitted += 1
+                        start = name not in self._active
+                        self._active.add(name)
+                    if start:
+                        pool.submit(drain, name)
+
+            with done:
+                done.wait_for(lambda: outstanding == 0)
+        return submitted
+
+    def _run_one(self, name: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        executive = self.characters[name]
+        row: Dict[str, Any] = {"character": name, "scenario_id": record["id"]}
+        started = time.perf_counter()
+        try:
+            with maybe_span(executive.tracer, "simulate.scenario", character=name, scenario_id=record["id"]):
+                decision = executive.decide_action(record["scenario"], deadline=record.get("deadline", self.deadline))
+                row["decision"] = decision
+                row["decide_ms"] = (time.perf_counter() - started) * 1e3
+                if record.get("result"):
+                    executive.retain_experience(record["scenario"], decision, record["result"])
+                    row["retained"] = True
+        except Exception as exc:
+            row["error"] = f"{type(exc).__name__}: {exc}"
+        row["wall_ms"] = (time.perf_counter() - started) * 1e3
+        return row
+
+    def _write(self, out: IO[str], row: Dict[str, Any]) -> None:
+        line = json.dumps(row, ensure_ascii=False)
+        with self._out_lock:
+            out.write(line + "\n")
+            out.flush()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run characters through a stream of scenarios.")
+    parser.add_argument("characters", help="JSON file with character definitions")
+    parser.add_argument("scenarios", help="JSONL scenario stream, or - for stdin")
+    parser.add_argument("--out", help="results JSONL (default stdout)")
+    parser.add_argument("--base-url", default="http://localhost:11434",
+                        help="server URL, or several separated by commas to load-balance across them")
+    parser.add_argument("--slots", type=int, default=4,
+                        help="requests in flight at once; match the servers' OLLAMA_NUM_PARALLEL, summed")
+    parser.add_argument("--max-active-characters", type=int, default=16)
+    parser.add_argument("--max-pending", type=int, default=256)
+    parser.add_argument("--deadline", type=float, help="per-decision latency budget in seconds (late advisors are skipped)")
+    parser.add_argument("--small-model",
+                        help="route boolean/id-array directives to this model (others use each character's model)")
+    parser.add_argument("--structured-output", action="store_true",
+                        help="constrain boolean/id-array answers with Ollama's JSON-schema `format`")
+    parser.add_argument("--max-memories", type=int,
+                        help="consolidate each manager's memories in the background once it holds more than this")
+    parser.add_argument("--save-snapshots", metavar="DIR", help="write each character's snapshot here when done")
+    parser.add_argument("--trace", help="append spans as JSONL to this path")
+    args = parser.parse_args(argv)
+
+    exporters = []
+    if args.trace:
+        exporters.append(JsonlExporter(args.trace))
+    base_urls = [url.strip() for url in args.base_url.split(",") if url.strip()]
+    client_options = {"pool_size": max(args.slots, 1), "tracer": Tracer(exporters=exporters) if exporters else None}
+    if len(base_urls) > 1:
+        client = BalancedOllamaClient.from_urls(base_urls, **client_options)
+    else:
+        client = OllamaClient(base_url=base_urls[0], **client_options)
+    scheduler = RequestScheduler(client=client, slots=args.slots)
+    consolidator = MemoryConsolidator(llm_client=scheduler, max_memories=args.max_memories) if args.max_memories else None
+    characters = load_characters(args.characters, scheduler, args.small_model, args.structured_output, consolidator)
+    for executive in characters.values():
+        # Per-decision fan-out is bounded globally by the scheduler instead
+        executive.max_concurrent_consultations = max(executive.max_concurrent_consultations, args.slots)
+
+    simulation = Simulation(characters, args.max_active_characters, args.max_pending, args.deadline)
+    scenario_stream = sys.stdin if args.scenarios == "-" else open(args.scenarios, encoding="utf-8")
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    started = time.perf_counter()
+    if consolidator is not None:
+        consolidator.start()
+    try:
+        count = simulation.run(read_scenarios(scenario_stream), out)
+    finally:
+        if consolidator is not None:
+            consolidator.stop()
+        if scenario_stream is not sys.stdin:
+            scenario_stream.close()
+        if out is not sys.stdout:
+            out.close()
+        client.close()
+
+    if args.save_snapshots:
+        os.makedirs(args.save_snapshots, exist_ok=True)
+        for name, executive in characters.items():
+            character = character_builder.Character(name=name, executive=executive)
+            character_builder.save_snapshot(character, os.path.join(args.save_snapshots, f"{name}.char"))
+
+    elapsed = time.perf_counter() - started
+    stats = scheduler.stats()
+    print(
+        f"{count} decisions in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.2f}/s); "
+        f"peak in flight {stats['peak_in_flight']}/{stats['slots']}, mean queue wait {stats['mean_wait_ms']:.1f} ms",
+        file=sys.stderr,
+    )
+    tiers: Dict[str, Dict[str, float]] = {}
+    for executive in characters.values():
+        if executive.model_router is None:
+            continue
+        for tier, row in executive.model_router.stats().items():
+            total = tiers.setdefault(tier, {"calls": 0, "parse_failures": 0, "ms": 0.0})
+            total["calls"] += row["calls"]
+            total["parse_failures"] += row["parse_failures"]
+            total["ms"] += row["mean_ms"] * row["calls"]
+    for tier, total in tiers.items():
+        mean_ms = total["ms"] / total["calls"] if total["calls"] else 0.0
+        print(f"tier {tier}: {total['calls']} calls, mean {mean_ms:.1f} ms, {total['parse_failures']} parse failures",
+              file=sys.stderr)
+    if isinstance(client, BalancedOllamaClient):
+        for endpoint in client.stats():
+            print(f"endpoint {endpoint['url']}: {endpoint['requests']} requests, {endpoint['failures']} failures, "
+                  f"models {', '.join(endpoint['models']) or '-'}", file=sys.stderr)
+    if consolidator is not None:
+        stats = consolidator.stats()
+        print(f"consolidation: {stats['passes']} passes, {stats['merges']} merges, {stats['errors']} failed", file=sys.stderr)
+    for caller, row in sorted(PARSE_STATS.snapshot().items()):
+        if row["parse_failures"]:
+            print(f"{caller}: {row['parse_failures']}/{row['attempts']} unparseable, {row['retries']} retries, "
+                  f"{row['gave_up']} fell back to defaults", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,22 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-import json
-from typing import List, Dict, Iterable, Optional
+from typing import List, Dict, Iterable, Optional, Tuple
 import uuid
 
-from memory import Memory, MemoryCollection
+from memory import Memory, MemoryCollection, check_retrieval_mode, parse_fused_consult
+from model_routing import ModelRouter, routed_agenerate, routed_generate
 from ollama_client import OllamaClient
+from prompting import (
+    BOOLEAN_SCHEMA,
+    FUSED_CONSULT_SCHEMA,
+    ID_ARRAY_SCHEMA,
+    RawJSON,
+    build_prompt,
+    parse_bool,
+    parse_id_array,
+    structured_params,
+)
 
 @dataclass
 class Subpersonality:
@@ -17,6 +27,21 @@ class Subpersonality:
     memory: MemoryCollection = field(default_factory=MemoryCollection)
     llm_client: OllamaClient = field(default_factory=OllamaClient)
     model: str = "qwen2.5:7b-instruct"
+    # "llm" asks the model to pick memory ids; "vector" uses memory.search() (requires memory.index)
+    retrieval_mode: str = "llm"
+    retrieval_top_k: int = 3
+    retrieval_min_score: float = 0.0
+    # Cap on the memory listing in the selection prompt (estimated tokens); None sends everything
+    memory_token_budget: Optional[int] = None
+    # "two_step" selects memory ids, then consults; "fused" asks for both in one call
+    # (only applies to retrieval_mode="llm")
+    consult_mode: str = "two_step"
+    # Picks the model per call (and escalates on unparseable output); None uses `model` throughout
+    model_router: Optional[ModelRouter] = None
+    # Send a JSON schema as Ollama's `format` for id-array, boolean and fused answers
+    structured_output: bool = False
+    # Extra attempts on the same model when an answer does not parse
+    parse_retries: int = 1
 
     select_memories_directive: str = """
 You select which memories are relevant to the scenario.
@@ -46,6 +71,20 @@ Payload (JSON):
 {payload}
 """
 
+    fused_consult_directive: str = """
+You are a subpersonality of a character dictated by the JSON payload provided.
+You select the memories relevant to the scenario and offer insight/recommendations to the decision maker based on your personality and those memories.
+
+Rules:
+- Return ONLY valid JSON (no markdown, no code fences, no extra text).
+- Output format must be exactly a JSON object: {{"memory_ids": ["id1","id2",...], "advice": "..."}}
+- Every id in memory_ids MUST be a key present in payload.memory. If none are relevant, use [].
+- advice: ENGLISH ONLY, plain text, 3 sentence maximum.
+
+Payload (JSON):
+{payload}
+""".strip()
+
     should_retain_memory_directive = """
 You are a subpersonality of a character dictated by the JSON payload provided.
 
@@ -58,21 +97,17 @@ Rules:
 
 """
 
-    def consult(self, scenario: str) -> str:
+    def __post_init__(self) -> None:
+        check_retrieval_mode(self.retrieval_mode, self.memory)
+
+    def _select_memories_prompt(self, scenario: str) -> str:
         payload = {
-            "memory": self.memory.get_as_string(),
+            "memory": RawJSON(self.memory.get_as_string(self.memory_token_budget)),
             "scenario": scenario
         }
-        select_memories_prompt = self.select_memories_directive.format(
-            payload=json.dumps(payload, ensure_ascii=False)
-        )
-
-        memory_id_selection_str = self.llm_client.generate(model=self.model, prompt=select_memories_prompt)
-        memory_id_selection_arr = json.loads(memory_id_selection_str,)
-
-        # if no memories were selected, the memories we are retaining may not be useful and we should discard
-        selected_memories = [memory.statement for memory in self.memory.select(memory_id_selection_arr)]
+        return build_prompt(self.select_memories_directive, payload)
 
+    def _consult_prompt(self, selected_memories: List[str], scenario: str) -> str:
         payload = {
             "memories": selected_memories,
             "scenario": scenario,
@@ -83,10 +118,83 @@ Rules:
                 "blind_spot": self.blind_spot
             }
         }
-        consult_prompt = self.consult_directive.format(
-            payload=json.dumps(payload, ensure_ascii=False)
+        return build_prompt(self.consult_directive, payload)
+
+    def _fused_consult_prompt(self, scenario: str) -> str:
+        payload = {
+            "memory": RawJSON(self.memory.get_as_string(self.memory_token_budget)),
+            "scenario": scenario,
+            "personality": {
+                "motive": self.motive,
+                "fear": self.fear,
+                "strategy": self.strategy,
+                "blind_spot": self.blind_spot
+            },
+        }
+        return build_prompt(self.fused_consult_directive, payload)
+
+    def _apply_fused_consult(self, consult: Tuple[List[str], str]) -> str:
+        memory_ids, advice = consult
+        self.memory.select(memory_ids)
+        return advice
+
+    def consult(self, scenario: str) -> str:
+        if self.consult_mode == "fused" and self.retrieval_mode == "llm":
+            consult = routed_generate(
+                self.llm_client, self.model_router, self.model, self._fused_consult_prompt(scenario),
+                "subpersonality.consult_fused",
+                parse=parse_fused_consult, retries=self.parse_retries, default=([], ""),
+                extra_params=structured_params(FUSED_CONSULT_SCHEMA, self.structured_output),
+            )
+            return self._apply_fused_consult(consult)
+
+        if self.retrieval_mode == "vector":
+            memory_id_selection_arr = self.memory.search(scenario, self.retrieval_top_k, self.retrieval_min_score)
+        else:
+            select_memories_prompt = self._select_memories_prompt(scenario)
+
+            memory_id_selection_arr = routed_generate(
+                self.llm_client, self.model_router, self.model, select_memories_prompt,
+                "subpersonality.select_memories",
+                parse=parse_id_array, retries=self.parse_retries, default=[],
+                extra_params=structured_params(ID_ARRAY_SCHEMA, self.structured_output),
+            )
+
+        # if no memories were selected, the memories we are retaining may not be useful and we should discard
+        selected_memories = [memory.statement for memory in self.memory.select(memory_id_selection_arr)]
+
+        consult_prompt = self._consult_prompt(selected_memories, scenario)
+        return routed_generate(self.llm_client, self.model_router, self.model, consult_prompt, "subpersonality.consult")
+
+    async def aconsult(self, scenario: str) -> str:
+        """Async counterpart of consult()."""
+        if self.consult_mode == "fused" and self.retrieval_mode == "llm":
+            consult = await routed_agenerate(
+                self.llm_client, self.model_router, self.model, self._fused_consult_prompt(scenario),
+                "subpersonality.consult_fused",
+                parse=parse_fused_consult, retries=self.parse_retries, default=([], ""),
+                extra_params=structured_params(FUSED_CONSULT_SCHEMA, self.structured_output),
+            )
+            return self._apply_fused_consult(consult)
+
+        if self.retrieval_mode == "vector":
+            memory_id_selection_arr = self.memory.search(scenario, self.retrieval_top_k, self.retrieval_min_score)
+        else:
+            select_memories_prompt = self._select_memories_prompt(scenario)
+
+            memory_id_selection_arr = await routed_agenerate(
+                self.llm_client, self.model_router, self.model, select_memories_prompt,
+                "subpersonality.select_memories",
+                parse=parse_id_array, retries=self.parse_retries, default=[],
+                extra_params=structured_params(ID_ARRAY_SCHEMA, self.structured_output),
+            )
+
+        selected_memories = [memory.statement for memory in self.memory.select(memory_id_selection_arr)]
+
+        consult_prompt = self._consult_prompt(selected_memories, scenario)
+        return await routed_agenerate(
+            self.llm_client, self.model_router, self.model, consult_prompt, "subpersonality.consult"
         )
-        return self.llm_client.generate(model=self.model, prompt=consult_prompt)
     
     def retain_memory(self, scenario: str, action_taken: str, result: str):
         payload = {
@@ -102,24 +210,24 @@ Rules:
                 "blind_spot": self.blind_spot
             }
         }
-        should_retain_memory_prompt = self.should_retain_memory_directive.format(
-            payload=json.dumps(payload, ensure_ascii=False)
-        )
+        should_retain_memory_prompt = build_prompt(self.should_retain_memory_directive, payload)
 
-        should_retain_memory_str = self.llm_client.generate(model=self.model, prompt=should_retain_memory_prompt)
-        s = should_retain_memory_str.strip()
-        should_retain_memory = json.loads(s)
-        if not isinstance(should_retain_memory, bool):
-            should_retain_memory = False
+        should_retain_memory = routed_generate(
+            self.llm_client, self.model_router, self.model, should_retain_memory_prompt,
+            "subpersonality.keep_decision",
+            parse=parse_bool, retries=self.parse_retries, default=False,
+            extra_params=structured_params(BOOLEAN_SCHEMA, self.structured_output),
+        )
 
         if not should_retain_memory:
             return
         
-        summarize_retained_memory_prompt = self.summarize_retained_memory_directive.format(
-            payload=json.dumps(payload, ensure_ascii=False)
-        )
+        summarize_retained_memory_prompt = build_prompt(self.summarize_retained_memory_directive, payload)
 
-        summarized_memory = self.llm_client.generate(model=self.model, prompt=summarize_retained_memory_prompt)
+        summarized_memory = routed_generate(
+            self.llm_client, self.model_router, self.model, summarize_retained_memory_prompt,
+            "subpersonality.summarize_memory",
+        )
 
         new_memory = Memory(statement=summarized_memory, decay_rate=0.01, strength_initial=1, current_strength=1)
         self.memory.add(new_memory)
\ No newline at end of file
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# The modules live flat at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_ollama import FakeOllamaServer  # noqa: E402
+
+
+@pytest.fixture
+def fake_ollama():
+    with FakeOllamaServer() as server:
+        yield server
@@ -0,0 +1,58 @@
+from advisor_router import AdvisorRouter
+from main import COUNCIL, SCENARIO
+
+
+KEYWORDS = {
+    "safety": ["bridge", "rope", "fall"],
+    "social": ["guide", "charismatic"],
+    "arcana": ["rune", "whispering"],
+    "values": ["party"],
+}
+
+
+def _council(keywords=None):
+    router = AdvisorRouter()
+    for name, personality in COUNCIL.items():
+        router.add(name, personality, (keywords or {}).get(name, ()))
+    return router
+
+
+def test_thin_evidence_falls_back_to_llm():
+    # main.py's personalities share only "party" with its scenario: too little to route on
+    router = _council()
+    assert router.scores(SCENARIO)[0][0] == "values"
+    assert router.route(SCENARIO) is None
+
+
+def test_keywords_route_the_canonical_scenario_locally():
+    route = _council(KEYWORDS).route(SCENARIO)
+    assert route is not None
+    assert {"safety", "arcana"} <= set(route)
+
+
+def test_single_clear_match_routes_locally():
+    router = _council()
+    scenario = "The amulet shows infernal signs: curses and enchantments, a supernatural threat."
+    scores = dict(router.scores(scenario))
+    assert scores["arcana"] > 0 and all(v == 0 for k, v in scores.items() if k != "arcana")
+    assert router.route(scenario) == ["arcana"]
+
+
+def test_close_cutoff_is_ambiguous():
+    # b misses the cutoff by less than margin, so the router cannot tell whether it matters
+    router = AdvisorRouter(relative_cutoff=0.99, margin=0.5)
+    router.add("a", "bridges ropes cliffs")
+    router.add("b", "bridges ropes boats")
+    scores = dict(router.scores("bridges ropes cliffs"))
+    assert scores["a"] > scores["b"] > 0
+    assert router.route("bridges ropes cliffs") is None
+    router.margin = 0.0
+    assert router.route("bridges ropes cliffs") == ["a"]
+
+
+def test_routes_are_memoized_and_cleared_on_register():
+    router = _council(KEYWORDS)
+    router.remember("anything", ["social"])
+    assert router.route("anything") == ["social"]
+    router.add("extra", "You prioritize cooking.")
+    assert router.cached("anything") is None
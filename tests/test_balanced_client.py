@@ -0,0 +1,112 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from balanced_client import BalancedOllamaClient
+from fake_ollama import FakeOllamaConfig, FakeOllamaServer, start_in_subprocess
+from ollama_client import DeadlineExceeded
+
+
+MODEL = "qwen2.5:7b-instruct"
+OTHER = "qwen2.5:1.5b-instruct"
+
+
+@pytest.fixture
+def doomed_ollama():
+    # A separate process, so killing it drops its open connections too
+    proc, url = start_in_subprocess(config=FakeOllamaConfig(base_latency=0.01))
+    yield proc, url
+    proc.terminate()
+    proc.join()
+
+
+def _outstanding(client):
+    return [e["outstanding"] for e in client.stats()]
+
+
+def test_fails_over_when_an_endpoint_dies(doomed_ollama, fake_ollama):
+    proc, url = doomed_ollama
+    client = BalancedOllamaClient.from_urls([url, fake_ollama.url])
+    client.failure_cooldown = 60.0
+    # Two models, so model affinity puts one on each endpoint
+    for i in range(6):
+        assert client.generate((MODEL, OTHER)[i % 2], f"before {i}")
+    assert all(e["requests"] == 3 for e in client.stats())
+
+    proc.terminate()
+    proc.join()
+    for i in range(6):
+        assert client.generate((MODEL, OTHER)[i % 2], f"after {i}")
+    dead, alive = client.stats()
+    # One failed attempt, then the dead endpoint is skipped while it cools down
+    assert client.failovers == 1
+    assert (dead["healthy"], dead["failures"], dead["models"]) == (False, 1, [])
+    assert alive["healthy"] and alive["failures"] == 0
+    assert _outstanding(client) == [0, 0]
+
+
+def test_concurrent_run_survives_a_kill(doomed_ollama, fake_ollama):
+    proc, url = doomed_ollama
+    client = BalancedOllamaClient.from_urls([url, fake_ollama.url])
+
+    def call(i):
+        if i == 10:
+            proc.terminate()
+        return client.generate(MODEL, f"prompt {i}", timeout=10)
+
+    with ThreadPoolExecutor(4) as pool:
+        assert all(pool.map(call, range(40)))
+    assert client.stats()[0]["failures"] >= 1
+    assert _outstanding(client) == [0, 0]
+
+
+def test_cooldown_doubles_and_expires(doomed_ollama, fake_ollama):
+    proc, url = doomed_ollama
+    client = BalancedOllamaClient.from_urls([url, fake_ollama.url])
+    client.failure_cooldown = 0.05
+    proc.terminate()
+    proc.join()
+
+    client.generate(MODEL, "first")
+    client.generate(MODEL, "skips the dead endpoint")
+    assert client.stats()[0]["failures"] == 1
+    time.sleep(0.06)
+    # Cooled down: a model not warm anywhere tries the endpoint again, which fails again and
+    # now stays out twice as long
+    client.generate(OTHER, "retry")
+    dead = client._endpoints[0]
+    assert (dead.failures, dead.consecutive_failures) == (2, 2)
+    assert dead.down_until - time.perf_counter() > 0.05
+
+
+def test_missing_model_fails_over_once():
+    with FakeOllamaServer(config=FakeOllamaConfig(models=["other"])) as lacking, FakeOllamaServer() as full:
+        client = BalancedOllamaClient.from_urls([lacking.url, full.url])
+        for i in range(4):
+            assert client.generate(MODEL, f"prompt {i}")
+        assert client.failovers <= 1
+        assert lacking.stats.requests <= 1
+        assert client.stats()[0]["healthy"]
+
+
+def test_abandoned_stream_releases_its_endpoint(fake_ollama):
+    client = BalancedOllamaClient.from_urls([fake_ollama.url, fake_ollama.url])
+    stream = client.generate_stream(MODEL, "tell me a story")
+    assert next(stream)
+    assert sorted(_outstanding(client)) == [0, 1]
+    stream.close()
+    assert _outstanding(client) == [0, 0]
+    assert all(e["failures"] == 0 for e in client.stats())
+
+
+def test_deadline_releases_without_blaming_the_endpoint():
+    with FakeOllamaServer(config=FakeOllamaConfig(base_latency=0.5)) as slow:
+        client = BalancedOllamaClient.from_urls([slow.url])
+        with pytest.raises(DeadlineExceeded):
+            client.generate(MODEL, "slow", timeout=0.05)
+        with pytest.raises(DeadlineExceeded):
+            list(client.generate_stream(MODEL, "slow", timeout=0.05))
+        (endpoint,) = client.stats()
+        assert (endpoint["outstanding"], endpoint["failures"], endpoint["healthy"]) == (0, 0, True)
+        assert client.failovers == 0
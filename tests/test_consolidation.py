@@ -0,0 +1,86 @@
+import time
+
+import numpy as np
+import pytest
+
+from compact_memory import CompactMemoryCollection
+from consolidation import MemoryConsolidator, plan_clusters
+from memory import Memory, MemoryCollection
+from memory_store import SQLiteMemoryCollection
+from ollama_client import OllamaClient
+from vector_index import HashingEmbedder
+
+
+def _unit(rows):
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def test_related_rows_join_up_to_max_cluster_size():
+    rng = np.random.default_rng(0)
+    centres = rng.normal(size=(20, 64))
+    vectors = _unit(np.repeat(centres, 5, axis=0) + 0.05 * rng.normal(size=(100, 64)))
+    groups = plan_clusters(vectors, target=20, cap=30, max_cluster_size=5)
+    assert sorted(sorted(g) for g in groups) == [list(range(i, i + 5)) for i in range(0, 100, 5)]
+
+
+def test_unrelated_rows_stop_at_cap():
+    rng = np.random.default_rng(1)
+    vectors = _unit(rng.normal(size=(300, 64)))
+    groups = plan_clusters(vectors, target=100, cap=150, min_similarity=0.9)
+    assert 300 - sum(len(g) - 1 for g in groups) == 150
+
+
+def test_plan_clusters_scales():
+    rng = np.random.default_rng(2)
+    vectors = _unit(rng.normal(size=(2000, 64)))
+    start = time.perf_counter()
+    groups = plan_clusters(vectors, target=200, cap=300)
+    # The dense version took close to a minute here
+    assert time.perf_counter() - start < 15
+    assert 2000 - sum(len(g) - 1 for g in groups) <= 300
+
+
+class CountingEmbedder(HashingEmbedder):
+    calls: int = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return super().__call__(text)
+
+
+def _fill(collection, count, start=0):
+    for i in range(start, start + count):
+        collection.add(Memory(f"The rope bridge number {i} over the gorge snapped.", 0.01, 1, 1))
+
+
+@pytest.mark.parametrize("collection", [MemoryCollection, SQLiteMemoryCollection, CompactMemoryCollection])
+def test_consolidation_merges_every_backend(fake_ollama, collection):
+    memory = collection()
+    _fill(memory, 12)
+    consolidator = MemoryConsolidator(llm_client=OllamaClient(base_url=fake_ollama.url), max_memories=8)
+    consolidator.watch(memory, "cautious")
+    assert consolidator.run_once() > 0
+    assert len(memory.statements()) <= 8
+    assert consolidator.stats()["errors"] == 0
+
+
+def test_embeddings_are_kept_between_passes(fake_ollama):
+    embedder = CountingEmbedder()
+    memory = MemoryCollection()
+    consolidator = MemoryConsolidator(
+        llm_client=OllamaClient(base_url=fake_ollama.url), max_memories=8, embedder=embedder
+    )
+    consolidator.watch(memory)
+    _fill(memory, 12)
+    consolidator.run_once()
+    assert embedder.calls == 12
+
+    cached = set(consolidator._watched[0].embeddings)
+    _fill(memory, 4, start=12)
+    current = memory.statements()
+    assert len(current) > 8
+    consolidator.run_once()
+    # Only the four new memories and the summaries of the first pass are embedded
+    assert embedder.calls == 12 + len(set(current) - cached)
+    assert len(set(current) - cached) < len(current)
+    assert set(consolidator._watched[0].embeddings) == set(current)
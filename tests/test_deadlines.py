@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from executive import Executive
+from fake_ollama import FakeOllamaConfig, canned_response
+from memory import Memory, MemoryManager
+from ollama_client import DeadlineExceeded
+
+
+class SlowSelectClient:
+    """Answers like fake_ollama, but id selections for `slow_personality` return only after `delay`."""
+
+    tracer = None
+
+    def __init__(self, slow_personality, delay):
+        self.slow_personality = slow_personality
+        self.delay = delay
+        self.config = FakeOllamaConfig()
+        self.late_answers = threading.Event()
+
+    def generate(self, model, prompt, timeout=None, **kwargs):
+        if self.slow_personality in prompt and "JSON array of strings" in prompt:
+            # A response that arrives after the caller's deadline, as from a server that
+            # trickles its answer and so never trips the read timeout
+            time.sleep(self.delay)
+            self.late_answers.set()
+        return canned_response(prompt, self.config)
+
+
+def _manager(client, personality):
+    manager = MemoryManager(personality, llm_client=client)
+    for i in range(3):
+        manager.memory.add(Memory(f"{personality} memory {i}", 0.1, 1, 1))
+    return manager
+
+
+def _state(manager):
+    return {k: (m.current_strength, m.step) for k, m in manager.memory.memories.items()}
+
+
+def test_late_manager_does_not_select():
+    client = SlowSelectClient("slowpoke", delay=0.2)
+    manager = _manager(client, "slowpoke")
+    before = _state(manager)
+    with pytest.raises(DeadlineExceeded):
+        manager.get_memory_summary("scenario", deadline=time.perf_counter() + 0.05)
+    assert _state(manager) == before
+
+
+def test_skipped_advisor_leaves_memories_untouched():
+    client = SlowSelectClient("slowpoke", delay=0.3)
+    executive = Executive(llm_client=client)
+    executive.add_memory_manager(_manager(client, "slowpoke"), "slow")
+    executive.add_memory_manager(_manager(client, "quick"), "quick")
+    slow_before = _state(executive.memory_units["slow"])
+
+    started = time.perf_counter()
+    insights = executive.consult_memory_units(["slow", "quick"], "scenario", deadline=started + 0.1)
+    assert time.perf_counter() - started < 0.25
+    assert insights
+
+    # Let the abandoned advisor's late answer arrive, then check it changed nothing
+    assert client.late_answers.wait(1.0)
+    time.sleep(0.05)
+    assert _state(executive.memory_units["slow"]) == slow_before
+    assert any(step == 0 for _, step in _state(executive.memory_units["quick"]).values())
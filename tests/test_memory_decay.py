@@ -0,0 +1,60 @@
+import copy
+import random
+
+import pytest
+
+from memory import Memory, MemoryCollection
+
+
+RATES = [0, 0.01, 0.05, 0.1, 0.3]
+
+
+def _memories(seed, count=200):
+    rng = random.Random(seed)
+    return [
+        Memory(f"memory {i}", rng.choice(RATES), 1.0, 1.0, memory_id=f"m{i}")
+        for i in range(count)
+    ]
+
+
+def _state(collection):
+    return {k: (m.current_strength, m.step) for k, m in collection.memories.items()}
+
+
+def test_unselected_memory_reads_decayed_without_settle():
+    collection = MemoryCollection(lazy_decay=True)
+    fading = collection.add(Memory("fading", 0.1, 1, 1))
+    kept = collection.add(Memory("kept", 0.1, 1, 1))
+    for _ in range(3):
+        collection.select([kept])
+    mem = collection.memories[fading]
+    assert (mem.current_strength, mem.step) == (1 - 0.1 * 3, 3)
+    assert collection.memories.get(fading) is mem
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_lazy_matches_eager_over_random_selects(seed):
+    memories = _memories(seed)
+    eager = MemoryCollection({m.memory_id: copy.deepcopy(m) for m in memories})
+    lazy = MemoryCollection({m.memory_id: copy.deepcopy(m) for m in memories}, lazy_decay=True)
+    rng = random.Random(seed)
+    for i in range(300):
+        keys = rng.sample(sorted(eager.memories), min(3, len(eager.memories)))
+        selected_eager = eager.select(keys)
+        selected_lazy = lazy.select(keys)
+        assert [m.memory_id for m in selected_eager] == [m.memory_id for m in selected_lazy]
+        # Bit-identical floats, read straight through `memories` with no settle()
+        assert _state(lazy) == _state(eager)
+        if i % 25 == 0:
+            assert lazy.get_as_string(token_budget=150) == eager.get_as_string(token_budget=150)
+
+
+def test_removed_memory_keeps_its_decay():
+    collection = MemoryCollection(lazy_decay=True)
+    doomed = Memory("doomed", 0.5, 1, 1)
+    collection.add(doomed)
+    other = collection.add(Memory("other", 0, 1, 1))
+    collection.select([other])
+    collection.select([other])
+    assert doomed.memory_id not in collection.memories
+    assert (doomed.current_strength, doomed.step) == (0.0, 2)
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+from executive import Executive
+from fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from memory import Memory, MemoryManager, parse_fused_consult
+from model_routing import ModelRouter, routed_generate
+from ollama_client import OllamaClient
+from prompting import ID_ARRAY_SCHEMA, parse_bool, parse_id_array, parse_json_object, structured_params
+
+
+SMALL = "qwen2.5:1.5b-instruct"
+LARGE = "qwen2.5:7b-instruct"
+SELECT_PROMPT = 'Return ONLY a JSON array of strings.\n\nPayload (JSON):\n{"memory": {"a": "x", "b": "y", "c": "z"}}'
+
+
+@pytest.fixture
+def chatty_ollama():
+    with FakeOllamaServer(config=FakeOllamaConfig(chatty_models=[SMALL])) as server:
+        yield server
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('["a", "b"]', ["a", "b"]),
+    ('Sure! Here you go:\n```json\n["a"]\n```', ["a"]),
+    ('[1, 2] and then ["c"]', ["c"]),
+    ("[]", []),
+])
+def test_parse_id_array_tolerates_prose(text, expected):
+    assert parse_id_array(text) == expected
+
+
+@pytest.mark.parametrize("text", ["none of them", "[1, 2]", '["a", '])
+def test_parse_id_array_rejects(text):
+    with pytest.raises(ValueError):
+        parse_id_array(text)
+
+
+@pytest.mark.parametrize("text, expected", [("true", True), ('"False"', False), ("I think TRUE.", True)])
+def test_parse_bool(text, expected):
+    assert parse_bool(text) is expected
+
+
+@pytest.mark.parametrize("text", ["maybe", "true or false"])
+def test_parse_bool_rejects(text):
+    with pytest.raises(ValueError):
+        parse_bool(text)
+
+
+def test_parse_fused_consult():
+    assert parse_json_object('Answer: {"a": 1} trailing') == {"a": 1}
+    assert parse_fused_consult('```{"memory_ids": ["m1", 2], "advice": " Go. "}```') == (["m1"], "Go.")
+    with pytest.raises(ValueError):
+        parse_fused_consult('{"memory_ids": ["m1"]}')
+    with pytest.raises(ValueError):
+        parse_fused_consult("no object")
+
+
+def _strict(text):
+    # json.JSONDecodeError is a ValueError, so prose around the answer counts as a parse failure
+    return json.loads(text)
+
+
+def test_unparseable_answers_retry_then_escalate(chatty_ollama):
+    router = ModelRouter(tiers={"small": SMALL, "large": LARGE})
+    client = OllamaClient(base_url=chatty_ollama.url)
+    ids = routed_generate(client, router, LARGE, SELECT_PROMPT, "manager.select_memories", parse=_strict, retries=1)
+    assert ids == ["a", "b"]
+    stats = router.stats()
+    assert stats["small"]["calls"] == 2 and stats["small"]["parse_failures"] == 2
+    assert stats["large"]["calls"] == 1 and stats["large"]["parse_failures"] == 0
+
+
+def test_schema_keeps_small_model_on_tier(chatty_ollama):
+    router = ModelRouter(tiers={"small": SMALL, "large": LARGE})
+    client = OllamaClient(base_url=chatty_ollama.url)
+    ids = routed_generate(
+        client, router, LARGE, SELECT_PROMPT, "manager.select_memories", parse=_strict,
+        extra_params=structured_params(ID_ARRAY_SCHEMA, True),
+    )
+    assert ids == ["a", "b"]
+    assert set(router.stats()) == {"small"}
+
+
+def test_default_when_every_attempt_fails(chatty_ollama):
+    client = OllamaClient(base_url=chatty_ollama.url)
+    assert routed_generate(client, None, SMALL, SELECT_PROMPT, "x", parse=_strict, retries=2, default=[]) == []
+    assert chatty_ollama.stats.requests == 3
+    with pytest.raises(ValueError, match="no parseable answer"):
+        routed_generate(client, None, SMALL, SELECT_PROMPT, "x", parse=_strict)
+
+
+@pytest.mark.parametrize("structured_output", [False, True])
+def test_chatty_model_still_decides(chatty_ollama, structured_output):
+    client = OllamaClient(base_url=chatty_ollama.url)
+    executive = Executive(llm_client=client, model=SMALL, structured_output=structured_output)
+    manager = MemoryManager("You keep the party safe.", model=SMALL, llm_client=client, structured_output=structured_output)
+    for i in range(3):
+        manager.memory.add(Memory(f"The bridge creaked under load {i}.", 0.1, 1, 1))
+    executive.add_memory_manager(manager, "safety")
+    assert executive.decide_action("A rope bridge spans the gorge.")
+    # Two memories were selected (and one decayed) through a tolerant or schema-constrained parse
+    assert sorted(m.step for m in manager.memory.memories.values()) == [0, 0, 1]
@@ -0,0 +1,33 @@
+import pytest
+
+from compact_memory import CompactMemoryCollection
+from memory import Memory, MemoryCollection, MemoryManager
+from memory_store import SQLiteMemoryCollection
+from ollama_client import OllamaClient
+from subpersonality import Subpersonality
+from vector_index import VectorIndex
+
+
+@pytest.mark.parametrize("collection", [MemoryCollection, SQLiteMemoryCollection, CompactMemoryCollection])
+def test_vector_retrieval_needs_an_index(collection):
+    with pytest.raises(ValueError, match="VectorIndex"):
+        MemoryManager("p", retrieval_mode="vector", memory=collection())
+    with pytest.raises(ValueError, match="VectorIndex"):
+        Subpersonality("m", "f", "s", "b", retrieval_mode="vector", memory=collection())
+
+
+def test_unknown_retrieval_mode():
+    with pytest.raises(ValueError, match="retrieval_mode"):
+        MemoryManager("p", retrieval_mode="vectors")
+
+
+def test_vector_retrieval_selects_nearest_memory(fake_ollama):
+    memory = MemoryCollection(index=VectorIndex())
+    bridge = memory.add(Memory("The rope bridge over the gorge snapped.", 0.1, 1, 1))
+    memory.add(Memory("The merchant sold a cursed amulet.", 0.1, 1, 1))
+    manager = MemoryManager(
+        "p", retrieval_mode="vector", retrieval_top_k=1, memory=memory, llm_client=OllamaClient(base_url=fake_ollama.url)
+    )
+    assert manager.get_memory_summary("Do we cross the rope bridge?")
+    assert memory.memories[bridge].step == 0
+    assert [m.step for k, m in memory.memories.items() if k != bridge] == [1]
@@ -0,0 +1,75 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from ollama_client import DeadlineExceeded, OllamaClient
+from scheduler import RequestScheduler
+
+
+MODEL = "qwen2.5:7b-instruct"
+
+
+@pytest.fixture
+def slow_ollama():
+    with FakeOllamaServer(config=FakeOllamaConfig(base_latency=0.05)) as server:
+        yield server
+
+
+def test_in_flight_never_exceeds_slots(slow_ollama):
+    scheduler = RequestScheduler(OllamaClient(base_url=slow_ollama.url), slots=2)
+    with ThreadPoolExecutor(8) as pool:
+        answers = list(pool.map(lambda i: scheduler.generate(MODEL, f"prompt {i}"), range(8)))
+    assert all(answers)
+    stats = scheduler.stats()
+    assert stats["peak_in_flight"] == 2
+    assert (stats["in_flight"], stats["queued"], stats["completed"]) == (0, 0, 8)
+    assert stats["mean_wait_ms"] > 0
+
+
+def test_waiters_are_admitted_by_priority(slow_ollama):
+    scheduler = RequestScheduler(OllamaClient(base_url=slow_ollama.url), slots=1)
+    order = []
+
+    def call(caller):
+        scheduler.generate(MODEL, caller, caller=caller)
+        order.append(caller)
+
+    blocker = threading.Thread(target=call, args=("blocker",))
+    blocker.start()
+    while scheduler.stats()["in_flight"] == 0:
+        time.sleep(0.001)
+    waiters = [threading.Thread(target=call, args=(c,)) for c in ("memory.consolidate", "manager.keep_decision", "executive.decide")]
+    for t in waiters:
+        t.start()
+        while scheduler.stats()["queued"] < waiters.index(t) + 1:
+            time.sleep(0.001)
+    for t in [blocker, *waiters]:
+        t.join()
+    assert order == ["blocker", "executive.decide", "manager.keep_decision", "memory.consolidate"]
+
+
+def test_deadline_while_queued_gives_up_its_place(slow_ollama):
+    scheduler = RequestScheduler(OllamaClient(base_url=slow_ollama.url), slots=1)
+    blocker = threading.Thread(target=scheduler.generate, args=(MODEL, "slow"))
+    blocker.start()
+    while scheduler.stats()["in_flight"] == 0:
+        time.sleep(0.001)
+    with pytest.raises(DeadlineExceeded):
+        scheduler.generate(MODEL, "late", timeout=0.005)
+    assert scheduler.stats()["queued"] == 0
+    blocker.join()
+    assert scheduler.stats()["in_flight"] == 0
+    assert scheduler.generate(MODEL, "next")
+
+
+def test_abandoned_stream_releases_its_slot(slow_ollama):
+    scheduler = RequestScheduler(OllamaClient(base_url=slow_ollama.url), slots=1)
+    stream = scheduler.generate_stream(MODEL, "stream")
+    next(stream)
+    assert scheduler.stats()["in_flight"] == 1
+    stream.close()
+    assert scheduler.stats()["in_flight"] == 0
+    assert scheduler.generate(MODEL, "after", timeout=5)
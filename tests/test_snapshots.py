@@ -0,0 +1,95 @@
+import pytest
+
+from character_builder import Character, character_from_spec, load_snapshot, save_snapshot
+from compact_memory import CompactMemoryCollection
+from executive import Executive
+from memory import Memory, MemoryCollection, MemoryManager
+from memory_store import SQLiteMemoryCollection
+from ollama_client import OllamaClient
+from vector_index import HashingEmbedder, OllamaEmbedder, VectorIndex
+
+
+STATEMENTS = [
+    "The rope bridge over the gorge snapped.",
+    "The merchant sold a cursed amulet.",
+    "A stranger paid for the ale and vanished.",
+]
+
+
+class CountingClient(OllamaClient):
+    embeds: int = 0
+
+    def embed(self, *args, **kwargs):
+        self.embeds += 1
+        return super().embed(*args, **kwargs)
+
+
+def _character(collection, llm_client=None):
+    executive = Executive(**({} if llm_client is None else {"llm_client": llm_client}))
+    for i, statement in enumerate(STATEMENTS):
+        collection.add(Memory(statement, 0.1 * i, 1, 1))
+    executive.add_memory_manager(MemoryManager("You keep the party safe.", memory=collection), "safety")
+    collection.select(list(collection.memories)[:1])
+    return Character("aria", executive)
+
+
+def _state(collection):
+    return [(m.statement, m.decay_rate, m.strength_initial, m.current_strength, m.step) for m in collection.memories.values()]
+
+
+@pytest.mark.parametrize("backend", [
+    lambda tmp_path: MemoryCollection(lazy_decay=True),
+    lambda tmp_path: SQLiteMemoryCollection(str(tmp_path / "safety.db")),
+    lambda tmp_path: CompactMemoryCollection(initial_capacity=8),
+])
+def test_round_trip_keeps_backend_and_memories(tmp_path, backend):
+    collection = backend(tmp_path)
+    character = _character(collection)
+    path = str(tmp_path / "aria.char")
+    save_snapshot(character, path)
+    before = _state(collection)
+    # The restored state wins over anything the file-backed store picked up since
+    collection.add(Memory("added after saving", 0.01, 1, 1))
+
+    restored = load_snapshot(path).executive.memory_units["safety"].memory
+    assert type(restored) is type(collection)
+    assert _state(restored) == before
+    if isinstance(collection, MemoryCollection):
+        assert restored.lazy_decay
+    if isinstance(collection, CompactMemoryCollection):
+        assert restored.initial_capacity == 8
+
+
+def test_index_is_restored_without_embedding(fake_ollama, tmp_path):
+    client = CountingClient(base_url=fake_ollama.url)
+    collection = MemoryCollection(index=VectorIndex(embedder=OllamaEmbedder(llm_client=client)))
+    character = _character(collection, client)
+    path = str(tmp_path / "aria.char")
+    save_snapshot(character, path)
+    expected = collection.index.search("Is the bridge safe to cross?", k=3)
+
+    restored_client = CountingClient(base_url=fake_ollama.url)
+    restored = load_snapshot(path, restored_client).executive.memory_units["safety"].memory
+    assert restored_client.embeds == 0
+    assert isinstance(restored.index.embedder, OllamaEmbedder)
+    assert restored.index.search("Is the bridge safe to cross?", k=3) == expected
+    assert restored_client.embeds == 1
+
+
+def test_other_embedder_reembeds(tmp_path):
+    collection = MemoryCollection(index=VectorIndex(embedder=HashingEmbedder(dim=64)))
+    path = str(tmp_path / "aria.char")
+    save_snapshot(_character(collection), path)
+    restored = load_snapshot(path, embedder=HashingEmbedder(dim=32)).executive.memory_units["safety"].memory
+    assert restored.index.vectors(list(restored.memories)).shape == (3, 32)
+
+
+def test_spec_memories_need_a_decay_rate():
+    spec = {"name": "aria", "managers": {"safety": {"personality": "p", "memories": ["A bridge fell."]}}}
+    with pytest.raises(ValueError, match="decay_rate"):
+        character_from_spec(spec)
+
+    spec["managers"]["safety"]["decay_rate"] = 0
+    spec["managers"]["safety"]["memories"].append({"statement": "A curse lingered.", "decay_rate": 0.05})
+    memory = character_from_spec(spec).executive.memory_units["safety"].memory
+    assert [m.decay_rate for m in memory.memories.values()] == [0, 0.05]
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+from contextlib import contextmanager, nullcontext
+import contextvars
+from dataclasses import asdict, dataclass, field
+import json
+import threading
+import time
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, Protocol
+import uuid
+
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start_time: float = 0.0  # unix seconds
+    wall_ms: Optional[float] = None
+    # Time spent waiting before the work started (pool slot, connection, server queue)
+    queue_ms: Optional[float] = None
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    _perf_start: float = field(default=0.0, repr=False)
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = asdict(self)
+        d.pop("_perf_start", None)
+        return d
+
+
+class SpanExporter(Protocol):
+    def export(self, span: Span) -> None: ...
+
+
+@dataclass
+class InMemoryCollector:
+    """Keeps finished spans in memory; handy for tests, benchmarks and ad-hoc summaries."""
+
+    spans: List[Span] = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+    def trace(self, trace_id: str) -> List[Span]:
+        with self._lock:
+            return [s for s in self.spans if s.trace_id == trace_id]
+
+    def summary(self, name: str = "llm.generate") -> Dict[str, Dict[str, float]]:
+        """
+        Per-caller totals for spans called `name`: calls, wall/queue ms, token counts, and
+        prefix_hit_ratio, the share of prompt characters repeating a recent prompt's prefix.
+        """
+        out: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            spans = [s for s in self.spans if s.name == name]
+        for s in spans:
+            caller = s.attributes.get("caller") or "unknown"
+            row = out.setdefault(caller, {
+                "calls": 0, "wall_ms": 0.0, "queue_ms": 0.0, "prompt_tokens": 0, "eval_tokens": 0,
+                "prompt_chars": 0, "prefix_shared_chars": 0,
+            })
+            row["calls"] += 1
+            row["wall_ms"] += s.wall_ms or 0.0
+            row["queue_ms"] += s.queue_ms or 0.0
+            row["prompt_tokens"] += s.attributes.get("prompt_eval_count") or 0
+            row["eval_tokens"] += s.attributes.get("eval_count") or 0
+            row["prompt_chars"] += s.attributes.get("prompt_chars") or 0
+            row["prefix_shared_chars"] += s.attributes.get("prefix_shared_chars") or 0
+        for row in out.values():
+            row["prefix_hit_ratio"] = row["prefix_shared_chars"] / row["prompt_chars"] if row["prompt_chars"] else 0.0
+        return out
+
+
+@dataclass
+class JsonlExporter:
+    """Appends one JSON object per finished span to a file."""
+
+    path: str
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+@dataclass
+class Tracer:
+    """
+    Creates nested spans. The active span lives in a context variable, so spans opened inside
+    asyncio tasks, or in threads started through run_in_context(), nest under the span that
+    was active when the work was handed off.
+    """
+
+    exporters: List[SpanExporter] = field(default_factory=list)
+
+    def start_span(self, name: str, queue_ms: Optional[float] = None, **attributes: Any) -> Span:
+        """
+        Open a span under the active one without making it active. Pair with end_span(); use
+        this where a context manager does not fit, e.g. across the yields of a generator.
+        """
+        parent = _current_span.get()
+        return Span(
+            name=name,
+            trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent else None,
+            start_time=time.time(),
+            queue_ms=queue_ms,
+            attributes=dict(attributes),
+            _perf_start=time.perf_counter(),
+        )
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None) -> None:
+        span.wall_ms = (time.perf_counter() - span._perf_start) * 1e3
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        for exporter in self.exporters:
+            exporter.export(span)
+
+    @contextmanager
+    def span(self, name: str, queue_ms: Optional[float] = None, **attributes: Any) -> Iterator[Span]:
+        span = self.start_span(name, queue_ms=queue_ms, **attributes)
+        token = _current_span.set(span)
+        error: Optional[BaseException] = None
+        try:
+            yield span
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span, error)
+
+
+def maybe_span(tracer: Optional[Tracer], name: str, **attributes: Any) -> ContextManager[Optional[Span]]:
+    """tracer.span(...) if tracing is enabled, otherwise a no-op context yielding None."""
+    if tracer is None:
+        return nullcontext()
+    return tracer.span(name, **attributes)
+
+
+@contextmanager
+def activate(span: Optional[Span]) -> Iterator[Optional[Span]]:
+    """Make an already started span the active one for the duration of the block."""
+    if span is None:
+        yield None
+        return
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        _current_span.reset(token)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def annotate(**attributes: Any) -> None:
+    """Attach attributes to the active span, if any."""
+    span = _current_span.get()
+    if span is not None:
+        span.set(**attributes)
+
+
+def run_in_context(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wrap fn so it runs in a copy of the caller's context (and therefore under the caller's
+    active span) when submitted to a thread pool. Call once per submitted task.
+    """
+    ctx = contextvars.copy_context()
+
+    def run(*args: Any, **kwargs: Any) -> Any:
+        return ctx.run(fn, *args, **kwargs)
+
+    return run
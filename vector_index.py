@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import hashlib
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ollama_client import OllamaClient
+
+
+Embedder = Callable[[str], Sequence[float]]
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+@dataclass
+class OllamaEmbedder:
+    """Embeds text with an Ollama embedding model (/api/embeddings)."""
+
+    model: str = "nomic-embed-text"
+    llm_client: OllamaClient = field(default_factory=OllamaClient)
+
+    def __call__(self, text: str) -> Sequence[float]:
+        return self.llm_client.embed(model=self.model, prompt=text)
+
+
+@dataclass
+class HashingEmbedder:
+    """
+    Local stand-in for an embedding model: signed feature hashing of word unigrams and
+    bigrams. Deterministic across processes and needs no server, at the cost of only
+    matching on shared vocabulary.
+    """
+
+    dim: int = 512
+
+    def __call__(self, text: str) -> Sequence[float]:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        tokens = _TOKEN_RE.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            h = int.from_bytes(digest, "little")
+            vec[h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        return vec
+
+
+@dataclass
+class VectorIndex:
+    """
+    In-memory top-k cosine index over memory statements.
+
+    Vectors are L2-normalised and stored as rows of one float32 matrix, so a query is a
+    single matrix-vector product. Rows are added and removed incrementally (removal
+    moves the last row into the freed slot), which keeps the matrix dense.
+    """
+
+    embedder: Embedder = field(default_factory=HashingEmbedder)
+    initial_capacity: int = 64
+
+    _matrix: Optional[np.ndarray] = field(default=None, init=False, repr=False)
+    _ids: List[str] = field(default_factory=list, init=False, repr=False)
+    _rows: Dict[str, int] = field(default_factory=dict, init=False, repr=False)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, memory_id: str) -> bool:
+        return memory_id in self._rows
+
+    def _embed(self, text: str) -> np.ndarray:
+        vec = np.asarray(self.embedder(text), dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm > 0 else vec
+
+    def add(self, memory_id: str, text: str) -> None:
+        self.add_vector(memory_id, self._embed(text))
+
+    def add_vector(self, memory_id: str, vec: np.ndarray) -> None:
+        """Add an L2-normalised vector made by this index's embedder, without embedding."""
+        vec = np.asarray(vec, dtype=np.float32)
+        if memory_id in self._rows:
+            self._matrix[self._rows[memory_id]] = vec
+            return
+
+        if self._matrix is None:
+            self._matrix = np.zeros((self.initial_capacity, vec.shape[0]), dtype=np.float32)
+        elif vec.shape[0] != self._matrix.shape[1]:
+            raise ValueError(f"Embedding dimension {vec.shape[0]} does not match index dimension {self._matrix.shape[1]}")
+
+        row = len(self._ids)
+        if row == self._matrix.shape[0]:
+            grown = np.zeros((self._matrix.shape[0] * 2, self._matrix.shape[1]), dtype=np.float32)
+            grown[:row] = self._matrix
+            self._matrix = grown
+
+        self._matrix[row] = vec
+        self._ids.append(memory_id)
+        self._rows[memory_id] = row
+
+    def add_vectors(self, memory_ids: Sequence[str], vectors: np.ndarray) -> None:
+        """add_vector() for many rows; into an empty index this is one copy of the matrix."""
+        if self._ids or len(memory_ids) != len(set(memory_ids)):
+            for memory_id, vec in zip(memory_ids, vectors):
+                self.add_vector(memory_id, vec)
+            return
+        n = len(memory_ids)
+        if n == 0:
+            return
+        self._matrix = np.zeros((max(self.initial_capacity, n), vectors.shape[1]), dtype=np.float32)
+        self._matrix[:n] = vectors
+        self._ids = list(memory_ids)
+        self._rows = {memory_id: row for row, memory_id in enumerate(self._ids)}
+
+    def vectors(self, memory_ids: Sequence[str]) -> np.ndarray:
+        """The stored vectors of memory_ids, in order, as a new (len(memory_ids), dim) matrix."""
+        if self._matrix is None:
+            return np.zeros((len(memory_ids), 0), dtype=np.float32)
+        return self._matrix[[self._rows[memory_id] for memory_id in memory_ids]]
+
+    def remove(self, memory_id: str) -> None:
+        row = self._rows.pop(memory_id, None)
+        if row is None:
+            return
+        last = len(self._ids) - 1
+        if row != last:
+            moved_id = self._ids[last]
+            self._matrix[row] = self._matrix[last]
+            self._ids[row] = moved_id
+            self._rows[moved_id] = row
+        self._ids.pop()
+
+    def search(self, query: str, k: int, min_score: float = 0.0) -> List[Tuple[str, float]]:
+        """Return up to k (memory_id, cosine score) pairs, best first, scoring above min_score."""
+        n = len(self._ids)
+        if n == 0 or k <= 0:
+            return []
+
+        scores = self._matrix[:n] @ self._embed(query)
+        k = min(k, n)
+        # argpartition is O(n); only the k winners get sorted
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self._ids[i], float(scores[i])) for i in top if scores[i] > min_score]